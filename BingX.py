@@ -5,58 +5,58 @@ import hmac
 from hashlib import sha256
 from typing import List, Dict, Optional
 from decimal import Decimal
+from symbol_registry import symbol_registry
+from adapter import FundingRateFetcher
+from numeric import percent, to_float, to_seconds
+from quote import Quote, QuoteBatch
 
-class BingXFundingRateFetcher:
+class BingXFundingRateFetcher(FundingRateFetcher):
+    EXCHANGE = "BingX"
     BASE_URL = "https://open-api.bingx.com/openApi/swap/v2/quote/premiumIndex"
     HISTORY_URL = "https://open-api.bingx.com/openApi/swap/v2/quote/fundingRate"
+    # Цена в обоих путях — mark price из premiumIndex (markPrice)
     api_key = ""
     secret_key = ""
 
-    def __init__(self, symbol: str, proxy: Optional[str] = None):
-        self.symbol = symbol
-        self.proxy = proxy
-
     async def fetch_history_funding(self, token, session: aiohttp.ClientSession):
-        symbol = token.replace('USDT', '-USDT')
+        symbol = symbol_registry.native(self.EXCHANGE, token)
         history_url = f"{self.HISTORY_URL}?symbol={symbol}"
-        async with session.get(history_url) as response:
-            response.raise_for_status()
-            data = await response.json()
-            result = {}
-            if len(data['data'])>0:
-                for i in range(0, 4):
-                    result[Decimal(data['data'][i]['fundingRate']).normalize() * 100] = data['data'][i]['fundingTime']
-                return result
-            else:
-                return {
-                    "ex": "BingX",
-                    "symbol": self.symbol,
-                    "fundingRate": "History Not supported",
-                    "price": "Not supported"
-                    # "fundingRate": 0.3
-                }
-
-    async def fetch_funding_rate(self, session: aiohttp.ClientSession) -> Dict:
-        symbol = self.symbol.replace('_', '-')
-        url = f"{self.BASE_URL}?symbol={symbol}"
-        async with session.get(url) as response:
-            data = await response.json()
-            if 'lastFundingRate' in data['data']:
-                return {
-                    "ex": "BingX",
-                    "symbol": self.symbol,
-                    # "fundingRate": 1.9,
-                    "fundingRate": str(float(data['data']['lastFundingRate']) * 100),
-                    "price": data['data']['indexPrice']
-                }
-            else:
-                return {
-                    "ex": "BingX",
-                    "symbol": self.symbol,
-                    "fundingRate": "Not supported",
-                    "price": "Not supported"
-                    # "fundingRate": 0.3
-                }
+        data = await self.get_json(session, history_url)
+        result = {}
+        if len(data['data'])>0:
+            for i in range(0, 4):
+                result[Decimal(data['data'][i]['fundingRate']).normalize() * 100] = data['data'][i]['fundingTime']
+            return result
+        else:
+            return {
+                "ex": "BingX",
+                "symbol": self.symbol,
+                "fundingRate": "History Not supported",
+                "price": "Not supported"
+                # "fundingRate": 0.3
+            }
+
+    @classmethod
+    async def fetch_all_funding_rates(cls, session: aiohttp.ClientSession) -> QuoteBatch:
+        """Фандинг и mark price по всем контрактам одним запросом."""
+        result = QuoteBatch(cls.EXCHANGE)
+        data = await cls.get_json(session, cls.BASE_URL)
+        for ticker in data['data']:
+            symbol = symbol_registry.resolve(cls.EXCHANGE, ticker['symbol'])
+            if symbol is None or not ticker.get('lastFundingRate'):
+                continue
+            result.append(symbol, percent(ticker['lastFundingRate']), to_float(ticker['markPrice']),
+                          to_seconds(ticker.get('nextFundingTime')))
+        return result
+
+    async def request(self, session: aiohttp.ClientSession):
+        return await self.get_json(session, f"{self.BASE_URL}?symbol={self.native}")
+
+    def parse(self, data) -> Optional[Quote]:
+        if 'lastFundingRate' in data['data']:
+            return self.quote(percent(data['data']['lastFundingRate']), to_float(data['data']['markPrice']))
+        return None
+
 
 def load_data(filename: str) -> List[str]:
     with open(filename, "r", encoding="utf-8") as file:
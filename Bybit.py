@@ -5,59 +5,61 @@ import hmac
 from hashlib import sha256
 from typing import List, Dict, Optional
 from decimal import Decimal
+from symbol_registry import symbol_registry
+from adapter import FundingRateFetcher
+from numeric import percent, to_float, to_seconds
+from quote import Quote, QuoteBatch
 
-class BybitFundingRateFetcher:
+class BybitFundingRateFetcher(FundingRateFetcher):
+    EXCHANGE = "Bybit"
     BASE_URL = "https://api.bybit.com/v5/market/tickers"
     HISTORY_URL = "https://api.bybit.com/v5/market/funding/history"
+    # Цена в обоих путях — mark price тикера (markPrice)
     api_key = ""
     secret_key = ""
 
-    def __init__(self, symbol: str, proxy: Optional[str] = None):
-        self.symbol = symbol
-        self.proxy = proxy
-
     async def fetch_history_funding(self, token, session: aiohttp.ClientSession):
-        symbol = token.replace('_USDT', 'USDT')
+        symbol = symbol_registry.native(self.EXCHANGE, token)
         history_url = f"{self.HISTORY_URL}?category=linear&symbol={symbol}&limit=4"
-        async with session.get(history_url) as response:
-            response.raise_for_status()
-            data = await response.json()
-            result = {}
-            if len(data['result']['list']) > 0:
-                for i in range(0, 4):
-                    result[Decimal(data['result']['list'][i]['fundingRate']).normalize() * 100] = data['result']['list'][i]['fundingRateTimestamp']
-
-                return result
-            else:
-                return {
-                    "ex": "Bybit",
-                    "symbol": self.symbol,
-                    "fundingRate": "History Not supported",
-                    "price": "Not supported"
-                    # "fundingRate": 0.3
-                }
-
-    async def fetch_funding_rate(self, session: aiohttp.ClientSession) -> Dict:
-        symbol = self.symbol.replace('_', '')
-        url = f"{self.BASE_URL}?category=linear&symbol={symbol}"
-        async with session.get(url) as response:
-            data = await response.json()
-            if len(data['result']['list']) > 0:
-                return {
-                    "ex": "Bybit",
-                    "symbol": self.symbol,
-                    # "fundingRate": 1.9,
-                    "fundingRate": str(float(data['result']['list'][0]['fundingRate'])*100),
-                    "price": data['result']['list'][0]['indexPrice']
-                }
-            else:
-                return {
-                    "ex": "Bybit",
-                    "symbol": self.symbol,
-                    "fundingRate": "Not supported",
-                    "price": "Not supported"
-                    # "fundingRate": 0.3
-                }
+        data = await self.get_json(session, history_url)
+        result = {}
+        if len(data['result']['list']) > 0:
+            for i in range(0, 4):
+                result[Decimal(data['result']['list'][i]['fundingRate']).normalize() * 100] = data['result']['list'][i]['fundingRateTimestamp']
+
+            return result
+        else:
+            return {
+                "ex": "Bybit",
+                "symbol": self.symbol,
+                "fundingRate": "History Not supported",
+                "price": "Not supported"
+                # "fundingRate": 0.3
+            }
+
+    @classmethod
+    async def fetch_all_funding_rates(cls, session: aiohttp.ClientSession) -> QuoteBatch:
+        """Фандинг и mark price по всем контрактам одним запросом."""
+        result = QuoteBatch(cls.EXCHANGE)
+        data = await cls.get_json(session, f"{cls.BASE_URL}?category=linear")
+        for ticker in data['result']['list']:
+            symbol = symbol_registry.resolve(cls.EXCHANGE, ticker['symbol'])
+            # У срочных фьючерсов fundingRate пустой
+            if symbol is None or not ticker.get('fundingRate'):
+                continue
+            result.append(symbol, percent(ticker['fundingRate']), to_float(ticker['markPrice']),
+                          to_seconds(ticker.get('nextFundingTime')))
+        return result
+
+    async def request(self, session: aiohttp.ClientSession):
+        return await self.get_json(session, f"{self.BASE_URL}?category=linear&symbol={self.native}")
+
+    def parse(self, data) -> Optional[Quote]:
+        if len(data['result']['list']) > 0:
+            ticker = data['result']['list'][0]
+            return self.quote(percent(ticker['fundingRate']), to_float(ticker['markPrice']))
+        return None
+
 
 def load_data(filename: str) -> List[str]:
     with open(filename, "r", encoding="utf-8") as file:
@@ -0,0 +1,152 @@
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from typing import Any, Container, Dict, List, Optional
+
+import aiohttp
+
+from json_codec import read_json
+from numeric import percent, to_float
+from quote import Quote, QuoteBatch
+from symbol_registry import symbol_registry
+
+
+class BulkFundingRateFetcher(ABC):
+    """Общая часть адаптеров бирж: запросы, символ на бирже и весь рынок одним запросом.
+
+    Подкласс задаёт EXCHANGE и fetch_all_funding_rates(). Биржи без посимвольного пути
+    (Hyperliquid, kucoin) наследуют этот класс напрямую, остальные — FundingRateFetcher.
+    Описание биржи (хосты, формат символа, возможности) — в exchanges.py.
+    """
+
+    EXCHANGE = ""
+    # Заголовки всех запросов к бирже
+    HEADERS: Optional[Dict[str, str]] = None
+
+    def __init__(self, symbol: str, proxy: Optional[str] = None):
+        self.symbol = symbol
+        self.native = symbol_registry.native(self.EXCHANGE, symbol)
+        self.proxy = proxy
+
+    @classmethod
+    async def get_json(cls, session: aiohttp.ClientSession, url: str, **kwargs) -> Any:
+        async with session.get(url, headers=cls.HEADERS, **kwargs) as response:
+            response.raise_for_status()
+            return await read_json(response)
+
+    @classmethod
+    async def post_json(cls, session: aiohttp.ClientSession, url: str, **kwargs) -> Any:
+        async with session.post(url, headers=cls.HEADERS, **kwargs) as response:
+            response.raise_for_status()
+            return await read_json(response)
+
+    @classmethod
+    @abstractmethod
+    async def fetch_all_funding_rates(cls, session: aiohttp.ClientSession) -> QuoteBatch:
+        """Фандинг и цена по всем контрактам биржи."""
+
+
+class FundingRateFetcher(BulkFundingRateFetcher):
+    """Адаптер с посимвольным путём: fetch_funding_rate() по одному символу.
+
+    Подкласс задаёт request() — сырые ответы по одному символу — и parse(),
+    который собирает из них Quote или возвращает None, если символа на бирже нет.
+    Ошибка запроса даёт Quote.error, а None или ответ неожиданной формы — Quote.not_supported.
+    Цена — mark price контракта (у aevo — index price), и bulk-, и посимвольный путь
+    адаптера берут её из одного и того же поля ответа, чтобы цена не зависела от пути.
+    """
+
+    @abstractmethod
+    async def request(self, session: aiohttp.ClientSession) -> Any:
+        """Сырые ответы биржи по символу self.native."""
+
+    @abstractmethod
+    def parse(self, data: Any) -> Optional[Quote]:
+        """Quote из ответа request(); None — символа на бирже нет."""
+
+    def quote(self, rate: Optional[float], price: Optional[float]) -> Quote:
+        return Quote.make(self.EXCHANGE, self.symbol, rate, price)
+
+    async def fetch_funding_rate(self, session: aiohttp.ClientSession) -> Quote:
+        try:
+            data = await self.request(session)
+        except aiohttp.ClientError:
+            return Quote.error(self.EXCHANGE, self.symbol)
+        try:
+            quote = self.parse(data)
+        except (KeyError, IndexError, TypeError, ValueError, AttributeError):
+            quote = None
+        return quote if quote is not None else Quote.not_supported(self.EXCHANGE, self.symbol)
+
+
+class ContractTickerFetcher(FundingRateFetcher):
+    """Биржи на движке MEXC (MEXC, ourbit, kcex): одинаковый contract API, разные хосты.
+
+    Подкласс задаёт EXCHANGE, TICKER_URL, HISTORY_URL и RENAMED. Фандинг и цена в обоих
+    путях — из ticker (fundingRate и fair price): весь рынок или ?symbol=.
+    """
+
+    TICKER_URL = ""
+    HISTORY_URL = ""
+    # Тикеры, которые биржа всегда ведёт под новым контрактом (XNEW_USDT)
+    RENAMED = ()
+
+    async def fetch_history_funding(self, token, session: aiohttp.ClientSession):
+        token = symbol_registry.native(self.EXCHANGE, token)
+        data = await self.get_json(session, f"{self.HISTORY_URL}?page_num=1&page_size=15&symbol={token}")
+        result = {}
+        for i in range(0, 4):
+            result[Decimal(data['data']['resultList'][i]['fundingRate']).normalize() * 100] = data['data']['resultList'][i]['settleTime']
+
+        return result
+
+    @classmethod
+    async def fetch_all_funding_rates(cls, session: aiohttp.ClientSession) -> QuoteBatch:
+        """Фандинг и mark price по всем контрактам одним запросом."""
+        tickers = {}
+        data = await cls.get_json(session, cls.TICKER_URL)
+        for ticker in data['data']:
+            if ticker['symbol'].endswith('_USDT') and ticker.get('fundingRate') is not None:
+                tickers[ticker['symbol']] = ticker
+        result = QuoteBatch(cls.EXCHANGE)
+        for name, ticker in tickers.items():
+            funding_rate = percent(ticker['fundingRate'])
+            for alias in cls.aliases(name, tickers):
+                result.append(alias, funding_rate, to_float(ticker['fairPrice']))
+        return result
+
+    @classmethod
+    def aliases(cls, name: str, listed: Container[str]) -> List[str]:
+        """Канонические символы, котировкой которых служит контракт name; listed — все контракты ответа.
+
+        XNEW_USDT дублируется под исходным тикером, если старого контракта нет или тикер
+        в RENAMED; старый контракт тикера из RENAMED при живом XNEW_USDT пропускается.
+        Этим же правилом пользуется стрим (streams.MexcStream).
+        """
+        symbol = symbol_registry.resolve(cls.EXCHANGE, name)
+        predecessor = symbol_registry.predecessor(cls.EXCHANGE, name)
+        if predecessor is not None:
+            if (symbol_registry.native(cls.EXCHANGE, predecessor) not in listed
+                    or symbol_registry.base(predecessor) in cls.RENAMED):
+                return [symbol, predecessor]
+        elif (symbol_registry.base(symbol) in cls.RENAMED
+              and symbol_registry.successor(cls.EXCHANGE, symbol) in listed):
+            return []
+        return [symbol]
+
+    async def request(self, session: aiohttp.ClientSession):
+        native = self.native
+        if symbol_registry.base(native) in self.RENAMED:
+            native = symbol_registry.successor(self.EXCHANGE, native)
+        data = await self.get_json(session, f"{self.TICKER_URL}?symbol={native}")
+        if not data.get('data') and native == self.native:
+            # Старого контракта нет — монета торгуется под XNEW_USDT, как и в bulk-пути
+            successor = symbol_registry.successor(self.EXCHANGE, native)
+            if successor is not None:
+                data = await self.get_json(session, f"{self.TICKER_URL}?symbol={successor}")
+        return data
+
+    def parse(self, data) -> Optional[Quote]:
+        ticker = data.get('data')
+        if not ticker or ticker.get('fundingRate') is None:
+            return None
+        return self.quote(percent(ticker['fundingRate']), to_float(ticker['fairPrice']))
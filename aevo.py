@@ -3,74 +3,55 @@ import asyncio
 from aiohttp_socks import ProxyConnector
 from typing import List, Dict, Optional
 from decimal import Decimal
+from symbol_registry import symbol_registry
+from adapter import FundingRateFetcher
+from numeric import percent, to_float
+from quote import Quote, QuoteBatch
 
-class AevoFundingRateFetcher:
+class AevoFundingRateFetcher(FundingRateFetcher):
+    EXCHANGE = "aevo"
     BASE_URL = "https://api.aevo.xyz/funding?instrument_name="
     PRICE_URL = "https://api.aevo.xyz/statistics?asset="
-
-    def __init__(self, symbol: str, proxy: Optional[str] = None):
-        self.symbol = symbol
-        self.proxy = proxy
+    BULK_URL = "https://api.aevo.xyz/coingecko-statistics"
+    # Цена в обоих путях — index price: в coingecko-statistics нет mark price, а statistics отдаёт оба
 
     async def fetch_history_funding(self, token, session: aiohttp.ClientSession):
-        token = token.replace('_USDT', '-PERP')
+        token = symbol_registry.native(self.EXCHANGE, token)
         history_url = f'https://api.aevo.xyz/funding-history?instrument_name={token}&limit=4'
-        async with session.get(history_url) as response:
-            response.raise_for_status()
-            data = await response.text()
-            result = {}
-            try:
-                for i in range(0, 4):
-                    result[Decimal(data['funding_history'][i][2]).normalize() * 100] = data['funding_history'][i][1]
-                return result
-            except Exception as e:
-                pass
-
-    async def fetch_funding_rate(self, session: aiohttp.ClientSession) -> Dict:
-        token = self.symbol.replace('_USDT', '-PERP')
-        url = f"{self.BASE_URL}{token}"
-        token = token.replace('-PERP', '')
-        price_url = f"{self.PRICE_URL}{token}&instrument_type=PERPETUAL"
+        data = await self.get_json(session, history_url)
+        result = {}
         try:
-            async with session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-            async with session.get(price_url) as response:
-                response.raise_for_status()
-                data_price = await response.json()
-            try:
-                if 'funding_rate' in data:
-                    funding_rate = Decimal(f"{data['funding_rate']}")
-                    return {
-                        "ex": "aevo",
-                        "symbol": self.symbol,
-                        "fundingRate": str(funding_rate.normalize() * 100),
-                        "price": data_price['mark_price']
-                    }
-                else:
-                    return {
-                        "ex": "aevo",
-                        "symbol": self.symbol,
-                        "fundingRate": "Not supported",
-                        "price": "Not supported"
-                        # "fundingRate": 0.3
-                    }
-            except Exception as e:
-                return {
-                    "ex": "aevo",
-                    "symbol": self.symbol,
-                    "fundingRate": "Not supported",
-                    "price": "Not supported"
-                    # "fundingRate": 0.3
-                }
-        except aiohttp.ClientError as e:
-            return {
-                "ex": "aevo",
-                "symbol": self.symbol,
-                "fundingRate": "Not supported",
-                "price": "Not supported"
-                # "fundingRate": 0.3
-            }
+            for i in range(0, 4):
+                result[Decimal(data['funding_history'][i][2]).normalize() * 100] = data['funding_history'][i][1]
+            return result
+        except Exception as e:
+            pass
+
+    @classmethod
+    async def fetch_all_funding_rates(cls, session: aiohttp.ClientSession) -> QuoteBatch:
+        """Фандинг и цена по всем перпетуалам одним запросом."""
+        result = QuoteBatch(cls.EXCHANGE)
+        data = await cls.get_json(session, cls.BULK_URL)
+        for market in data:
+            symbol = symbol_registry.resolve(cls.EXCHANGE, market['ticker_id'])
+            if symbol is None or market.get('funding_rate') is None:
+                continue
+            funding_rate = market['funding_rate']
+            result.append(symbol, percent(funding_rate), to_float(market['index_price']))
+        return result
+
+    async def request(self, session: aiohttp.ClientSession):
+        data = await self.get_json(session, f"{self.BASE_URL}{self.native}")
+        data_price = await self.get_json(
+            session, f"{self.PRICE_URL}{symbol_registry.base(self.symbol)}&instrument_type=PERPETUAL"
+        )
+        return data, data_price
+
+    def parse(self, response) -> Optional[Quote]:
+        data, data_price = response
+        if 'funding_rate' in data:
+            return self.quote(percent(data['funding_rate']), to_float(data_price['index_price']))
+        return None
 
 
 def load_data(filename: str) -> List[str]:
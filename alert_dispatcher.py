@@ -0,0 +1,240 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+
+from rate_limiter import TokenBucket
+from metrics import TELEGRAM_SEND
+
+ChatId = Union[int, str]
+ChatKey = Tuple[ChatId, Optional[int]]
+
+# Приоритеты: меньше — раньше
+PRIORITY_HIGH = 0
+PRIORITY_MEDIUM = 1
+PRIORITY_LOW = 2
+
+
+class Alert:
+    __slots__ = ("priority", "seq", "chat_id", "thread_id", "text", "key", "kwargs", "attempts", "created")
+
+    def __init__(self, priority: int, seq: int, chat_id, thread_id: Optional[int], text: str,
+                 key: str, kwargs: Dict):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.thread_id = thread_id
+        self.text = text
+        self.key = key
+        self.kwargs = kwargs
+        self.attempts = 0
+        self.created = time.monotonic()
+
+    def __lt__(self, other: "Alert") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AlertDispatcher:
+    """Очередь уведомлений Telegram с приоритетами и лимитом на каждый чат/тред.
+
+    Цикл сканирования только кладёт сообщение в очередь. Воркеры отправляют его
+    с учётом токен-бакетов треда и всего чата, retry_after из 429 и повторов при сетевых
+    ошибках. Лимит Telegram и flood wait действуют на группу целиком, поэтому треды одной
+    группы делят её бакет и блокировку. Сообщение заблокированного чата воркер не ждёт,
+    а возвращает в очередь к моменту, когда его можно отправить.
+    Повтор не дублирует сообщение: уже доставленные ключи запоминаются.
+    """
+
+    def __init__(self, bot: Bot, maxsize: int = 1000, workers: int = 4,
+                 per_minute: float = 20.0, burst: float = 5.0, max_attempts: int = 5,
+                 remember: int = 10000, chat_per_minute: float = 20.0):
+        self.bot = bot
+        self.maxsize = maxsize
+        self.workers = workers
+        self.per_minute = per_minute
+        self.chat_per_minute = chat_per_minute
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.remember = remember
+        self._heap: List[Alert] = []
+        self._queued_keys: set = set()
+        self._delivered: "OrderedDict[str, None]" = OrderedDict()
+        self._seq = itertools.count()
+        # Число сообщений в куче: воркер ждёт его, а не опрашивает очередь
+        self._items = asyncio.Semaphore(0)
+        # Лимиты треда и всего чата проверяются вместе
+        self.buckets: Dict[ChatKey, TokenBucket] = {}
+        self.blocked_until: Dict[ChatKey, float] = {}
+        self.chat_buckets: Dict[ChatId, TokenBucket] = {}
+        self.chat_blocked_until: Dict[ChatId, float] = {}
+        self._tasks: List[asyncio.Task] = []
+        self.stats = {"enqueued": 0, "sent": 0, "dropped": 0, "duplicates": 0, "retries": 0, "failed": 0,
+                      "retry_after": 0, "deferred": 0}
+        self.last_send_latency = 0.0
+        self.last_queue_wait = 0.0
+
+    # Метрики
+    def depth(self) -> int:
+        return len(self._heap)
+
+    def depth_by_priority(self) -> Dict[int, int]:
+        depth: Dict[int, int] = {}
+        for alert in self._heap:
+            depth[alert.priority] = depth.get(alert.priority, 0) + 1
+        return depth
+
+    def _bucket(self, chat: ChatKey) -> TokenBucket:
+        bucket = self.buckets.get(chat)
+        if bucket is None:
+            bucket = TokenBucket(self.per_minute / 60, self.burst)
+            self.buckets[chat] = bucket
+        return bucket
+
+    def _chat_bucket(self, chat_id: ChatId) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_per_minute / 60, self.burst)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _delay(self, alert: Alert) -> float:
+        """Через сколько секунд сообщение можно отправить: flood wait и бакеты треда и чата."""
+        now = time.monotonic()
+        chat = (alert.chat_id, alert.thread_id)
+        return max(
+            self.blocked_until.get(chat, 0.0) - now,
+            self.chat_blocked_until.get(alert.chat_id, 0.0) - now,
+            self._bucket(chat).delay(),
+            self._chat_bucket(alert.chat_id).delay(),
+        )
+
+    def _push(self, alert: Alert) -> bool:
+        if len(self._heap) >= self.maxsize:
+            # Очередь полна: вытесняем самое неважное, если новое важнее
+            worst = max(self._heap)
+            if not alert < worst:
+                self.stats["dropped"] += 1
+                self._queued_keys.discard(alert.key)
+                logging.warning(f"Очередь уведомлений переполнена, сообщение {alert.key} отброшено")
+                return False
+            self._heap.remove(worst)
+            heapq.heapify(self._heap)
+            self._queued_keys.discard(worst.key)
+            self.stats["dropped"] += 1
+            logging.warning(f"Очередь уведомлений переполнена, вытеснено сообщение {worst.key}")
+            heapq.heappush(self._heap, alert)
+            return True
+        heapq.heappush(self._heap, alert)
+        self._items.release()
+        return True
+
+    def enqueue(self, chat_id, text: str, thread_id: Optional[int] = None,
+                priority: int = PRIORITY_LOW, key: Optional[str] = None, **kwargs) -> bool:
+        """Ставит сообщение в очередь без ожидания; False, если оно отброшено или уже было."""
+        key = key or f"{chat_id}:{thread_id}:{hash(text)}"
+        if key in self._queued_keys or key in self._delivered:
+            self.stats["duplicates"] += 1
+            return False
+        alert = Alert(priority, next(self._seq), chat_id, thread_id, text, key, kwargs)
+        # Ключ занят, пока сообщение в очереди, в отправке или ждёт повтора
+        self._queued_keys.add(key)
+        if not self._push(alert):
+            return False
+        self.stats["enqueued"] += 1
+        return True
+
+    async def _next(self) -> Alert:
+        await self._items.acquire()
+        return heapq.heappop(self._heap)
+
+    async def _send(self, alert: Alert) -> None:
+        # Вызывается, когда _delay() == 0: токены списываются без ожидания
+        self._bucket((alert.chat_id, alert.thread_id)).take()
+        self._chat_bucket(alert.chat_id).take()
+        started = time.monotonic()
+        await self.bot.send_message(
+            chat_id=alert.chat_id, text=alert.text, message_thread_id=alert.thread_id, **alert.kwargs
+        )
+        self.last_send_latency = time.monotonic() - started
+        TELEGRAM_SEND.observe(self.last_send_latency)
+        self.last_queue_wait = started - alert.created
+
+    def _delivered_key(self, key: str) -> None:
+        self._delivered[key] = None
+        while len(self._delivered) > self.remember:
+            self._delivered.popitem(last=False)
+
+    async def _worker(self) -> None:
+        while True:
+            alert = await self._next()
+            delay = self._delay(alert)
+            if delay > 0:
+                # Воркер не спит с чужим сообщением: остальные чаты отправляются без очереди за ним
+                self.stats["deferred"] += 1
+                asyncio.get_running_loop().call_later(delay, self._requeue, alert)
+                continue
+            try:
+                await self._send(alert)
+            except TelegramRetryAfter as e:
+                until = time.monotonic() + e.retry_after
+                # Flood wait — на всю группу: её треды тоже ждут
+                self.blocked_until[(alert.chat_id, alert.thread_id)] = until
+                self.chat_blocked_until[alert.chat_id] = until
+                self.stats["retry_after"] += 1
+                logging.warning(f"Telegram: flood wait {e.retry_after} с для чата {alert.chat_id}")
+                self._retry(alert, count_attempt=False)
+            except (TelegramNetworkError, TelegramServerError, asyncio.TimeoutError) as e:
+                logging.warning(f"Telegram: ошибка отправки {alert.key}: {e}")
+                self._retry(alert)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                self._queued_keys.discard(alert.key)
+                logging.error(f"Telegram: сообщение {alert.key} не отправлено: {e}")
+            else:
+                self.stats["sent"] += 1
+                self._queued_keys.discard(alert.key)
+                self._delivered_key(alert.key)
+
+    def _retry(self, alert: Alert, count_attempt: bool = True) -> None:
+        if count_attempt:
+            alert.attempts += 1
+        if alert.attempts >= self.max_attempts:
+            self.stats["failed"] += 1
+            self._queued_keys.discard(alert.key)
+            logging.error(f"Telegram: сообщение {alert.key} не отправлено после {alert.attempts} попыток")
+            return
+        self.stats["retries"] += 1
+        # Тот же ключ и то же место в приоритете: повтор не создаёт дубликат
+        if not count_attempt:
+            # retry_after: чат заблокирован, воркер отложит сообщение до конца блокировки
+            self._push(alert)
+            return
+        asyncio.get_running_loop().call_later(min(2 ** alert.attempts, 30), self._requeue, alert)
+
+    def _requeue(self, alert: Alert) -> None:
+        self._push(alert)
+
+    async def start(self) -> None:
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Ждёт, пока очередь и повторы опустеют (например, перед остановкой)."""
+        deadline = time.monotonic() + timeout
+        while self._queued_keys and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def close(self, timeout: float = 10.0) -> None:
+        await self.drain(timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,191 @@
+"""Сквозной бенчмарк цикла main() против локального стенда бирж (mock_exchange.py).
+
+Стенд запускается отдельным процессом, бот — в этом процессе с HTTP и Telegram,
+направленными на стенд. Перед каждым циклом стенд создаёт новые спреды, а время
+до уведомления считается от их появления до прихода sendMessage на стенд.
+
+    python benchmark.py --symbols 2000 --cycles 10 --latency 0.05 --jitter 0.02 --json bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import aiohttp
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def _wait_ready(control: aiohttp.ClientSession, url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with control.get(f"{url}/__stats") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            if time.monotonic() > deadline:
+                raise
+        await asyncio.sleep(0.2)
+
+
+async def _stats(control: aiohttp.ClientSession, url: str) -> Dict:
+    async with control.get(f"{url}/__stats") as response:
+        return await response.json()
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_DIR, "mock_exchange.py"), "--port", str(port),
+         "--symbols", str(args.symbols), "--latency", str(args.latency), "--jitter", str(args.jitter),
+         "--error-rate", str(args.error_rate), "--throttle-rate", str(args.throttle_rate)],
+        cwd=REPO_DIR, stdout=subprocess.DEVNULL,
+    )
+    workdir = tempfile.mkdtemp(prefix="funding-bench-")
+    with open(os.path.join(workdir, "coins.txt"), "w", encoding="utf-8") as file:
+        file.write("".join(f"S{i:05d}_USDT\n" for i in range(args.symbols)))
+    os.chdir(workdir)
+    os.environ.setdefault("BOT_TOKEN", "123456:benchmark")
+    sys.path.insert(0, REPO_DIR)
+
+    import main as bot_main
+    from aiogram.client.telegram import TelegramAPIServer
+
+    # Со --streams котировки идут из WebSocket-стенда, REST — только дозапрос пробелов
+    bot_main.USE_STREAMS = args.streams
+    bot_main.http_client.upstream = url
+    bot_main.bot.session.api = TelegramAPIServer.from_base(url)
+    # Спреды — только на биржах, которые опрашивает main()
+    venues = bot_main.exchange_registry.enabled()
+
+    cycles = []
+    async with aiohttp.ClientSession() as control:
+        try:
+            await _wait_ready(control, url)
+            await bot_main.startup()
+            for _ in range(args.cycles):
+                params = {"count": args.spikes, "exchanges": ",".join(venues)}
+                async with control.post(f"{url}/__inject", params=params) as response:
+                    await response.json()
+                before = (await _stats(control, url))["requests"]
+                started = time.perf_counter()
+                # Процессорное время бота: стенд работает в отдельном процессе и сюда не входит
+                cpu_started = time.process_time()
+                await bot_main.main()
+                cpu = time.process_time() - cpu_started
+                wall = time.perf_counter() - started
+                requests = (await _stats(control, url))["requests"] - before
+                cycles.append({"wall": wall, "cpu": cpu, "requests": requests})
+                logging.info(f"Цикл: {wall:.3f} с, CPU {cpu:.3f} с, {requests} запросов")
+            # Уведомления последнего цикла ещё обогащаются и отправляются
+            await bot_main.enrichment_pool.join(args.drain)
+            await bot_main.alert_dispatcher.drain(args.drain)
+            stats = await _stats(control, url)
+        finally:
+            await bot_main.shutdown()
+            await bot_main.bot.session.close()
+            server.terminate()
+            server.wait()
+
+    injected = stats["injected"]
+    first_alert: Dict[str, float] = {}
+    for arrived, _, _, text in stats["messages"]:
+        # Первая строка уведомления: 💲S00001/USDT
+        base = text.split("\n", 1)[0].lstrip("💲").split("/", 1)[0]
+        if base in injected and base not in first_alert:
+            first_alert[base] = arrived - injected[base]
+    walls = [cycle["wall"] for cycle in cycles]
+    cpus = [cycle["cpu"] for cycle in cycles]
+    delays = list(first_alert.values())
+    return {
+        "commit": _commit(),
+        "symbols": args.symbols,
+        "cycles": len(cycles),
+        "latency": args.latency,
+        "jitter": args.jitter,
+        "error_rate": args.error_rate,
+        "throttle_rate": args.throttle_rate,
+        "cycle_wall": {"min": min(walls), "median": statistics.median(walls), "max": max(walls)},
+        "cycle_cpu": {"min": min(cpus), "median": statistics.median(cpus), "max": max(cpus)},
+        "requests": sum(cycle["requests"] for cycle in cycles),
+        "requests_per_second": sum(cycle["requests"] for cycle in cycles) / sum(walls),
+        # ru_maxrss в Linux — килобайты
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "alerts": len(stats["messages"]),
+        "injected": len(injected),
+        "missed": len(injected) - len(first_alert),
+        "time_to_alert": {"median": _percentile(delays, 0.5), "p95": _percentile(delays, 0.95),
+                          "max": max(delays) if delays else float("nan")},
+        "alert_delays": first_alert,
+        "server": {key: stats[key] for key in ("requests", "errors", "throttled", "not_found")},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк цикла мониторинга на локальном стенде бирж")
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--spikes", type=int, default=2, help="новых спредов перед каждым циклом")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--drain", type=float, default=60.0, help="сколько ждать отправки уведомлений, с")
+    parser.add_argument("--streams", action="store_true", help="котировки из WebSocket-стримов стенда")
+    parser.add_argument("--json", help="куда сохранить результат для сравнения между коммитами")
+    args = parser.parse_args()
+    # run() переходит во временный каталог с базами бота
+    json_path = os.path.abspath(args.json) if args.json else None
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    result = asyncio.run(run(args))
+
+    wall = result["cycle_wall"]
+    delay = result["time_to_alert"]
+    print(f"commit {result['commit']}: {result['symbols']} символов, {result['cycles']} циклов")
+    cpu = result["cycle_cpu"]
+    print(f"  цикл: median {wall['median']:.3f} с, min {wall['min']:.3f} с, max {wall['max']:.3f} с")
+    print(f"  CPU цикла: median {cpu['median']:.3f} с, min {cpu['min']:.3f} с, max {cpu['max']:.3f} с")
+    print(f"  запросов: {result['requests']} ({result['requests_per_second']:.1f}/с)")
+    print(f"  peak RSS: {result['peak_rss_mb']:.1f} МБ")
+    print(f"  до уведомления: median {delay['median']:.3f} с, p95 {delay['p95']:.3f} с, max {delay['max']:.3f} с; "
+          f"пропущено {result['missed']} из {result['injected']}")
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
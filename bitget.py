@@ -1,63 +1,53 @@
 import aiohttp
 import asyncio
 from aiohttp_socks import ProxyConnector
+from symbol_registry import symbol_registry
+from adapter import FundingRateFetcher
+from numeric import percent, to_float
+from quote import Quote, QuoteBatch
 from typing import List, Dict, Optional
 from decimal import Decimal
 
-class BitgetFundingRateFetcher:
+class BitgetFundingRateFetcher(FundingRateFetcher):
+    EXCHANGE = "Bitget"
     BASE_URL = "https://api.bitget.com/api/v2/mix/market/current-fund-rate"
     PRICE_URL = "https://api.bitget.com/api/v2/mix/market/symbol-price?productType=usdt-futures&symbol="
-    def __init__(self, symbol: str, proxy: Optional[str] = None):
-        symbol = symbol.replace('_', '')
-        self.symbol = symbol
-        self.proxy = proxy
+    BULK_URL = "https://api.bitget.com/api/v2/mix/market/tickers?productType=USDT-FUTURES"
+    # Цена в обоих путях — mark price: markPrice из tickers и из symbol-price
 
     async def fetch_history_funding(self, token, session: aiohttp.ClientSession):
+        token = symbol_registry.native(self.EXCHANGE, token)
         history_url = f"https://api.bitget.com/api/v2/mix/market/history-fund-rate?symbol={token}&productType=usdt-futures&pageSize=4"
-        async with session.get(history_url) as response:
-            response.raise_for_status()
-            data = await response.json()
-            result = {}
-            if len(data['data'])>3:
-                for i in range(0, 4):
-                    fund_rate = data['data'][i]['fundingRate']
-                    result[Decimal(fund_rate).normalize() * 100] = data['data'][i]['fundingTime']
-                return result
+        data = await self.get_json(session, history_url)
+        result = {}
+        if len(data['data'])>3:
+            for i in range(0, 4):
+                fund_rate = data['data'][i]['fundingRate']
+                result[Decimal(fund_rate).normalize() * 100] = data['data'][i]['fundingTime']
+            return result
 
-    async def fetch_funding_rate(self, session: aiohttp.ClientSession) -> Dict:
-        url = f"{self.BASE_URL}?symbol={self.symbol}&productType=usdt-futures"
-        price_url = f"{self.PRICE_URL}{self.symbol}"
-        try:
-            async with session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-            async with session.get(price_url) as response:
-                response.raise_for_status()
-                data_price = await response.json()
-            if 'data' in data and 'price' in data_price['data'][0]:
-                funding_rate = Decimal(f"{data['data'][0]['fundingRate']}")
-                return {
-                    "ex": "Bitget",
-                    "symbol": self.symbol,
-                    "fundingRate": str(funding_rate.normalize()*100),
-                    "price": data_price['data'][0]['price']
-                }
-            else:
-                return {
-                    "ex": "Bitget",
-                    "symbol": self.symbol,
-                    "fundingRate": "Not supported",
-                    "price": "Not supported"
-                    # "fundingRate": 0.3
-                }
-        except aiohttp.ClientError as e:
-            return {
-                "ex": "Bitget",
-                "symbol": self.symbol,
-                "fundingRate": "Not supported",
-                "price": "Not supported"
-                # "fundingRate": 0.3
-            }
+    @classmethod
+    async def fetch_all_funding_rates(cls, session: aiohttp.ClientSession) -> QuoteBatch:
+        """Фандинг и mark price по всем контрактам одним запросом."""
+        result = QuoteBatch(cls.EXCHANGE)
+        data = await cls.get_json(session, cls.BULK_URL)
+        for ticker in data['data']:
+            symbol = symbol_registry.resolve(cls.EXCHANGE, ticker['symbol'])
+            if symbol is None or not ticker.get('fundingRate'):
+                continue
+            result.append(symbol, percent(ticker['fundingRate']), to_float(ticker['markPrice']))
+        return result
+
+    async def request(self, session: aiohttp.ClientSession):
+        data = await self.get_json(session, f"{self.BASE_URL}?symbol={self.native}&productType=usdt-futures")
+        data_price = await self.get_json(session, f"{self.PRICE_URL}{self.native}")
+        return data, data_price
+
+    def parse(self, response) -> Optional[Quote]:
+        data, data_price = response
+        if 'data' in data and 'markPrice' in data_price['data'][0]:
+            return self.quote(percent(data['data'][0]['fundingRate']), to_float(data_price['data'][0]['markPrice']))
+        return None
 
 
 def load_data(filename: str) -> List[str]:
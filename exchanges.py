@@ -0,0 +1,210 @@
+import importlib
+import logging
+from collections.abc import Mapping
+from enum import IntFlag
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple, Type
+
+
+class Capability(IntFlag):
+    # fetch_all_funding_rates: весь рынок одним запросом
+    BULK = 1
+    # fetch_funding_rate экземпляра: один символ
+    PER_SYMBOL = 2
+    # fetch_history_funding: последние расчёты символа
+    HISTORY = 4
+    # WebSocket-стрим из streams.py
+    STREAM = 8
+
+
+class ExchangeSpec(NamedTuple):
+    """Описание биржи: где лежит адаптер, куда он ходит, формат символа и что он умеет.
+
+    module/fetcher — модуль и класс адаптера (подкласс adapter.BulkFundingRateFetcher, с
+    PER_SYMBOL — adapter.FundingRateFetcher), stream — класс стрима в streams.py. Модули импортируются
+    только когда биржа включена.
+    """
+
+    name: str
+    module: str
+    fetcher: str
+    hosts: Tuple[str, ...]
+    symbol_format: str
+    capabilities: Capability
+    link: Optional[str] = None
+    successor_format: Optional[str] = None
+    stream: Optional[str] = None
+    enabled: bool = True
+
+
+ALL_CAPABILITIES = Capability.BULK | Capability.PER_SYMBOL | Capability.HISTORY | Capability.STREAM
+REST_CAPABILITIES = Capability.BULK | Capability.PER_SYMBOL | Capability.HISTORY
+
+# Порядок — порядок опроса и колонок market_state
+EXCHANGES: List[ExchangeSpec] = [
+    ExchangeSpec("Bitget", "bitget", "BitgetFundingRateFetcher", ("https://api.bitget.com",), "{base}USDT",
+                 ALL_CAPABILITIES, link="https://www.bitget.com/ru/futures/usdt/{symbol}USDT", stream="BitgetStream"),
+    ExchangeSpec("Gate", "gate", "GateFundingRateFetcher", ("https://api.gateio.ws", "https://www.gate.io"),
+                 "{base}_USDT", ALL_CAPABILITIES, link="https://www.gate.io/futures/USDT/{symbol}_USDT",
+                 stream="GateStream"),
+    ExchangeSpec("MEXC", "mexc", "MexcFundingRateFetcher", ("https://futures.mexc.com",), "{base}_USDT",
+                 ALL_CAPABILITIES, link="https://futures.mexc.com/exchange/{symbol}_USDT",
+                 successor_format="{base}NEW_USDT", stream="MexcStream"),
+    ExchangeSpec("ourbit", "ourbit", "OurbitFundingRateFetcher", ("https://futures.ourbit.com",), "{base}_USDT",
+                 REST_CAPABILITIES, link="https://futures.ourbit.com/exchange/{symbol}_USDT",
+                 successor_format="{base}NEW_USDT"),
+    ExchangeSpec("kcex", "kcex", "KcexFundingRateFetcher", ("https://www.kcex.io",), "{base}_USDT",
+                 REST_CAPABILITIES, link="https://www.kcex.io/futures/exchange/{symbol}_USDT",
+                 successor_format="{base}NEW_USDT"),
+    ExchangeSpec("BingX", "BingX", "BingXFundingRateFetcher", ("https://open-api.bingx.com",), "{base}-USDT",
+                 REST_CAPABILITIES, link="https://bingx.com/en/perpetual/{symbol}-USDT/"),
+    ExchangeSpec("Bybit", "Bybit", "BybitFundingRateFetcher", ("https://api.bybit.com",), "{base}USDT",
+                 ALL_CAPABILITIES, link="https://www.bybit.com/trade/usdt/{symbol}USDT", stream="BybitStream"),
+    ExchangeSpec("aevo", "aevo", "AevoFundingRateFetcher", ("https://api.aevo.xyz",), "{base}-PERP",
+                 REST_CAPABILITIES, link="https://app.aevo.xyz/perpetual/{symbol}"),
+    ExchangeSpec("okx", "okx", "OkxFundingRateFetcher", ("https://www.okx.com",), "{base}-USDT-SWAP",
+                 ALL_CAPABILITIES, link="https://www.okx.com/trade-swap/{symbol}-USDT-SWAP", stream="OkxStream"),
+    ExchangeSpec("Hyperliquid", "hyperliquid", "HyperFundingRateFetcher", ("https://api.hyperliquid.xyz",), "{base}",
+                 Capability.BULK | Capability.HISTORY | Capability.STREAM,
+                 link="https://app.hyperliquid.xyz/trade/{symbol}", stream="HyperliquidStream"),
+    ExchangeSpec("kucoin", "kucoin", "KucoinFundingRateFetcher", ("https://api-futures.kucoin.com",), "{base}USDTM",
+                 Capability.BULK | Capability.HISTORY, link="https://www.kucoin.com/futures/trade/{symbol}USDTM"),
+]
+
+
+class FetcherView(Mapping):
+    """Биржа -> класс адаптера для бирж с нужной возможностью; класс импортируется при обращении."""
+
+    def __init__(self, registry: "ExchangeRegistry", capability: Capability):
+        self.registry = registry
+        self.capability = capability
+
+    def _names(self) -> List[str]:
+        return [name for name, spec in self.registry.specs.items() if spec.capabilities & self.capability]
+
+    def __getitem__(self, name: str) -> Type:
+        spec = self.registry.specs[name]
+        if not spec.capabilities & self.capability:
+            raise KeyError(name)
+        return self.registry.fetcher(name)
+
+    def __contains__(self, name) -> bool:
+        spec = self.registry.specs.get(name)
+        return spec is not None and bool(spec.capabilities & self.capability)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._names())
+
+    def __len__(self) -> int:
+        return len(self._names())
+
+
+class ExchangeRegistry:
+    """Описания бирж, их включение и выключение на лету и ленивый импорт адаптеров.
+
+    Цикл опроса каждый раз берёт enabled(), поэтому выключенная биржа перестаёт
+    опрашиваться со следующего цикла, а модуль её адаптера не импортируется вовсе,
+    пока она не включена.
+    """
+
+    def __init__(self, specs: Iterable[ExchangeSpec] = ()):
+        self.specs: Dict[str, ExchangeSpec] = {}
+        self.disabled: Set[str] = set()
+        self._fetchers: Dict[str, Type] = {}
+        self._streams: Dict[str, Type] = {}
+        for spec in specs:
+            self.register(spec)
+
+    def register(self, spec: ExchangeSpec) -> None:
+        if bool(spec.stream) != bool(spec.capabilities & Capability.STREAM):
+            raise ValueError(f"{spec.name}: возможность STREAM и класс стрима задаются вместе")
+        self.specs[spec.name] = spec
+        self._fetchers.pop(spec.name, None)
+        self._streams.pop(spec.name, None)
+        if not spec.enabled:
+            self.disabled.add(spec.name)
+
+    def spec(self, name: str) -> ExchangeSpec:
+        spec = self.specs.get(name)
+        if spec is None:
+            raise ValueError(f"Неизвестная биржа: {name}")
+        return spec
+
+    def find(self, name: str) -> Optional[str]:
+        """Имя биржи без учёта регистра (для команд бота)."""
+        for known in self.specs:
+            if known.lower() == name.lower():
+                return known
+        return None
+
+    def has(self, name: str, capability: Capability) -> bool:
+        return bool(self.spec(name).capabilities & capability)
+
+    def is_enabled(self, name: str) -> bool:
+        return name in self.specs and name not in self.disabled
+
+    def enable(self, name: str) -> None:
+        self.spec(name)
+        if name in self.disabled:
+            self.disabled.discard(name)
+            logging.info(f"Биржа {name} включена")
+
+    def disable(self, name: str) -> None:
+        self.spec(name)
+        if name not in self.disabled:
+            self.disabled.add(name)
+            logging.info(f"Биржа {name} выключена")
+
+    def enabled(self, capability: Optional[Capability] = None) -> List[str]:
+        return [
+            name for name, spec in self.specs.items()
+            if name not in self.disabled and (capability is None or spec.capabilities & capability)
+        ]
+
+    def fetcher(self, name: str) -> Type:
+        """Класс адаптера; модуль импортируется при первом обращении."""
+        fetcher_cls = self._fetchers.get(name)
+        if fetcher_cls is None:
+            spec = self.spec(name)
+            fetcher_cls = getattr(importlib.import_module(spec.module), spec.fetcher)
+            if fetcher_cls.EXCHANGE != name:
+                raise ValueError(f"{spec.module}.{spec.fetcher}: EXCHANGE={fetcher_cls.EXCHANGE!r}, ожидалось {name!r}")
+            if spec.capabilities & Capability.PER_SYMBOL and not hasattr(fetcher_cls, "fetch_funding_rate"):
+                raise ValueError(f"{spec.module}.{spec.fetcher}: PER_SYMBOL без посимвольного пути")
+            self._fetchers[name] = fetcher_cls
+        return fetcher_cls
+
+    def fetchers(self, capability: Optional[Capability] = None) -> List[Type]:
+        """Адаптеры включённых бирж в порядке опроса."""
+        return [self.fetcher(name) for name in self.enabled(capability)]
+
+    def stream(self, name: str) -> Optional[Type]:
+        spec = self.spec(name)
+        if spec.stream is None:
+            return None
+        stream_cls = self._streams.get(name)
+        if stream_cls is None:
+            stream_cls = getattr(importlib.import_module("streams"), spec.stream)
+            self._streams[name] = stream_cls
+        return stream_cls
+
+    def streams(self) -> List[Type]:
+        return [self.stream(name) for name in self.enabled(Capability.STREAM)]
+
+    def view(self, capability: Capability) -> FetcherView:
+        return FetcherView(self, capability)
+
+    # Производные таблицы для модулей, которым нужны данные всех бирж, а не адаптеры
+    def symbol_formats(self) -> Dict[str, str]:
+        return {name: spec.symbol_format for name, spec in self.specs.items()}
+
+    def successor_formats(self) -> Dict[str, str]:
+        return {name: spec.successor_format for name, spec in self.specs.items() if spec.successor_format}
+
+    def hosts(self) -> Dict[str, List[str]]:
+        return {name: list(spec.hosts) for name, spec in self.specs.items()}
+
+    def links(self) -> Dict[str, str]:
+        return {name: spec.link for name, spec in self.specs.items() if spec.link}
+
+
+exchange_registry = ExchangeRegistry(EXCHANGES)
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+
+class FileIndex:
+    """Список строк из файла: кортеж в исходном порядке и frozenset для проверки вхождения.
+
+    Файл перечитывается только при смене mtime или размера. Новое состояние
+    подменяется одним присваиванием, поэтому читатель видит либо старый, либо новый набор.
+    """
+
+    def __init__(self, path: str, normalize: Callable[[str], str] = str.strip):
+        self.path = path
+        self.normalize = normalize
+        # (mtime_ns, размер) или None, если файла нет; строки; индекс
+        self._state: Optional[Tuple[Optional[Tuple[int, int]], Tuple[str, ...], FrozenSet[str]]] = None
+
+    def _signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def refresh(self) -> bool:
+        """Перечитывает файл, если он изменился. Возвращает True, если набор подменён."""
+        signature = self._signature()
+        if self._state is not None and self._state[0] == signature:
+            return False
+        lines: Tuple[str, ...] = ()
+        if signature is not None:
+            try:
+                with open(self.path, "r", encoding="utf-8") as file:
+                    lines = tuple(dict.fromkeys(
+                        value for value in (self.normalize(line) for line in file) if value
+                    ))
+            except FileNotFoundError:
+                signature = None
+        if signature is None and (self._state is None or self._state[0] is not None):
+            logging.warning(f"Файл {self.path} не найден, набор пуст")
+        self._state = (signature, lines, frozenset(lines))
+        if signature is not None:
+            logging.info(f"Загружен {self.path}: {len(lines)} строк")
+        return True
+
+    @property
+    def state(self):
+        if self._state is None:
+            self.refresh()
+        return self._state
+
+    @property
+    def exists(self) -> bool:
+        return self.state[0] is not None
+
+    @property
+    def lines(self) -> Tuple[str, ...]:
+        return self.state[1]
+
+    @property
+    def index(self) -> FrozenSet[str]:
+        return self.state[2]
+
+    def __contains__(self, value: str) -> bool:
+        return value in self.state[2]
+
+    def __len__(self) -> int:
+        return len(self.state[1])
+
+
+class FileWatcher:
+    """Набор FileIndex с фоновой проверкой изменений; горячий путь файлы не читает."""
+
+    def __init__(self, interval: float = 2.0):
+        self.interval = interval
+        self.files: Dict[str, FileIndex] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(self, path: str, normalize: Callable[[str], str] = str.strip) -> FileIndex:
+        index = self.files.get(path)
+        if index is None:
+            index = FileIndex(path, normalize)
+            self.files[path] = index
+        return index
+
+    def watch_all(self, paths: Iterable[str], normalize: Callable[[str], str] = str.strip) -> None:
+        for path in paths:
+            self.watch(path, normalize)
+
+    def __getitem__(self, path: str) -> FileIndex:
+        return self.files[path]
+
+    def get(self, path: str) -> Optional[FileIndex]:
+        return self.files.get(path)
+
+    def _refresh_all(self) -> int:
+        return sum(index.refresh() for index in list(self.files.values()))
+
+    async def refresh(self) -> int:
+        # stat и чтение — в потоке, чтобы не блокировать цикл событий
+        return await asyncio.to_thread(self._refresh_all)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f"Ошибка проверки входных файлов: {e}")
+
+    async def start(self) -> None:
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
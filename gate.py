@@ -1,68 +1,62 @@
 import aiohttp
 import asyncio
-from aiohttp_socks import ProxyConnector
+from proxy_pool import ProxyPool
+from symbol_registry import symbol_registry
+from adapter import FundingRateFetcher
+from numeric import percent, to_float, to_seconds
+from quote import Quote, QuoteBatch
 from typing import List, Dict, Optional
 import time
 from datetime import datetime, timedelta
 from decimal import Decimal
 
-class GateFundingRateFetcher:
+class GateFundingRateFetcher(FundingRateFetcher):
+    EXCHANGE = "Gate"
     BASE_URL = 'https://www.gate.io/futures/usdt/contract'
     PRICE_URL = 'https://www.gate.io/futures/usdt/contract?contract='
+    BULK_URL = 'https://api.gateio.ws/api/v4/futures/usdt/contracts'
+    # Цена в обоих путях — mark price контракта (mark_price)
 
-    def __init__(self, symbol: str, proxy: Optional[str] = None):
-        self.symbol = symbol
-        self.proxy = proxy
-
-    async def fetch_history_funding(self, token, session: aiohttp.ClientSession):
-        token = token.replace('USDT', '_USDT')
+    async def fetch_history_funding(self, token, session: aiohttp.ClientSession, since: Optional[int] = None):
+        token = symbol_registry.native(self.EXCHANGE, token)
         now = datetime.now()
         to_time = datetime(now.year, now.month, now.day, 23, 59, 59)
         from_time = to_time - timedelta(days=15)
 
         from_timestamp = int(time.mktime(from_time.timetuple()))
         to_timestamp = int(time.mktime(to_time.timetuple()))
+        # since (мс) — догрузка после последнего известного расчёта
+        if since:
+            from_timestamp = since // 1000 + 1
 
         history_url = f"https://www.gate.io/apiw/v2/futures/usdt/funding_rate?contract={token}&from={from_timestamp}&to={to_timestamp}"
-        async with session.get(history_url) as response:
-            response.raise_for_status()
-            data = await response.json()
-            result = {}
-            for i in range(0, 4):
-                result[Decimal(data['data'][i]['r']).normalize() * 100] = data['data'][i]['t']
-            return result
-
-    async def fetch_funding_rate(self, session: aiohttp.ClientSession) -> Dict:
-        url = f"{self.BASE_URL}?contract={self.symbol}"
-        price_url = f"{self.PRICE_URL}{self.symbol}"
-        try:
-            async with session.get(price_url) as response:
-                response.raise_for_status()
-                data = await response.json()
-            if 'funding_rate_indicative' in data:
-                return {
-                    "ex": "Gate",
-                    "symbol": self.symbol,
-                    # "fundingRate": 0.3
-                    "fundingRate": str(float(data['funding_rate_indicative']) * 100),
-                    "price": data['index_price']
-                }
-            else:
-                return {
-                    "ex": "Gate",
-                    "symbol": self.symbol,
-                    "fundingRate": "Not supported",
-                    "price": "Not supported"
-                    # "fundingRate": 0.3
-                }
-        except aiohttp.ClientError as e:
-            return {
-                "ex": "Gate",
-                "symbol": self.symbol,
-                "fundingRate": "Not supported",
-                "price": "Not supported"
-                # "fundingRate": 0.3
-            }
+        data = await self.get_json(session, history_url)
+        result = {}
+        for item in data['data'][:4]:
+            result[Decimal(item['r']).normalize() * 100] = item['t']
+        return result
+
+    @classmethod
+    async def fetch_all_funding_rates(cls, session: aiohttp.ClientSession) -> QuoteBatch:
+        """Фандинг и mark price по всем контрактам одним запросом."""
+        result = QuoteBatch(cls.EXCHANGE)
+        data = await cls.get_json(session, cls.BULK_URL)
+        for contract in data:
+            symbol = symbol_registry.resolve(cls.EXCHANGE, contract['name'])
+            if symbol is None or contract.get('in_delisting'):
+                continue
+            funding_rate = contract.get('funding_rate_indicative') or contract['funding_rate']
+            result.append(symbol, percent(funding_rate), to_float(contract['mark_price']),
+                          to_seconds(contract.get('funding_next_apply')))
+        return result
+
+    async def request(self, session: aiohttp.ClientSession):
+        return await self.get_json(session, f"{self.PRICE_URL}{self.native}")
+
+    def parse(self, data) -> Optional[Quote]:
+        if 'funding_rate_indicative' in data:
+            return self.quote(percent(data['funding_rate_indicative']), to_float(data['mark_price']))
+        return None
 
 
 def load_data(filename: str) -> List[str]:
@@ -74,25 +68,13 @@ async def main():
     symbols = load_data("coins.txt")
     proxies = load_data("proxies.txt")
 
-    batch_size = 20
-    tasks = []
-    sessions = []
-
-    for i, symbol in enumerate(symbols):
-        proxy_index = (i // batch_size) % len(proxies)
-        proxy = proxies[proxy_index]
-        headers = {'Accept': 'application/json', 'Content-Type': 'application/json'}
-        connector = ProxyConnector.from_url(proxy) if proxy else aiohttp.TCPConnector()
-        session = aiohttp.ClientSession()
-        sessions.append(session)
-
-        fetcher = GateFundingRateFetcher(symbol, proxy)
-        tasks.append(fetcher.fetch_funding_rate(session))
-
-    results = await asyncio.gather(*tasks)
-
-    for session in sessions:
-        await session.close()
+    # Одна сессия на прокси на весь прогон вместо коннектора на каждый символ
+    pool = ProxyPool()
+    await pool.update(proxies)
+    async with aiohttp.ClientSession() as direct:
+        tasks = [GateFundingRateFetcher(symbol).fetch_funding_rate(pool.session(direct)) for symbol in symbols]
+        results = await asyncio.gather(*tasks)
+    await pool.close()
 
     for result in results:
         print(result)
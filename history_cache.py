@@ -0,0 +1,174 @@
+import asyncio
+import inspect
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Optional, Tuple, Type
+
+import aiohttp
+import aiosqlite
+
+# Интервал фандинга, если по истории его не определить (мс)
+DEFAULT_INTERVAL_MS = 8 * 3600 * 1000
+# Сколько последних расчётов храним на пару (биржа, символ)
+KEEP_POINTS = 16
+# Точек в уведомлении, как и раньше
+SHOW_POINTS = 4
+
+
+def to_ms(timestamp) -> Optional[int]:
+    """Метка времени в миллисекундах из секунд, миллисекунд, микро- или наносекунд."""
+    try:
+        value = int(float(timestamp))
+    except (TypeError, ValueError):
+        return None
+    while value >= 10 ** 14:
+        value //= 1000
+    if value < 10 ** 11:
+        value *= 1000
+    return value
+
+
+class HistoryEntry:
+    __slots__ = ("points", "expires_at")
+
+    def __init__(self, points: List[Tuple[int, str]], expires_at: float):
+        self.points = points  # (время расчёта в мс, ставка в %), новые первыми
+        self.expires_at = expires_at
+
+    def result(self) -> Dict[Decimal, int]:
+        """Формат fetch_history_funding: ставка -> время."""
+        return {Decimal(rate): ts for ts, rate in self.points[:SHOW_POINTS]}
+
+
+class HistoryCache:
+    """Кэш истории фандинга по (биржа, символ) в history.db.
+
+    История меняется только в момент расчёта, поэтому запись живёт до следующего
+    расчёта, а после него догружается только то, что новее последней сохранённой точки.
+    """
+
+    def __init__(self, fetchers: Dict[str, Type], path: str = "history.db", retry: float = 60.0):
+        self.fetchers = fetchers
+        self.path = path
+        self.retry = retry
+        self.entries: Dict[Tuple[str, str], HistoryEntry] = {}
+        self._locks: Dict[Tuple[str, str], asyncio.Lock] = {}
+        self._db: Optional[aiosqlite.Connection] = None
+
+    async def open(self) -> None:
+        self._db = await aiosqlite.connect(self.path)
+        await self._db.execute("""
+            CREATE TABLE IF NOT EXISTS funding_history (
+                exchange TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                ts INTEGER NOT NULL,
+                rate TEXT NOT NULL,
+                PRIMARY KEY (exchange, symbol, ts)
+            )
+        """)
+        await self._db.execute("""
+            CREATE TABLE IF NOT EXISTS history_sync (
+                exchange TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (exchange, symbol)
+            )
+        """)
+        await self._db.commit()
+        async with self._db.execute(
+            "SELECT exchange, symbol, ts, rate FROM funding_history ORDER BY exchange, symbol, ts DESC"
+        ) as cursor:
+            async for exchange, symbol, ts, rate in cursor:
+                self.entries.setdefault((exchange, symbol), HistoryEntry([], 0.0)).points.append((ts, rate))
+        async with self._db.execute("SELECT exchange, symbol, expires_at FROM history_sync") as cursor:
+            async for exchange, symbol, expires_at in cursor:
+                entry = self.entries.get((exchange, symbol))
+                if entry is not None:
+                    entry.expires_at = expires_at
+        logging.info(f"История фандинга: загружено {len(self.entries)} пар из {self.path}")
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+    def _next_settlement(self, points: List[Tuple[int, str]]) -> float:
+        if not points:
+            return time.time() + self.retry
+        interval = points[0][0] - points[1][0] if len(points) > 1 else DEFAULT_INTERVAL_MS
+        if interval <= 0:
+            interval = DEFAULT_INTERVAL_MS
+        expires_at = (points[0][0] + interval) / 1000
+        # Расчёт уже прошёл, но биржа его ещё не опубликовала
+        return expires_at if expires_at > time.time() else time.time() + self.retry
+
+    @staticmethod
+    def _parse(result) -> List[Tuple[int, str]]:
+        points = []
+        if not isinstance(result, dict):
+            return points
+        for rate, timestamp in result.items():
+            ts = to_ms(timestamp)
+            try:
+                rate = Decimal(rate)
+            except (InvalidOperation, TypeError, ValueError):
+                continue  # заглушки вида {"fundingRate": "History Not supported"}
+            if ts is not None:
+                points.append((ts, str(rate)))
+        return points
+
+    async def _fetch(self, exchange: str, symbol: str, since: Optional[int],
+                     session: aiohttp.ClientSession) -> List[Tuple[int, str]]:
+        fetcher_cls = self.fetchers[exchange]
+        fetcher = fetcher_cls(symbol)
+        if since is not None and "since" in inspect.signature(fetcher_cls.fetch_history_funding).parameters:
+            result = await fetcher.fetch_history_funding(symbol, session, since=since)
+        else:
+            result = await fetcher.fetch_history_funding(symbol, session)
+        return self._parse(result)
+
+    async def _store(self, exchange: str, symbol: str, new_points: List[Tuple[int, str]],
+                     expires_at: float, stale: List[int]) -> None:
+        if self._db is None:
+            return
+        await self._db.executemany(
+            "INSERT OR REPLACE INTO funding_history (exchange, symbol, ts, rate) VALUES (?, ?, ?, ?)",
+            [(exchange, symbol, ts, rate) for ts, rate in new_points]
+        )
+        await self._db.executemany(
+            "DELETE FROM funding_history WHERE exchange = ? AND symbol = ? AND ts = ?",
+            [(exchange, symbol, ts) for ts in stale]
+        )
+        await self._db.execute(
+            "INSERT OR REPLACE INTO history_sync (exchange, symbol, expires_at) VALUES (?, ?, ?)",
+            (exchange, symbol, expires_at)
+        )
+        await self._db.commit()
+
+    async def get(self, exchange: str, symbol: str, session: aiohttp.ClientSession) -> Dict[Decimal, int]:
+        """История для уведомления; до следующего расчёта — без запросов к бирже."""
+        key = (exchange, symbol)
+        entry = self.entries.get(key)
+        if entry is not None and time.time() < entry.expires_at:
+            return entry.result()
+
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() < entry.expires_at:
+                return entry.result()
+            known = dict(entry.points) if entry is not None else {}
+            # Инкрементально: только расчёты новее последней сохранённой точки
+            since = max(known) if known else None
+            fetched = await self._fetch(exchange, symbol, since, session)
+
+            new_points = [(ts, rate) for ts, rate in fetched if known.get(ts) != rate]
+            merged = {**known, **dict(fetched)}
+            points = sorted(merged.items(), reverse=True)
+            stale = [ts for ts, _ in points[KEEP_POINTS:]]
+            points = points[:KEEP_POINTS]
+            entry = HistoryEntry(points, self._next_settlement(points))
+            self.entries[key] = entry
+            await self._store(exchange, symbol, new_points, entry.expires_at, stale)
+            return entry.result()
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Dict, Iterable, List, Optional, Type
+
+import aiohttp
+from yarl import URL
+
+from exchanges import exchange_registry
+from rate_limiter import RateLimiter
+from metrics import http_trace_config
+
+# Хосты, к которым ходят фетчеры каждой биржи (из описаний в exchanges.py)
+EXCHANGE_HOSTS: Dict[str, List[str]] = exchange_registry.hosts()
+
+
+def redirected_request(upstream: str) -> Type[aiohttp.ClientRequest]:
+    """Класс запроса, отправляющий https://host/path на {upstream}/host/path (локальный стенд бирж)."""
+    base = upstream.rstrip("/")
+
+    class RedirectedRequest(aiohttp.ClientRequest):
+        def __init__(self, method: str, url: URL, *args, **kwargs):
+            super().__init__(method, URL(f"{base}/{url.raw_host}{url.raw_path_qs}", encoded=True), *args, **kwargs)
+
+    return RedirectedRequest
+
+
+class HttpClientManager:
+    """Долгоживущие HTTP-сессии: по одному пулу соединений на биржу на всё время работы бота."""
+
+    def __init__(self, limiter: Optional[RateLimiter] = None, limit_per_host: int = 50,
+                 keepalive_timeout: float = 75.0, dns_ttl: int = 600, timeout: float = 15.0,
+                 warm_connections: int = 2, upstream: Optional[str] = None):
+        self.limiter = limiter
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        # Без total: ожидание в лимитере не должно съедать таймаут запроса
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self.warm_connections = warm_connections
+        # Адрес mock_exchange.py: все запросы к биржам уходят на него (бенчмарк)
+        self.upstream = upstream
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    def _create_session(self, exchange: str) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_ttl,
+            keepalive_timeout=self.keepalive_timeout,
+            enable_cleanup_closed=True,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers={"Accept-Encoding": "gzip, deflate"},
+            # Трейс метрик после лимитера: ожидание в лимитере не входит в задержку запроса
+            trace_configs=([self.limiter.trace_config(exchange)] if self.limiter else []) + [http_trace_config(exchange)],
+            request_class=redirected_request(self.upstream) if self.upstream else aiohttp.ClientRequest,
+        )
+
+    async def start(self) -> None:
+        for exchange in EXCHANGE_HOSTS:
+            self.session(exchange)
+
+    def session(self, exchange: str) -> aiohttp.ClientSession:
+        session = self._sessions.get(exchange)
+        if session is None or session.closed:
+            session = self._create_session(exchange)
+            self._sessions[exchange] = session
+        return session
+
+    async def _warm_host(self, session: aiohttp.ClientSession, host: str) -> None:
+        try:
+            async with session.head(host, allow_redirects=False) as response:
+                await response.release()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.warning(f"Не удалось прогреть соединение с {host}: {e}")
+
+    async def warm_up(self, exchanges: Optional[Iterable[str]] = None) -> None:
+        """Заранее открывает TCP/TLS-соединения к биржам (по умолчанию ко всем)."""
+        exchanges = list(EXCHANGE_HOSTS) if exchanges is None else list(exchanges)
+        tasks = []
+        for exchange in exchanges:
+            session = self.session(exchange)
+            for host in EXCHANGE_HOSTS[exchange]:
+                tasks.extend(self._warm_host(session, host) for _ in range(self.warm_connections))
+        await asyncio.gather(*tasks)
+        logging.info(f"Прогреты соединения с {len(exchanges)} биржами")
+
+    async def close(self) -> None:
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        await asyncio.gather(*(session.close() for session in sessions if not session.closed))
@@ -3,17 +3,22 @@ import asyncio
 from aiohttp_socks import ProxyConnector
 from typing import List, Dict, Optional
 from decimal import Decimal
+from symbol_registry import symbol_registry
+from adapter import BulkFundingRateFetcher
+from numeric import percent, to_float
+from quote import QuoteBatch
 import time
 from datetime import datetime, timedelta
 
-class HyperFundingRateFetcher:
+class HyperFundingRateFetcher(BulkFundingRateFetcher):
+    EXCHANGE = "Hyperliquid"
     BASE_URL = "https://api.hyperliquid.xyz/info"
-    def __init__(self, symbol):
-        self.symbol = symbol
+    HEADERS = {
+        'Content-Type': 'application/json'
+    }
 
-    async def fetch_history_funding(self, token, session: aiohttp.ClientSession):
-        token = token.replace('_USDT', '')
-        token = token.replace('USDT', '')
+    async def fetch_history_funding(self, token, session: aiohttp.ClientSession, since: Optional[int] = None):
+        token = symbol_registry.native(self.EXCHANGE, token)
         # Определение временных меток
         now = datetime.now()
         to_time = datetime(now.year, now.month, now.day, 23, 59, 59)
@@ -23,46 +28,36 @@ class HyperFundingRateFetcher:
         # Конвертируем в UNIX timestamp
         from_timestamp = int(time.mktime(from_time.timetuple()))
 
-        headers = {
-            'Content-Type': 'application/json'
-        }
         data = {
             'type': 'fundingHistory',
             'coin': token,
-            'startTime': from_timestamp * 1000
+            # since (мс) — догрузка после последнего известного расчёта
+            'startTime': since + 1 if since else from_timestamp * 1000
         }
         try:
-            async with session.post(self.BASE_URL, headers=headers, json=data) as response:
-                response.raise_for_status()
-                data = await response.json()
-                result = {}
-                for i in range(len(data) - 1, len(data) - 5, -1):
-                    result[Decimal(data[i]['fundingRate']).normalize() * 100] = data[i]['time']
-                return result
+            data = await self.post_json(session, self.BASE_URL, json=data)
+            result = {}
+            for i in range(len(data) - 1, max(len(data) - 5, -1), -1):
+                result[Decimal(data[i]['fundingRate']).normalize() * 100] = data[i]['time']
+            return result
         except Exception as e:
             pass
 
-    async def fetch_funding_rate(self, session: aiohttp.ClientSession) -> List:
-        result_list = []
-        headers = {
-            'Content-Type': 'application/json'
-        }
+    @classmethod
+    async def fetch_all_funding_rates(cls, session: aiohttp.ClientSession) -> QuoteBatch:
+        """Фандинг и mark price по всем контрактам одним запросом."""
+        result = QuoteBatch(cls.EXCHANGE)
         data = {
             'type': 'metaAndAssetCtxs'
         }
-        async with session.post(self.BASE_URL, headers=headers, json=data) as response:
-            response.raise_for_status()
-            data = await response.json()
-            for i in range(len(data[0]['universe'])):
-                coin = {
-                    "ex": "hyperliquid",
-                    "symbol": data[0]['universe'][i]['name']+'USDT',
-                    "fundingRate": str(Decimal(data[1][i]['funding']).normalize() * 100),
-                    # "fundingRate": '3.0',
-                    "price": str(data[1][i]['markPx'])
-                }
-                result_list.append(coin)
-        return result_list
+        meta, contexts = await cls.post_json(session, cls.BASE_URL, json=data)
+        # Описание контракта и его котировка идут параллельными списками
+        for asset, context in zip(meta['universe'], contexts):
+            symbol = symbol_registry.resolve(cls.EXCHANGE, asset['name'])
+            if symbol is None:
+                continue
+            result.append(symbol, percent(context['funding']), to_float(context['markPx']))
+        return result
 
 
 
@@ -90,8 +85,8 @@ async def main():
     session = aiohttp.ClientSession()
     sessions.append(session)
     for symb in symbols:
-        symb = symb.replace('_USDT', '')
-        fetcher = HyperFundingRateFetcher(symbols)
+        symb = symbol_registry.native(HyperFundingRateFetcher.EXCHANGE, symb)
+        fetcher = HyperFundingRateFetcher(symb)
         # tasks.append(fetcher.fetch_funding_rate(session))
         tasks.append(fetcher.fetch_history_funding(symb, session))
 
@@ -0,0 +1,216 @@
+"""Бенчмарк разбора bulk-ответов фетчерами: стандартный json против orjson (json_codec).
+
+Ответы записываются один раз (с локального стенда mock_exchange.py или с бирж через --live)
+и затем многократно отдаются фетчерам из памяти, так что измеряется только разбор.
+
+    python json_benchmark.py --symbols 3000 --repeat 20
+    python json_benchmark.py --live --record payloads/   # записать ответы бирж
+    python json_benchmark.py --payloads payloads/        # прогнать записанные
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Dict, List, Tuple
+from urllib.parse import quote
+
+import aiohttp
+from aiohttp import web
+
+import json_codec
+from exchanges import Capability, exchange_registry
+from http_client import redirected_request
+from mock_exchange import MarketModel, MockExchangeServer
+from symbol_registry import symbol_registry
+
+FETCHERS = [exchange_registry.fetcher(name) for name in exchange_registry.specs
+            if exchange_registry.has(name, Capability.BULK)]
+
+
+class RecordedResponse:
+    def __init__(self, body: bytes):
+        self.body = body
+        self.status = 200
+
+    def raise_for_status(self) -> None:
+        pass
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self) -> str:
+        return self.body.decode("utf-8")
+
+    async def json(self):
+        # Как aiohttp: тело в строку и стандартный json
+        return json.loads(self.body.decode("utf-8"))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class RecordedSession:
+    """Вместо aiohttp-сессии: отдаёт записанные тела по (метод, url)."""
+
+    def __init__(self, payloads: Dict[Tuple[str, str], bytes]):
+        self.payloads = payloads
+
+    def get(self, url, **kwargs) -> RecordedResponse:
+        return RecordedResponse(self.payloads[("GET", str(url))])
+
+    def post(self, url, **kwargs) -> RecordedResponse:
+        return RecordedResponse(self.payloads[("POST", str(url))])
+
+
+def _trace_recorder(payloads: Dict[Tuple[str, str], bytes]) -> aiohttp.TraceConfig:
+    async def on_request_end(session, ctx, params):
+        payloads[(params.method, str(params.url))] = await params.response.read()
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_end.append(on_request_end)
+    return trace
+
+
+async def record(fetchers: List, upstream: str = None) -> Dict[str, Dict[Tuple[str, str], bytes]]:
+    """Один реальный bulk-запрос каждого фетчера; тела ответов по биржам."""
+    recorded = {}
+    for fetcher_cls in fetchers:
+        payloads: Dict[Tuple[str, str], bytes] = {}
+        kwargs = {"request_class": redirected_request(upstream)} if upstream else {}
+        async with aiohttp.ClientSession(trace_configs=[_trace_recorder(payloads)], **kwargs) as session:
+            # Тело ответа читается в трейсе, поэтому запись готова и при ошибке разбора
+            try:
+                await fetcher_cls.fetch_all_funding_rates(session)
+            except Exception as e:
+                print(f"{fetcher_cls.EXCHANGE}: {e}")
+        if payloads:
+            recorded[fetcher_cls.EXCHANGE] = payloads
+    return recorded
+
+
+def save(recorded: Dict[str, Dict[Tuple[str, str], bytes]], directory: str) -> None:
+    os.makedirs(directory, exist_ok=True)
+    for exchange, payloads in recorded.items():
+        index = []
+        for number, ((method, url), body) in enumerate(payloads.items()):
+            name = f"{exchange}_{number}.json"
+            with open(os.path.join(directory, name), "wb") as file:
+                file.write(body)
+            index.append({"method": method, "url": url, "file": name})
+        with open(os.path.join(directory, f"{quote(exchange, safe='')}.index"), "w", encoding="utf-8") as file:
+            json.dump(index, file)
+
+
+def load(directory: str) -> Dict[str, Dict[Tuple[str, str], bytes]]:
+    recorded = {}
+    for fetcher_cls in FETCHERS:
+        index_path = os.path.join(directory, f"{quote(fetcher_cls.EXCHANGE, safe='')}.index")
+        if not os.path.exists(index_path):
+            continue
+        with open(index_path, "r", encoding="utf-8") as file:
+            index = json.load(file)
+        payloads = {}
+        for item in index:
+            with open(os.path.join(directory, item["file"]), "rb") as file:
+                payloads[(item["method"], item["url"])] = file.read()
+        recorded[fetcher_cls.EXCHANGE] = payloads
+    return recorded
+
+
+def measure_decode(payloads: Dict[Tuple[str, str], bytes], repeat: int) -> float:
+    """Лучшее время одного только декодирования всех тел ответа."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for body in payloads.values():
+            json_codec.loads(body)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def measure(fetcher_cls, payloads: Dict[Tuple[str, str], bytes], repeat: int) -> Tuple[float, int]:
+    """Лучшее время разбора из repeat прогонов и число котировок."""
+    session = RecordedSession(payloads)
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await fetcher_cls.fetch_all_funding_rates(session)
+        best = min(best, time.perf_counter() - started)
+        count = len(result)
+    return best, count
+
+
+async def run(args: argparse.Namespace) -> List[Dict]:
+    if args.payloads:
+        recorded = load(args.payloads)
+    elif args.live:
+        recorded = await record(FETCHERS)
+    else:
+        model = MarketModel(args.symbols)
+        runner = web.AppRunner(MockExchangeServer(model).app())
+        await runner.setup()
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        symbol_registry.update([f"{base}_USDT" for base in model.bases])
+        try:
+            recorded = await record(FETCHERS, f"http://127.0.0.1:{port}")
+        finally:
+            await runner.cleanup()
+    if args.record:
+        save(recorded, args.record)
+
+    rows = []
+    for fetcher_cls in FETCHERS:
+        payloads = recorded.get(fetcher_cls.EXCHANGE)
+        if not payloads:
+            continue
+        row = {"exchange": fetcher_cls.EXCHANGE, "bytes": sum(len(body) for body in payloads.values())}
+        for name in json_codec.BACKENDS:
+            json_codec.use(name)
+            row[f"{name}_decode"] = measure_decode(payloads, args.repeat)
+            try:
+                row[name], row["quotes"] = await measure(fetcher_cls, payloads, args.repeat)
+            except Exception as e:
+                print(f"{fetcher_cls.EXCHANGE} ({name}): {e}")
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сравнение декодеров JSON на bulk-ответах фетчеров")
+    parser.add_argument("--symbols", type=int, default=3000, help="размер рынка на локальном стенде")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--live", action="store_true", help="записать ответы с настоящих бирж")
+    parser.add_argument("--payloads", help="каталог с записанными ответами")
+    parser.add_argument("--record", help="сохранить ответы в каталог")
+    parser.add_argument("--coins", help="coins.txt для сопоставления символов в записанных ответах")
+    args = parser.parse_args()
+    if args.coins:
+        with open(args.coins, "r", encoding="utf-8") as file:
+            symbol_registry.update([line.strip() for line in file if line.strip()])
+
+    rows = asyncio.run(run(args))
+    # Время в мс: декодирование тела и весь разбор фетчером (декодирование + сборка котировок)
+    columns = [(f"{name}_decode", f"{name} декод") for name in json_codec.BACKENDS]
+    columns += [(name, f"{name} всего") for name in json_codec.BACKENDS]
+    compare = "orjson" in json_codec.BACKENDS
+    print(f"{'биржа':<12} {'КБ':>6} {'котировок':>9} " + " ".join(f"{title:>13}" for _, title in columns)
+          + (f" {'ускорение':>10} {'всего':>7}" if compare else ""))
+    for row in rows:
+        timings = " ".join(f"{row[key] * 1000:>13.2f}" if key in row else f"{'-':>13}" for key, _ in columns)
+        line = f"{row['exchange']:<12} {row['bytes'] / 1024:>6.0f} {row.get('quotes', 0):>9} {timings}"
+        if compare and "orjson" in row and "json" in row:
+            line += f" {row['json_decode'] / row['orjson_decode']:>9.2f}x {row['json'] / row['orjson']:>6.2f}x"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import json
+from typing import Any, Callable, Dict
+
+import aiohttp
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен, без него работает стандартный json
+    orjson = None
+
+
+def _orjson_loads(raw: bytes) -> Any:
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        # orjson не принимает, например, целые больше 64 бит — такое разбирает json
+        return json.loads(raw)
+
+
+BACKENDS: Dict[str, Callable[[bytes], Any]] = {"json": json.loads}
+if orjson is not None:
+    BACKENDS["orjson"] = _orjson_loads
+
+backend = "orjson" if orjson is not None else "json"
+_loads = BACKENDS[backend]
+
+
+def use(name: str) -> None:
+    """Переключает декодер (для бенчмарка и сравнения результатов)."""
+    global backend, _loads
+    _loads = BACKENDS[name]
+    backend = name
+
+
+def loads(raw: bytes) -> Any:
+    return _loads(raw)
+
+
+async def read_json(response: aiohttp.ClientResponse) -> Any:
+    """Тело ответа как JSON: сырые байты сразу в декодер, без text() и проверки content-type."""
+    return _loads(await response.read())
@@ -3,56 +3,57 @@ import asyncio
 from aiohttp_socks import ProxyConnector
 from typing import List, Dict, Optional
 from decimal import Decimal
+from symbol_registry import symbol_registry
+from adapter import BulkFundingRateFetcher
+from numeric import percent, to_float
+from quote import QuoteBatch
 import time
 from datetime import datetime, timedelta
 
-class KucoinFundingRateFetcher:
+class KucoinFundingRateFetcher(BulkFundingRateFetcher):
+    EXCHANGE = "kucoin"
     BASE_URL = "https://api-futures.kucoin.com/api/v1/contracts/active"
 
-    def __init__(self, symbol):
-        self.symbol = symbol
-
-    async def fetch_history_funding(self, token, session: aiohttp.ClientSession):
+    async def fetch_history_funding(self, token, session: aiohttp.ClientSession, since: Optional[int] = None):
         now = datetime.now()
         to_time = datetime(now.year, now.month, now.day, 23, 59, 59)
         from_time = to_time - timedelta(days=2)
         from_timestamp = int(time.mktime(from_time.timetuple())) * 1000
+        # since (мс) — догрузка после последнего известного расчёта
+        if since:
+            from_timestamp = since + 1
         to_timestamp = int(time.mktime(to_time.timetuple())) * 1000
 
-        token = token.replace('_USDT', 'USDT')
-        history_url = f'https://api-futures.kucoin.com/api/v1/contract/funding-rates?symbol={token}M&from={from_timestamp}&to={to_timestamp}'
+        token = symbol_registry.native(self.EXCHANGE, token)
+        history_url = f'https://api-futures.kucoin.com/api/v1/contract/funding-rates?symbol={token}&from={from_timestamp}&to={to_timestamp}'
 
         try:
-            async with session.get(history_url) as response:
-                response.raise_for_status()
-                data = await response.json()
-                result = {}
-                for i in range(0, 4):
-                    result[Decimal(data['data'][i]['fundingRate']).normalize() * 100] = data['data'][i]['timepoint']
-                return result
+            data = await self.get_json(session, history_url)
+            result = {}
+            for item in data['data'][:4]:
+                result[Decimal(item['fundingRate']).normalize() * 100] = item['timepoint']
+            return result
         except Exception as e:
             pass
 
-    async def fetch_funding_rate(self, session: aiohttp.ClientSession) -> List:
-        result_list = []
-        async with session.get(self.BASE_URL) as response:
-            response.raise_for_status()
-            data = await response.json()
-            # print(data)
-            for i in range(len(data['data'])):
-                if data['data'][i]['fundingFeeRate'] == None:
-                    continue
-                symbol = data['data'][i]['symbol']
-                symbol = symbol.replace('USDTM', 'USDT')
-                coin = {
-                    "ex": "kucoin",
-                    "symbol": symbol,
-                    "fundingRate": str(Decimal(data['data'][i]['fundingFeeRate']).normalize() * 100),
-                    # "fundingRate": '3.0',
-                    "price": str(data['data'][i]['indexPrice'])
-                }
-                result_list.append(coin)
-        return result_list
+    @classmethod
+    async def fetch_all_funding_rates(cls, session: aiohttp.ClientSession) -> QuoteBatch:
+        """Фандинг и индексная цена по всем активным контрактам одним запросом."""
+        result = QuoteBatch(cls.EXCHANGE)
+        data = await cls.get_json(session, cls.BASE_URL)
+        now = time.time()
+        for contract in data['data']:
+            funding_fee_rate = contract['fundingFeeRate']
+            if funding_fee_rate is None:
+                continue
+            symbol = symbol_registry.resolve(cls.EXCHANGE, contract['symbol'])
+            if symbol is None:
+                continue
+            # nextFundingRateTime — мс до следующего расчёта, а не момент времени
+            until_funding = to_float(contract.get('nextFundingRateTime'))
+            next_funding = now + until_funding / 1000 if until_funding is not None else None
+            result.append(symbol, percent(funding_fee_rate), to_float(contract['indexPrice']), next_funding)
+        return result
 
 
 
@@ -80,10 +81,10 @@ async def main():
     sessions.append(session)
     for symb in symbols:
         symb = symb.replace('_USDT', 'USDT')
-        fetcher = KucoinFundingRateFetcher(symbols)
+        fetcher = KucoinFundingRateFetcher(symb)
 
         tasks.append(fetcher.fetch_history_funding(symb, session))
-    tasks.append(fetcher.fetch_funding_rate(session))
+    tasks.append(KucoinFundingRateFetcher.fetch_all_funding_rates(session))
     results = await asyncio.gather(*tasks)
 
     for session in sessions:
@@ -1,107 +1,139 @@
 import asyncio
+import json
 import logging
+import os
+import signal
 
-import aiofiles
-import aiohttp
-import aiosqlite
 import time
-from aiogram import Bot, Dispatcher, types, F
+from aiogram import Bot, Dispatcher
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton, CallbackQuery
 from aiogram.filters import CommandStart
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.enums import ParseMode
 from aiogram.client.default import DefaultBotProperties
 from aiogram import Router
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiohttp_socks import ProxyConnector
-from typing import List, Type, Dict
+from typing import List, Type, Dict, FrozenSet, Optional, Tuple
 from decimal import Decimal
-from bitget import BitgetFundingRateFetcher, load_data
-from gate import GateFundingRateFetcher
-from mexc import MexcFundingRateFetcher
-from ourbit import OurbitFundingRateFetcher
-from BingX import BingXFundingRateFetcher
-from Bybit import BybitFundingRateFetcher
-from aevo import AevoFundingRateFetcher
-from hyperliquid import HyperFundingRateFetcher
-from kucoin import KucoinFundingRateFetcher
-from okx import OkxFundingRateFetcher
+from exchanges import exchange_registry, Capability
+from http_client import HttpClientManager, EXCHANGE_HOSTS
+from rate_limiter import RateLimiter
+from proxy_pool import ProxyPool
+from streams import StreamHub
+from market_state import MarketState
+from symbol_registry import symbol_registry
+from history_cache import HistoryCache
+from file_index import FileWatcher
+from storage import Storage
+from alert_dispatcher import AlertDispatcher, PRIORITY_HIGH, PRIORITY_MEDIUM, PRIORITY_LOW
+from spread_engine import EVALUATION_QUORUM, QUOTE_MAX_AGE, evaluate_spreads, alert_tier
+from worker_pool import WorkerPool
+from polling_scheduler import PollingScheduler
+from quote import Quote, QuoteStatus
+from metrics import metrics, MetricsServer, ALERTS, CYCLE_DURATION, NOT_SUPPORTED
+from snapshot_recorder import SnapshotRecorder
+from profiler import CycleProfiler
+from shards import ShardCoordinator, load_shards
 from datetime import datetime
 
-TOKEN = ""
-storage = MemoryStorage()
+# Токен можно задать здесь или в переменной окружения BOT_TOKEN
+TOKEN = os.environ.get("BOT_TOKEN", "")
+# Telegram id администраторов через запятую (команды /profile и /exchange)
+ADMIN_IDS = {int(user_id) for user_id in os.environ.get("ADMIN_IDS", "").split(",") if user_id.strip()}
+# Биржи, выключенные на старте, через запятую (например, "ourbit,kcex"); на лету — /exchange <биржа> off
+DISABLED_EXCHANGES = [name.strip() for name in os.environ.get("DISABLED_EXCHANGES", "").split(",") if name.strip()]
+for _name in DISABLED_EXCHANGES:
+    exchange_registry.disable(_name)
 bot = Bot(token=TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN))
 dp = Dispatcher()
+# Отправка в Telegram идёт из очереди, цикл сканирования её не ждёт
+alert_dispatcher = AlertDispatcher(bot)
+# Уровень спреда -> (тред в чате уведомлений, приоритет отправки)
+ALERT_ROUTES = {
+    "low": (265, PRIORITY_LOW),
+    "medium": (267, PRIORITY_MEDIUM),
+    "high": (269, PRIORITY_HIGH),
+}
 router = Router()
+rate_limiter = RateLimiter(hosts=EXCHANGE_HOSTS)
+http_client = HttpClientManager(rate_limiter)
+proxy_pool = ProxyPool(rate_limiter)
+stream_hub = StreamHub(exchange_registry.streams())
+market_state = MarketState()
+
+# WebSocket-стримы бирж; REST остаётся для бирж без стримов и для пробелов
+USE_STREAMS = True
+# Как долго REST-данные закрывают символы, которых нет в стриме
+REST_GAP_INTERVAL = 60
+# Запись котировок каждого цикла в recordings/ для подбора порогов (по умолчанию выключена)
+RECORD_SNAPSHOTS = False
+# Порт /metrics (Prometheus) внутри процесса бота; None — не поднимать
+METRICS_PORT = 9108
+metrics_server = MetricsServer(port=METRICS_PORT)
+snapshot_recorder = SnapshotRecorder()
+# Профилирование циклов monitor(): /profile [N] от администратора или SIGUSR1.
+# "pstats" — cProfile, "collapsed" — сэмплирование стеков для flamegraph
+PROFILE_DIR = "profiles"
+PROFILE_MODE = "pstats"
+PROFILE_CYCLES = 3
+# Цикл дольше этого (секунды) записывается автоматически; None — не следить
+SLOW_CYCLE_SECONDS = 60
+cycle_profiler = CycleProfiler(PROFILE_DIR, PROFILE_MODE, slow_cycle=SLOW_CYCLE_SECONDS)
+rest_gap_cache: Dict[str, tuple] = {}
+# Символы, опрошенные посимвольно в этом цикле: им назначается следующий опрос после apply_venue
+pending_polls: Dict[str, List[str]] = {}
+
+# При посимвольном опросе холодные символы (далеко от spread_low, спокойные, расчёт не скоро)
+# опрашиваются реже, но не реже раза в MAX_POLL_INTERVAL секунд. Должен быть меньше
+# QUOTE_MAX_AGE, иначе их котировки выпадут из оценки; 0 — опрашивать всё каждый цикл
+MAX_POLL_INTERVAL = 90
+poll_scheduler = PollingScheduler(max_interval=MAX_POLL_INTERVAL)
+# Запись символа, пропущенного планировщиком: котировка в market_state не меняется
+NOT_POLLED = object()
+# Сколько уведомлений обогащается одновременно
+ENRICHMENT_WORKERS = 4
+# Адаптер биржи импортируется при первом запросе её истории
+history_cache = HistoryCache(exchange_registry.view(Capability.HISTORY))
+# Многопроцессный режим (shards.py): биржи опрашивают процессы-шарды, бот оценивает спреды
+# и рассылает уведомления. Список шардов или JSON в переменной окружения SHARDS, например
+# [{"exchanges": ["Bitget", "Gate", "MEXC"]}, {"exchanges": ["Bybit", "okx"], "symbols": [0, 2]}, ...];
+# None — всё в одном процессе
+SHARDS = json.loads(os.environ["SHARDS"]) if os.environ.get("SHARDS") else None
+# Сколько секунд координатор ждёт ответов шардов за цикл
+SHARD_WAIT = 5
+shard_coordinator = ShardCoordinator(load_shards(SHARDS)) if SHARDS else None
+
+storage = Storage()
+
+# Входные файлы читаются фоновым наблюдателем и только при изменении
+COINS_FILE = "coins.txt"
+PROXIES_FILE = "proxies.txt"
+input_files = FileWatcher()
+input_files.watch_all([COINS_FILE, PROXIES_FILE])
+input_files.watch_all(
+    [f"withdrawable_{exchange}.txt" for exchange in exchange_registry.specs],
+    normalize=lambda line: line.strip().upper()
+)
 
 # Инициализация базы данных
-async def add_user(user_id: int):
-    async with aiosqlite.connect("users.db") as db:
-        await db.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
-        await db.commit()
-
-async def get_users():
-    async with aiosqlite.connect("users.db") as db:
-        cursor = await db.execute("SELECT user_id FROM users")
-        users = await cursor.fetchall()
-        return [row[0] for row in users]
-
-async def add_to_blacklist(symbol: str):
-    timestamp = int(time.time()) + 40 * 60
-    async with aiosqlite.connect("users.db") as db:
-        await db.execute("INSERT OR REPLACE INTO blacklist (symbol, timestamp) VALUES (?, ?)", (symbol, timestamp))
-        await db.commit()
-
-async def remove_expired_blacklist():
-    current_time = int(time.time())
-    async with aiosqlite.connect("users.db") as db:
-        await db.execute("DELETE FROM blacklist WHERE timestamp <= ?", (current_time,))
-        await db.commit()
-
-async def get_blacklisted_symbols():
-    async with aiosqlite.connect("users.db") as db:
-        cursor = await db.execute("SELECT symbol FROM blacklist")
-        blacklisted = await cursor.fetchall()
-        return [row[0] for row in blacklisted]
-
-
 async def init_db():
-    async with aiosqlite.connect("settings.db") as db:
-        await db.execute("""
-            CREATE TABLE IF NOT EXISTS settings (
-                id INTEGER PRIMARY KEY,
-                spread_low DECIMAL DEFAULT 0.3,
-                spread_medium DECIMAL DEFAULT 0.7,
-                spread_high DECIMAL DEFAULT 1.0,
-                price_diff DECIMAL DEFAULT 1.0,
-                chat_spread_low INTEGER DEFAULT 10,
-                chat_spread_medium INTEGER DEFAULT 5,
-                chat_spread_high INTEGER DEFAULT 0
-            )
-        """)
-        await db.execute("INSERT OR IGNORE INTO settings (id) VALUES (1)")
-        await db.commit()
-
+    await storage.open()
 
+async def add_user(user_id: int):
+    await storage.add_user(user_id)
 
+async def get_users():
+    return await storage.get_users()
 
 async def get_settings():
-    async with aiosqlite.connect("settings.db") as db:
-        cursor = await db.execute(
-            "SELECT spread_low, spread_medium, spread_high, price_diff, chat_spread_low, chat_spread_medium, chat_spread_high FROM settings WHERE id=1"
-        )
-        settings = await cursor.fetchone()
-        return settings
-
-
+    # Кэш хранилища: обновляется в update_setting, цикл сканирования SQLite не читает
+    return storage.settings
 
 async def update_setting(setting: str, value):
-    async with aiosqlite.connect("settings.db") as db:
-        await db.execute(f"UPDATE settings SET {setting} = ? WHERE id=1", (float(value),))
-        await db.commit()
-
+    await storage.update_setting(setting, float(value))
+    # Пороги поменялись — переоцениваем все символы, а не только изменившиеся
+    market_state.mark_all_dirty()
 
 
 class SettingsState(StatesGroup):
@@ -127,6 +159,48 @@ async def settings(message: Message):
     await message.answer("⚙ Настройки Бота:", reply_markup=keyboard)
 
 
+@dp.message(Command("profile"))
+async def profile(message: Message, command: CommandObject):
+    if message.from_user is None or message.from_user.id not in ADMIN_IDS:
+        return
+    try:
+        cycles = int(command.args) if command.args else PROFILE_CYCLES
+    except ValueError:
+        await message.answer("❌ Использование: /profile [число циклов]")
+        return
+    cycle_profiler.request(cycles)
+    await message.answer(f"🔬 Профилируются следующие {cycle_profiler.pending} циклов, результат в {PROFILE_DIR}/")
+
+
+@dp.message(Command("exchanges"))
+async def exchanges_status(message: Message):
+    if message.from_user is None or message.from_user.id not in ADMIN_IDS:
+        return
+    lines = [f"{'✅' if exchange_registry.is_enabled(name) else '❌'} {name}" for name in exchange_registry.specs]
+    await message.answer("Биржи:\n" + "\n".join(lines))
+
+
+@dp.message(Command("exchange"))
+async def exchange_toggle(message: Message, command: CommandObject):
+    """/exchange <биржа> on|off — включить или выключить биржу со следующего цикла."""
+    if message.from_user is None or message.from_user.id not in ADMIN_IDS:
+        return
+    args = (command.args or "").split()
+    name = exchange_registry.find(args[0]) if args else None
+    if len(args) != 2 or name is None or args[1] not in ("on", "off"):
+        await message.answer(f"❌ Использование: /exchange <{'|'.join(exchange_registry.specs)}> on|off")
+        return
+    if args[1] == "on":
+        exchange_registry.enable(name)
+        await http_client.warm_up([name])
+    else:
+        exchange_registry.disable(name)
+        # Котировки выключенной биржи сразу выходят из оценки, а не через QUOTE_MAX_AGE
+        market_state.drop_exchange(name)
+        rest_gap_cache.pop(name, None)
+    await message.answer(f"{'✅' if args[1] == 'on' else '❌'} {name}: {'включена' if args[1] == 'on' else 'выключена'}")
+
+
 @dp.callback_query()
 async def process_callback(callback_query: CallbackQuery, state: FSMContext):
     chat_id = callback_query.message.chat.id
@@ -190,18 +264,18 @@ async def set_new_value(message: Message, state: FSMContext):
 
 
 
-async def send_alert(message: str, spread_value: Decimal):
-    """ Отправка уведомлений о спредах в нужные чаты """
+async def send_alert(message: str, spread_value: float, key: Optional[str] = None):
+    """ Постановка уведомления о спреде в очередь нужного чата; отправляет alert_dispatcher """
     settings = await get_settings()
     spread_low, spread_medium, spread_high, price_diff, chat_low, chat_medium, chat_high = settings
-    if spread_low <= spread_value < spread_medium:
-        await bot.send_message(chat_id='-1002372495146', text=message, message_thread_id=265, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
-    elif spread_medium <= spread_value < spread_high:
-        await bot.send_message(chat_id='-1002372495146', text=message, message_thread_id=267, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
-    elif spread_value >= spread_high:
-        await bot.send_message(chat_id='-1002372495146', text=message, message_thread_id=269, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
-    else:
+    tier = alert_tier(spread_value, spread_low, spread_medium, spread_high)
+    ALERTS.inc(tier or "none")
+    if tier is None:
         logging.warning("Нет подходящего чата для отправки сообщения")
+        return
+    thread_id, priority = ALERT_ROUTES[tier]
+    alert_dispatcher.enqueue('-1002372495146', message, thread_id=thread_id, priority=priority, key=key,
+                             parse_mode=ParseMode.HTML, disable_web_page_preview=True)
 
 async def send_direct_alert(message: str):
     users = await get_users()
@@ -209,14 +283,9 @@ async def send_direct_alert(message: str):
         logging.warning("Нет подписанных пользователей, сообщение не отправляется.")
         return
 
-    tasks = [asyncio.create_task(bot.send_message(chat_id=user_id, text=message)) for user_id in users]
-    results = await asyncio.gather(*tasks, return_exceptions=True)
-
-    for user_id, result in zip(users, results):
-        if isinstance(result, Exception):
-            logging.error(f"Ошибка отправки сообщения пользователю {user_id}: {result}")
-        else:
-            logging.info(f"Сообщение отправлено пользователю {user_id}")
+    for user_id in users:
+        alert_dispatcher.enqueue(user_id, message, priority=PRIORITY_LOW)
+    logging.info(f"Сообщение поставлено в очередь для {len(users)} пользователей")
 
 
 
@@ -239,325 +308,401 @@ async def start(message: Message):
     print(user_id, thread_id)
     await add_user(user_id)
 
-async def fetch_rates(exchange_cls: Type, symbols: List[str], proxies: List[str]):
-    tasks = []
-    results = []
-    batch_size = 20
-    logging.info(f"Запрос данных для {exchange_cls.__name__} по символам: {symbols}")
+def load_proxies(filename: str = PROXIES_FILE) -> List[str]:
+    return list(input_files.watch(filename).lines)
 
-    async with aiohttp.ClientSession() as session_no_proxy:
-        async with aiohttp.ClientSession() as session_proxy:
-            for i in range(0, len(symbols), batch_size):
-                batch = symbols[i:i + batch_size]
-                logging.info(f"Обрабатываем пакет: {batch}")
-
-                tasks = []
-                for j, symbol in enumerate(batch):
-                    if j < 10:
-                        tasks.append(exchange_cls(symbol).fetch_funding_rate(session_no_proxy))
-                    else:
-                        tasks.append(exchange_cls(symbol).fetch_funding_rate(session_proxy))
+async def fetch_rates(exchange_cls: Type, symbols: List[str]):
+    logging.info(f"Запрос данных для {exchange_cls.__name__} по символам: {symbols}")
 
-                batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-                results.extend(batch_results)
-                logging.info(f"Завершена обработка пакета. Ожидание 2 секунды...")
-                await asyncio.sleep(2)
+    # Темп запросов задаёт rate_limiter сессии, а не пакеты с паузой;
+    # запросы распределяются между прямым выходом и прокси по их здоровью
+    direct = http_client.session(exchange_cls.EXCHANGE)
+    tasks = [exchange_cls(symbol).fetch_funding_rate(proxy_pool.session(direct)) for symbol in symbols]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
 
     logging.info(f"Результаты запроса {exchange_cls.__name__}: {results}")
     return results
 
-async def parse_decimal(value, exchange, field):
-    if value in [None, "Not supported", "", "null"]:
-        return None
-    try:
-        return Decimal(value)
-    except Exception as e:
-        return None
+async def fetch_rest(exchange_cls: Type, symbols: List[str]) -> Dict:
+    """REST-снимок: bulk-запрос, а без него — посимвольный опрос. Ключ — символ без '_'."""
+    exchange = exchange_cls.EXCHANGE
+    if exchange_registry.has(exchange, Capability.BULK):
+        try:
+            bulk_data = await exchange_cls.fetch_all_funding_rates(http_client.session(exchange))
+        except Exception as e:
+            if not exchange_registry.has(exchange, Capability.PER_SYMBOL):
+                raise
+            logging.error(f"Ошибка bulk-запроса {exchange_cls.EXCHANGE}, переходим на посимвольный опрос: {e}")
+        else:
+            logging.info(f"Bulk-снимок {exchange_cls.EXCHANGE}: {len(bulk_data)} контрактов")
+            return bulk_data
+
+    # Посимвольный опрос стоит запроса на символ: опрашиваются только символы, которым пора
+    # по poll_scheduler, остальные помечаются NOT_POLLED и сохраняют прошлые котировки
+    keys = [symbol_registry.canonical(symbol) for symbol in symbols]
+    due = set(poll_scheduler.due(exchange_cls.EXCHANGE, keys)) if MAX_POLL_INTERVAL else set(keys)
+    due_symbols = [symbol for symbol, key in zip(symbols, keys) if key in due]
+    due_keys = [key for key in keys if key in due]
+    results = await fetch_rates(exchange_cls, due_symbols) if due_symbols else []
+    entries = {key: NOT_POLLED for key in keys if key not in due}
+    entries.update(zip(due_keys, results))
+    pending_polls[exchange] = due_keys
+    return entries
+
+async def schedule_polls(exchange: str, entries: Dict) -> None:
+    """Следующий опрос символам, опрошенным в этом цикле, — по спредам с их свежими котировками.
+
+    Вызывается после apply_venue. Символ с ошибкой не планируется: его котировка сброшена,
+    и он опрашивается снова в следующем цикле, а не через интервал планировщика.
+    """
+    polled = pending_polls.pop(exchange, None)
+    if not polled:
+        return
+    answered = [
+        key for key in polled
+        if isinstance(entries.get(key), Quote) and entries[key].status != QuoteStatus.ERROR
+    ]
+    spread_low, spreads = await poll_spreads(answered)
+    poll_scheduler.schedule(exchange, answered, spreads, spread_low)
+
+async def poll_spreads(keys: List[str]) -> Tuple[float, Dict[str, float]]:
+    """spread_low и спреды символов для poll_scheduler; в процессе шарда их даёт координатор."""
+    spread_low = float((await get_settings())[0])
+    return spread_low, market_state.spreads(keys, max_age=QUOTE_MAX_AGE)
+
+async def fetch_snapshot(exchange_cls: Type, symbols: List[str]):
+    """Снимок биржи по символам (ключ — канонический символ): стрим, а пробелы — из REST."""
+    exchange = exchange_cls.EXCHANGE
+    keys = [symbol_registry.canonical(symbol) for symbol in symbols]
+    streamed = stream_hub.snapshot(exchange) if USE_STREAMS else None
+
+    if streamed is None:
+        entries = await fetch_rest(exchange_cls, symbols)
+    else:
+        cached_at, gap_entries = rest_gap_cache.get(exchange, (0.0, {}))
+        if time.time() - cached_at > REST_GAP_INTERVAL:
+            missing = [symbol for symbol, key in zip(symbols, keys) if key not in streamed]
+            try:
+                gap_entries = await fetch_rest(exchange_cls, missing) if missing else {}
+            except Exception as e:
+                # Свежий стрим применяется и без пробелов; дозапрос повторится в следующем цикле
+                logging.error(f"Ошибка REST-дозапроса {exchange} по {len(missing)} символам: {e}")
+                gap_entries = {}
+            else:
+                rest_gap_cache[exchange] = (time.time(), gap_entries)
+        entries = {**gap_entries, **streamed}
+        logging.info(f"{exchange}: из стрима {len(streamed)} символов")
 
+    return entries
 
-async def async_load_withdrawable_symbols(exchange: str) -> set:
-    """Асинхронно загружает список монет, доступных к выводу с биржи."""
-    file_name = f"withdrawable_{exchange}.txt"
+def withdrawable_symbols(exchange: str) -> FrozenSet[str]:
+    """Монеты, доступные к выводу с биржи, из индекса withdrawable_{exchange}.txt."""
+    index = input_files.get(f"withdrawable_{exchange}.txt")
+    return index.index if index is not None else frozenset()
 
-    try:
-        async with aiofiles.open(file_name, "r", encoding="utf-8") as file:
-            content = await file.read()
-            return {line.strip().upper() for line in content.splitlines() if line.strip()}
-    except FileNotFoundError:
-        logging.warning(f"Файл {file_name} не найден, считаем, что вывод недоступен для всех монет.")
-        return set()
-
-exchange_links = {
-    "BingX": "https://bingx.com/en/perpetual/{symbol}-USDT/",
-    "MEXC": "https://futures.mexc.com/exchange/{symbol}_USDT",
-    "Bitget": "https://www.bitget.com/ru/futures/usdt/{symbol}USDT",
-    "Gate": "https://www.gate.io/futures/USDT/{symbol}_USDT",
-    "ourbit": "https://futures.ourbit.com/exchange/{symbol}_USDT",
-    "Bybit": "https://www.bybit.com/trade/usdt/{symbol}USDT",
-    "aevo": "https://app.aevo.xyz/perpetual/{symbol}",
-    "Hyperliquid": "https://app.hyperliquid.xyz/trade/{symbol}",
-    "kucoin": "https://www.kucoin.com/futures/trade/{symbol}USDTM",
-    "okx": "https://www.okx.com/trade-swap/{symbol}-USDT-SWAP"
-}
+exchange_links = exchange_registry.links()
 
 # Формирование ссылок для бирж
 def get_exchange_link(exchange, symbol):
-    symbol_url = symbol.replace('_USDT', '').replace('USDT', '')
+    symbol_url = symbol_registry.base(symbol)
     if exchange in exchange_links:
         return f'<a href="{exchange_links[exchange].format(symbol=symbol_url)}">{exchange}</a>'
     return exchange
 
-async def main():
-    await remove_expired_blacklist()
-    blacklisted_symbols = await get_blacklisted_symbols()
-    symbols = [s for s in load_data("coins.txt") if s not in blacklisted_symbols]
-    proxies = load_data("proxies.txt")
+async def fetch_venue(exchange_cls: Type, symbols: List[str]):
+    """Котировки одной биржи: (биржа, символ -> запись) или (биржа, None) при ошибке."""
+    exchange = exchange_cls.EXCHANGE
+    try:
+        return exchange, await fetch_snapshot(exchange_cls, symbols)
+    except Exception as e:
+        # Старые котировки биржи устареют сами через QUOTE_MAX_AGE
+        logging.error(f"Ошибка получения данных с {exchange}: {e}")
+        return exchange, None
+
+
+async def apply_venue(exchange: str, entries: Dict, keys: List[str]) -> None:
+    """Записывает ответ биржи в market_state; символ без котировки помечается отсутствующим."""
+    logging.info(f"Получены данные {exchange}: {len(entries)} символов")
+    errors = []
+    quotes = []
+    not_supported = 0
+    for symbol in keys:
+        entry = entries.get(symbol)
+        if entry is NOT_POLLED:
+            continue
+        if not isinstance(entry, Quote) or entry.status == QuoteStatus.ERROR:
+            # Исключение из gather или ошибка запроса, которую фетчер перехватил сам
+            if entry is not None:
+                errors.append(entry)
+            else:
+                not_supported += 1
+            market_state.update(symbol, exchange, None, None)
+            continue
+        rate = entry.rate
+        price = entry.price
+        if rate is None:
+            not_supported += 1
+        poll_scheduler.observe(exchange, symbol, rate, entry.next_funding)
+        market_state.update(symbol, exchange, rate, price, entry.ts)
+        quotes.append((symbol, rate, price))
+    if not_supported:
+        NOT_SUPPORTED.inc(exchange, amount=not_supported)
+    if RECORD_SNAPSHOTS:
+        snapshot_recorder.record(exchange, quotes)
+    if errors:
+        logging.error(f"Ошибка получения данных с {exchange} по {len(errors)} символам: {errors[0]}")
 
-    logging.info("Начинаем сбор данных с бирж...")
 
-    exchanges = [BitgetFundingRateFetcher, GateFundingRateFetcher, MexcFundingRateFetcher, OurbitFundingRateFetcher, BingXFundingRateFetcher, BybitFundingRateFetcher, AevoFundingRateFetcher, OkxFundingRateFetcher]
-    tasks = [fetch_rates(exchange, symbols, proxies) for exchange in exchanges]
+def unblocked(coins: List[str], blacklisted_symbols) -> List[str]:
+    """Символы coins.txt без занесённых в чёрный список."""
+    # Чёрный список хранит канонические ключи (BTCUSDT), coins.txt — символы как есть (BTC_USDT)
+    return [s for s in coins if symbol_registry.canonical(s) not in blacklisted_symbols]
 
-    hyperliquidfetcher = HyperFundingRateFetcher(symbols)
-    kucoinfetcher = KucoinFundingRateFetcher(symbols)
-    async with aiohttp.ClientSession() as session:
-        hyperliquid_data = await hyperliquidfetcher.fetch_funding_rate(session)
-        kucoin_data = await kucoinfetcher.fetch_funding_rate(session)
 
-    results = await asyncio.gather(*tasks)
-    logging.info("Полученные данные от бирж:")
-    for result in results:
-        logging.info(result)
+def expire_blacklist():
+    """Снимает истёкшие записи чёрного списка; их символы переоцениваются на текущих котировках."""
+    # Пока символ был в чёрном списке, его изменения отбрасывались: без пометки он ждал бы нового движения цены
+    market_state.mark_dirty(storage.expire_blacklist())
 
-    symbol_rates: Dict[str, Dict[str, Decimal]] = {}
-    symbol_prices: Dict[str, Dict[str, Decimal]] = {}
 
-    for bitget, gate, mexc, ourbit, BingX, Bybit, aevo, okx in zip(*results):
-        if bitget is None or not isinstance(bitget, dict):
-            logging.error(f"Ошибка получения данных с Bitget: {bitget}")
-            continue
-        if gate is None or not isinstance(gate, dict):
-            logging.error(f"Ошибка получения данных с Gate: {gate}")
-            continue
-        if mexc is None or not isinstance(mexc, dict):
-            logging.error(f"Ошибка получения данных с MEXC: {mexc}")
-            continue
-        if ourbit is None or not isinstance(ourbit, dict):
-            logging.error(f"Ошибка получения данных с ourbit: {ourbit}")
-            continue
-        if BingX is None or not isinstance(BingX, dict):
-            logging.error(f"Ошибка получения данных с BingX: {BingX}")
-            continue
-        if Bybit is None or not isinstance(Bybit, dict):
-            logging.error(f"Ошибка получения данных с Bybit: {Bybit}")
-            continue
-        if aevo is None or not isinstance(aevo, dict):
-            logging.error(f"Ошибка получения данных с aevo: {aevo}")
-            continue
-        if okx is None or not isinstance(okx, dict):
-            logging.error(f"Ошибка получения данных с okx: {okx}")
-            continue
+async def main():
+    expire_blacklist()
+    # Живой словарь хранилища: символы, отправленные в этом цикле, сразу в нём
+    blacklisted_symbols = storage.blacklist
+    coins = list(input_files[COINS_FILE].lines)
+    symbol_registry.update(coins)
+    symbols = unblocked(coins, blacklisted_symbols)
+    if shard_coordinator is not None:
+        await apply_shards({symbol_registry.canonical(symbol) for symbol in symbols}, blacklisted_symbols)
+        await storage.flush()
+        return
+    await proxy_pool.update(load_proxies())
+    # Набор бирж читается каждый цикл: /exchange и DISABLED_EXCHANGES меняют его без правки кода
+    venues = exchange_registry.fetchers()
+    if USE_STREAMS:
+        await stream_hub.set_streams(exchange_registry.streams())
+        await stream_hub.resubscribe(coins)
 
-        symbol = bitget.get("symbol", "UNKNOWN").replace("_", "").upper()
-        if symbol in blacklisted_symbols:
-            continue
-        try:
-            rates = {
-                "Bitget": await parse_decimal(bitget.get("fundingRate"), "Bitget", "fundingRate"),
-                "Gate": await parse_decimal(gate.get("fundingRate"), "Gate", "fundingRate"),
-                "MEXC": await parse_decimal(mexc.get("fundingRate"), "MEXC", "fundingRate"),
-                "ourbit": await parse_decimal(ourbit.get("fundingRate"), "ourbit", "fundingRate"),
-                "BingX": await parse_decimal(BingX.get("fundingRate"), "BingX", "fundingRate"),
-                "Bybit": await parse_decimal(Bybit.get("fundingRate"), "Bybit", "fundingRate"),
-                "aevo": await parse_decimal(aevo.get("fundingRate"), "aevo", "fundingRate"),
-                "okx": await parse_decimal(okx.get("fundingRate"), "okx", "fundingRate"),
-            }
-
-            prices = {
-                "Bitget": await parse_decimal(bitget.get("price"), "Bitget", "price"),
-                "Gate": await parse_decimal(gate.get("price"), "Gate", "price"),
-                "MEXC": await parse_decimal(mexc.get("price"), "MEXC", "price"),
-                "ourbit": await parse_decimal(ourbit.get("price"), "ourbit", "price"),
-                "BingX": await parse_decimal(BingX.get("price"), "BingX", "price"),
-                "Bybit": await parse_decimal(Bybit.get("price"), "Bybit", "price"),
-                "aevo": await parse_decimal(aevo.get("price"), "aevo", "price"),
-                "okx": await parse_decimal(okx.get("price"), "okx", "price"),
-            }
-
-
-            hyperliquid_entry = next((entry for entry in hyperliquid_data if entry["symbol"] == symbol), None)
-            if hyperliquid_entry:
-                rates["Hyperliquid"] = await parse_decimal(hyperliquid_entry["fundingRate"], "Hyperliquid",
-                                                           "fundingRate")
-                prices["Hyperliquid"] = await parse_decimal(hyperliquid_entry["price"], "Hyperliquid", "price")
-
-            kucoin_entry = next((entry for entry in kucoin_data if entry["symbol"] == symbol), None)
-            if kucoin_entry:
-                rates["kucoin"] = await parse_decimal(kucoin_entry["fundingRate"], "kucoin",
-                                                           "fundingRate")
-                prices["kucoin"] = await parse_decimal(kucoin_entry["price"], "kucoin", "price")
+    logging.info("Начинаем сбор данных с бирж...")
 
-        except Exception as e:
-                logging.error(f"Ошибка при обработке данных для {symbol}: {e} {bitget.get('fundingRate'), gate.get('fundingRate'), mexc.get('fundingRate'), ourbit.get('fundingRate'), BingX.get('fundingRate'), Bybit.get('fundingRate'), aevo.get('fundingRate'), okx.get('fundingRate')}")
-                continue
-
-        symbol_rates[symbol] = rates
-        symbol_prices[symbol] = prices
-
-    max_spreads = {}  # Словарь для хранения информации о максимальном спреде для каждой монеты
-
-    for symbol, rates in symbol_rates.items():
-        exchanges = list(rates.keys())
-        for i in range(len(exchanges)):
-            for j in range(i + 1, len(exchanges)):
-                ex1, ex2 = exchanges[i], exchanges[j]
-                rate1, rate2 = rates[ex1], rates[ex2]
-                price1, price2 = symbol_prices[symbol][ex1], symbol_prices[symbol][ex2]
-
-                if rate1 is None or rate2 is None:
-                    continue
-
-                settings = await get_settings()
-                spread_low, spread_medium, spread_high, price_diff, chat_low, chat_medium, chat_high = settings
-
-                spread = abs(rate1 - rate2)
-                price_diff_percent = abs((price1 - price2) / min(price1, price2) * 100) if min(price1,
-                                                                                               price2) > 0 else 100
-
-                if spread > Decimal(spread_low) and price_diff_percent <= float(price_diff):
-                    if symbol not in max_spreads or spread > max_spreads[symbol]["spread"]:
-                        max_spreads[symbol] = {
-                            "spread": spread,
-                            "ex1": ex1,
-                            "ex2": ex2,
-                            "rate1": rate1,
-                            "rate2": rate2,
-                            "price1": price1,
-                            "price2": price2,
-                            "price_diff_percent": price_diff_percent
-                        }
-
-    # Отправляем только одно уведомление для каждой монеты с максимальным спредом
+    # Ответы бирж соединяются по символу по мере прихода: медленная биржа не задерживает
+    # остальных, а биржа без котировки просто отсутствует в строке символа
+    keys = [symbol_registry.canonical(symbol) for symbol in symbols]
+    active_symbols = set(keys)
+    quorum = min(EVALUATION_QUORUM, len(venues))
+    reported = 0
+    for venue in asyncio.as_completed([fetch_venue(exchange_cls, symbols) for exchange_cls in venues]):
+        exchange, entries = await venue
+        # Биржу могли выключить, пока шёл её запрос
+        if entries is not None and exchange_registry.is_enabled(exchange):
+            await apply_venue(exchange, entries, keys)
+            await schedule_polls(exchange, entries)
+        reported += 1
+        # Оценку запускаем, когда ответило достаточно бирж, и повторяем по каждой следующей
+        if reported >= quorum:
+            await evaluate_and_alert(active_symbols, blacklisted_symbols)
+    # Чёрный список за цикл — одной транзакцией
+    await storage.flush()
+
+
+async def apply_shards(active_symbols: set, blacklisted_symbols: Dict[str, int]):
+    """Цикл координатора: ответы шардов за SHARD_WAIT секунд, оценка и состояние для шардов."""
+    venues = await shard_coordinator.collect(SHARD_WAIT)
+    for exchange, entries, keys in venues:
+        if exchange_registry.is_enabled(exchange):
+            await apply_venue(exchange, entries, keys)
+    # Кворум, как в одном процессе: пока не ответило достаточно бирж, спреды не оцениваются
+    quorum = min(EVALUATION_QUORUM, len(shard_coordinator.exchanges))
+    if venues and len(shard_coordinator.reported) >= quorum:
+        await evaluate_and_alert(active_symbols, blacklisted_symbols)
+    spread_low = float((await get_settings())[0])
+    await shard_coordinator.broadcast(
+        spread_low, market_state.spreads(list(active_symbols), max_age=QUOTE_MAX_AGE),
+        frozenset(blacklisted_symbols), frozenset(exchange_registry.disabled)
+    )
+
+
+async def evaluate_and_alert(active_symbols: set, blacklisted_symbols: Dict[str, int]):
+    # Настройки читаются один раз на оценку, а не на каждую пару бирж
+    spread_low, spread_medium, spread_high, price_diff, chat_low, chat_medium, chat_high = await get_settings()
+
+    # Переоцениваем только символы, котировки которых изменились с прошлой оценки
+    candidates = [
+        symbol for symbol in market_state.drain_dirty()
+        if symbol not in blacklisted_symbols and symbol in active_symbols
+    ]
+    rates, prices = market_state.matrix(candidates, max_age=QUOTE_MAX_AGE)
+    # Символ -> пара бирж с максимальным спредом
+    max_spreads = evaluate_spreads(
+        candidates, market_state.exchanges, rates, prices, float(spread_low), float(price_diff)
+    )
+
+    # Отправляем только одно уведомление для каждой монеты с максимальным спредом.
+    # Сбор истории и отправка идут в фоновых воркерах, цикл их не ждёт
     for symbol, data in max_spreads.items():
-        await add_to_blacklist(symbol)
-        ex1, ex2 = data["ex1"], data["ex2"]
-        rate1, rate2 = data["rate1"], data["rate2"]
-        price1, price2 = data["price1"], data["price2"]
-        price_diff_percent = data["price_diff_percent"]
-
-        withdrawable_ex1, withdrawable_ex2 = await asyncio.gather(
-            async_load_withdrawable_symbols(ex1),
-            async_load_withdrawable_symbols(ex2)
-        )
-        can_withdraw_ex1 = symbol in withdrawable_ex1 if withdrawable_ex1 else True
-        can_withdraw_ex2 = symbol in withdrawable_ex2 if withdrawable_ex2 else True
-
-        withdraw_status = {
-            ex1: " Вывод: ✅" if can_withdraw_ex1 else " Вывод: ❌",
-            ex2: " Вывод: ✅" if can_withdraw_ex2 else " Вывод: ❌"
-        }
-
-        symbol_print = symbol.replace('_USDT', '').replace('USDT', '')
-
-        ex1_risk = get_exchange_link(ex1, symbol)
-        ex2_risk = get_exchange_link(ex2, symbol)
-
-        if ex1 == 'ourbit':
-            ex1_risk += ' - 🚩 high risk'
-        if ex2 == 'ourbit':
-            ex2_risk += ' - 🚩 high risk'
-
-        # Получение истории фандинга для выбранных бирж
-        history_data = {}
-        fetchers = {
-            "Bitget": BitgetFundingRateFetcher(symbol),
-            "Gate": GateFundingRateFetcher(symbol),
-            "MEXC": MexcFundingRateFetcher(symbol),
-            "ourbit": OurbitFundingRateFetcher(symbol),
-            "BingX": BingXFundingRateFetcher(symbol),
-            "Bybit": BybitFundingRateFetcher(symbol),
-            "aevo": AevoFundingRateFetcher(symbol),
-            "Hyperliquid": HyperFundingRateFetcher(symbol),
-            "kucoin": KucoinFundingRateFetcher(symbol),
-            "okx": OkxFundingRateFetcher(symbol),
-        }
-
-        async with aiohttp.ClientSession() as session:
-            tasks = []
-            for exchange in [ex1, ex2]:
-                if exchange in fetchers:
-                    tasks.append(fetchers[exchange].fetch_history_funding(symbol, session))
-
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        for exchange, result in zip([ex1, ex2], results):
-            if isinstance(result, Exception):
-                logging.error(f"Ошибка при получении истории {exchange} для {symbol}: {result}")
-            else:
-                history_data[exchange] = result
-        spread = abs(rate1 - rate2)
-        # Формирование уведомления
-        message = (
-            f"💲{symbol_print}/USDT\n\n"
-            f"📊 <b>Биржи:</b> {ex1_risk} ↔️ {ex2_risk}\n\n"
-            f"📈 <b>Фандинг:</b>\n\n"
-            f"  {ex1}: {rate1:.4f}%\n"
-            f"  {ex2}: {rate2:.4f}%\n\n"
-            f"<b>Спред</b>: {spread:.5f}\n\n"
-            f"💰 <b>Цена:</b>\n\n"
-            f"  {ex1}: ({float(price1):.5f}$)\n"
-            f"  {ex2}: ({float(price2):.5f}$)\n\n"
-            f"⚖ <b>Разница цен:</b> {price_diff_percent:.2f}%\n\n"
-            f"🕰 <b>История фандинга:</b>\n"
-        )
+        storage.blacklist_add(symbol)
+        market_state.forget(symbol)
+        key = f"{symbol}:{data['ex1']}:{data['ex2']}:{blacklisted_symbols.get(symbol)}"
+        enrichment_pool.submit((symbol, data, key))
+
+
+async def enrich_alert(opportunity: tuple):
+    """ Обогащение найденного спреда (вывод, история фандинга) и постановка уведомления в очередь """
+    symbol, data, key = opportunity
+    ex1, ex2 = data["ex1"], data["ex2"]
+    rate1, rate2 = data["rate1"], data["rate2"]
+    price1, price2 = data["price1"], data["price2"]
+    price_diff_percent = data["price_diff_percent"]
+
+    withdrawable_ex1, withdrawable_ex2 = withdrawable_symbols(ex1), withdrawable_symbols(ex2)
+    can_withdraw_ex1 = symbol in withdrawable_ex1 if withdrawable_ex1 else True
+    can_withdraw_ex2 = symbol in withdrawable_ex2 if withdrawable_ex2 else True
+
+    withdraw_status = {
+        ex1: " Вывод: ✅" if can_withdraw_ex1 else " Вывод: ❌",
+        ex2: " Вывод: ✅" if can_withdraw_ex2 else " Вывод: ❌"
+    }
 
-        for exchange, data in history_data.items():
-            message += f"\n{exchange}:\n\n"
+    symbol_print = symbol_registry.base(symbol)
 
-            # Преобразуем данные в список кортежей (timestamp, rate)
-            parsed_data = []
-            for rate, timestamp in data.items():
-                try:
-                    timestamp = int(timestamp)
-                    if len(str(timestamp)) == 13:
-                        timestamp = timestamp // 1000  # Преобразование миллисекунд в секунды
-                    parsed_data.append((timestamp, float(rate)))
-                except ValueError as e:
-                    logging.error(f"Ошибка при обработке timestamp {timestamp} для {exchange}: {e}")
+    ex1_risk = get_exchange_link(ex1, symbol)
+    ex2_risk = get_exchange_link(ex2, symbol)
 
-            # Сортируем по timestamp в порядке убывания (сначала самые новые)
-            parsed_data.sort(reverse=True, key=lambda x: x[0])
+    if ex1 == 'ourbit':
+        ex1_risk += ' - 🚩 high risk'
+    if ex2 == 'ourbit':
+        ex2_risk += ' - 🚩 high risk'
 
-            # Формируем сообщение
-            for timestamp, rate in parsed_data:
-                formatted_time = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
-                message += f"{rate:.4f}% ({formatted_time})\n"
+    # История фандинга из кэша: к бирже идём только после нового расчёта
+    history_data = {}
+    history_exchanges = [exchange for exchange in (ex1, ex2) if exchange in history_cache.fetchers]
+    results = await asyncio.gather(
+        *(history_cache.get(exchange, symbol, http_client.session(exchange)) for exchange in history_exchanges),
+        return_exceptions=True
+    )
 
-        logging.info(f"Отправка уведомления: {message}")
-        await send_alert(message, spread)
+    for exchange, result in zip(history_exchanges, results):
+        if isinstance(result, Exception):
+            logging.error(f"Ошибка при получении истории {exchange} для {symbol}: {result}")
+        else:
+            history_data[exchange] = result
+    spread = abs(rate1 - rate2)
+    # Формирование уведомления
+    message = (
+        f"💲{symbol_print}/USDT\n\n"
+        f"📊 <b>Биржи:</b> {ex1_risk} ↔️ {ex2_risk}\n\n"
+        f"📈 <b>Фандинг:</b>\n\n"
+        f"  {ex1}: {rate1:.4f}%\n"
+        f"  {ex2}: {rate2:.4f}%\n\n"
+        f"<b>Спред</b>: {spread:.5f}\n\n"
+        f"💰 <b>Цена:</b>\n\n"
+        f"  {ex1}: ({float(price1):.5f}$)\n"
+        f"  {ex2}: ({float(price2):.5f}$)\n\n"
+        f"⚖ <b>Разница цен:</b> {price_diff_percent:.2f}%\n\n"
+        f"🕰 <b>История фандинга:</b>\n"
+    )
+
+    for exchange, data in history_data.items():
+        message += f"\n{exchange}:\n\n"
+
+        # Преобразуем данные в список кортежей (timestamp, rate)
+        parsed_data = []
+        for rate, timestamp in data.items():
+            try:
+                timestamp = int(timestamp)
+                if len(str(timestamp)) == 13:
+                    timestamp = timestamp // 1000  # Преобразование миллисекунд в секунды
+                parsed_data.append((timestamp, float(rate)))
+            except ValueError as e:
+                logging.error(f"Ошибка при обработке timestamp {timestamp} для {exchange}: {e}")
+
+        # Сортируем по timestamp в порядке убывания (сначала самые новые)
+        parsed_data.sort(reverse=True, key=lambda x: x[0])
+
+        # Формируем сообщение
+        for timestamp, rate in parsed_data:
+            formatted_time = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+            message += f"{rate:.4f}% ({formatted_time})\n"
+
+    logging.info(f"Отправка уведомления: {message}")
+    await send_alert(message, spread, key=key)
+
+
+enrichment_pool = WorkerPool(enrich_alert, workers=ENRICHMENT_WORKERS, name="enrichment_pool")
+
+metrics.gauge(
+    "funding_queue_depth", "Глубина очередей: уведомления по приоритету и обогащение", ("queue",),
+    collect=lambda: {
+        **{(f"alerts_priority_{priority}",): depth for priority, depth in alert_dispatcher.depth_by_priority().items()},
+        ("alerts",): alert_dispatcher.depth(),
+        ("enrichment",): enrichment_pool.depth(),
+        ("enrichment_active",): enrichment_pool.active,
+    },
+)
 
 
 async def monitor():
     while True:
         try:
             logging.info("Запуск основного цикла мониторинга...")
-            await main()
-            await asyncio.sleep(5)
+            started = time.perf_counter()
+            with cycle_profiler.cycle():
+                await main()
+            CYCLE_DURATION.observe(time.perf_counter() - started)
+            # Координатор шардов и так ждёт их ответов в collect()
+            if shard_coordinator is None:
+                await asyncio.sleep(5)
         except Exception as e:
             logging.error(f"Ошибка в monitor(): {e}")
 
 
+async def startup():
+    """ Открытие сессий, баз и фоновых задач; вызывается перед первым циклом main() """
+    await http_client.start()
+    await asyncio.gather(init_db(), http_client.warm_up(exchange_registry.enabled()), history_cache.open(), input_files.start(),
+                         alert_dispatcher.start(), enrichment_pool.start())
+    # Идентификаторы инструментов на всех биржах считаются один раз на старте
+    coins = list(input_files[COINS_FILE].lines)
+    symbol_registry.update(coins)
+    if USE_STREAMS and shard_coordinator is None:
+        await stream_hub.start(coins, http_client.session)
+    if shard_coordinator is not None:
+        await shard_coordinator.start()
+    if RECORD_SNAPSHOTS:
+        await snapshot_recorder.start()
+    if METRICS_PORT:
+        await metrics_server.start()
+    if hasattr(signal, "SIGUSR1"):
+        # kill -USR1 <pid> — профилировать следующие PROFILE_CYCLES циклов
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, cycle_profiler.request, PROFILE_CYCLES)
+
+
+async def shutdown():
+    if hasattr(signal, "SIGUSR1"):
+        asyncio.get_running_loop().remove_signal_handler(signal.SIGUSR1)
+    if shard_coordinator is not None:
+        await shard_coordinator.close()
+    await stream_hub.close()
+    # Сначала дообогатить найденное, затем отправить очередь уведомлений
+    await enrichment_pool.close()
+    await alert_dispatcher.close()
+    await asyncio.gather(http_client.close(), proxy_pool.close(), history_cache.close(), input_files.close(),
+                         storage.close(), snapshot_recorder.close(), metrics_server.close())
+
+
 if __name__ == "__main__":
 
     dp.include_router(router)
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
     async def main_app():
-        await asyncio.gather(
-            init_db(),
-            monitor(),
-            dp.start_polling(bot)
-        )
+        try:
+            await startup()
+            await asyncio.gather(
+                monitor(),
+                dp.start_polling(bot)
+            )
+        finally:
+            await shutdown()
 
     asyncio.run(main_app())
-
@@ -0,0 +1,172 @@
+import math
+import sys
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+NAN = float("nan")
+
+
+def _same(old: float, new: float, tolerance: float = 0.0) -> bool:
+    if math.isnan(old) or math.isnan(new):
+        return math.isnan(old) and math.isnan(new)
+    if tolerance:
+        return abs(new - old) <= tolerance * max(abs(old), abs(new))
+    return old == new
+
+
+class MarketState:
+    """Долгоживущее состояние рынка: последние фандинг и цена по (символ, биржа).
+
+    Каждая биржа — колонка из трёх array('d') (ставка, цена, время источника),
+    строка — символ. Отсутствующее значение хранится как NaN. Символы, у которых
+    значения изменились с прошлой оценки, копятся в dirty.
+    """
+
+    def __init__(self, exchanges: Iterable[str] = (), price_tolerance: float = 1e-4):
+        # Движение цены меньше price_tolerance (доля) не делает символ изменившимся
+        self.price_tolerance = price_tolerance
+        self.exchanges: List[str] = []
+        self.exchange_index: Dict[str, int] = {}
+        self.symbols: List[str] = []
+        self.symbol_index: Dict[str, int] = {}
+        self.rates: List[array] = []
+        self.prices: List[array] = []
+        self.timestamps: List[array] = []
+        self.dirty: Set[str] = set()
+        for exchange in exchanges:
+            self._exchange_column(exchange)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def _exchange_column(self, exchange: str) -> int:
+        column = self.exchange_index.get(exchange)
+        if column is None:
+            column = len(self.exchanges)
+            self.exchanges.append(exchange)
+            self.exchange_index[exchange] = column
+            size = len(self.symbols)
+            self.rates.append(array('d', [NAN]) * size)
+            self.prices.append(array('d', [NAN]) * size)
+            self.timestamps.append(array('d', [NAN]) * size)
+        return column
+
+    def _symbol_row(self, symbol: str) -> int:
+        row = self.symbol_index.get(symbol)
+        if row is None:
+            symbol = sys.intern(symbol)
+            row = len(self.symbols)
+            self.symbols.append(symbol)
+            self.symbol_index[symbol] = row
+            for column in range(len(self.exchanges)):
+                self.rates[column].append(NAN)
+                self.prices[column].append(NAN)
+                self.timestamps[column].append(NAN)
+        return row
+
+    def update(self, symbol: str, exchange: str, rate: Optional[float], price: Optional[float],
+               ts: Optional[float] = None) -> bool:
+        """Записывает котировку; None означает, что биржа символ не отдаёт. Возвращает True при изменении."""
+        column = self._exchange_column(exchange)
+        row = self._symbol_row(symbol)
+        rate = NAN if rate is None else rate
+        price = NAN if price is None else price
+        rates, prices = self.rates[column], self.prices[column]
+        changed = not _same(rates[row], rate) or not _same(prices[row], price, self.price_tolerance)
+        if changed:
+            rates[row] = rate
+            prices[row] = price
+            self.dirty.add(self.symbols[row])
+        self.timestamps[column][row] = time.time() if ts is None else ts
+        return changed
+
+    def quotes(self, symbol: str, max_age: Optional[float] = None) -> Dict[str, Tuple[float, float]]:
+        """Биржа -> (ставка, цена) для бирж с известной ставкой, в порядке добавления бирж."""
+        row = self.symbol_index.get(symbol)
+        if row is None:
+            return {}
+        now = time.time()
+        result = {}
+        for column, exchange in enumerate(self.exchanges):
+            rate = self.rates[column][row]
+            if math.isnan(rate):
+                continue
+            if max_age is not None and now - self.timestamps[column][row] > max_age:
+                continue
+            result[exchange] = (rate, self.prices[column][row])
+        return result
+
+    def matrix(self, symbols: List[str], max_age: Optional[float] = None,
+               now: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Матрицы ставок и цен символ x биржа (колонки — self.exchanges) без копирования хранилища.
+
+        now — текущее время для проверки max_age (по умолчанию time.time(), в реплее — время симуляции).
+        """
+        rows = np.array([self.symbol_index[symbol] for symbol in symbols], dtype=np.intp)
+        if not self.exchanges:
+            empty = np.empty((len(rows), 0))
+            return empty, empty
+        rates = np.column_stack([np.frombuffer(column, dtype=np.float64) for column in self.rates])[rows]
+        prices = np.column_stack([np.frombuffer(column, dtype=np.float64) for column in self.prices])[rows]
+        if max_age is not None:
+            timestamps = np.column_stack([np.frombuffer(column, dtype=np.float64) for column in self.timestamps])[rows]
+            stale = ~((time.time() if now is None else now) - timestamps <= max_age)
+            rates[stale] = np.nan
+        return rates, prices
+
+    def spreads(self, symbols: List[str], max_age: Optional[float] = None,
+                now: Optional[float] = None) -> Dict[str, float]:
+        """Разброс ставок (максимум - минимум по свежим котировкам) по символам; NaN, если бирж меньше двух."""
+        result = dict.fromkeys(symbols, NAN)
+        known = [symbol for symbol in symbols if symbol in self.symbol_index]
+        if not known or not self.exchanges:
+            return result
+        rates, _ = self.matrix(known, max_age, now)
+        # fmax/fmin пропускают NaN без предупреждений о пустых строках
+        spread = np.fmax.reduce(rates, axis=1) - np.fmin.reduce(rates, axis=1)
+        spread[np.count_nonzero(~np.isnan(rates), axis=1) < 2] = np.nan
+        result.update(zip(known, spread.tolist()))
+        return result
+
+    def age(self, symbol: str, exchange: str) -> float:
+        row = self.symbol_index.get(symbol)
+        column = self.exchange_index.get(exchange)
+        if row is None or column is None:
+            return math.inf
+        ts = self.timestamps[column][row]
+        return math.inf if math.isnan(ts) else time.time() - ts
+
+    def forget(self, symbol: str) -> None:
+        """Сбрасывает котировки символа, чтобы следующее обновление снова сделало его изменившимся."""
+        row = self.symbol_index.get(symbol)
+        if row is None:
+            return
+        for column in range(len(self.exchanges)):
+            self.rates[column][row] = NAN
+            self.prices[column][row] = NAN
+        self.dirty.discard(symbol)
+
+    def drop_exchange(self, exchange: str) -> None:
+        """Сбрасывает все котировки биржи (биржу выключили) — до следующего обновления её нет в оценке."""
+        column = self.exchange_index.get(exchange)
+        if column is None:
+            return
+        size = len(self.symbols)
+        self.rates[column] = array('d', [NAN]) * size
+        self.prices[column] = array('d', [NAN]) * size
+        self.timestamps[column] = array('d', [NAN]) * size
+
+    def mark_dirty(self, symbols: Iterable[str]) -> None:
+        """Символы переоцениваются в следующий раз, даже если их котировки не менялись."""
+        self.dirty.update(symbol for symbol in symbols if symbol in self.symbol_index)
+
+    def mark_all_dirty(self) -> None:
+        self.dirty.update(self.symbols)
+
+    def drain_dirty(self) -> Set[str]:
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
@@ -0,0 +1,244 @@
+import logging
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import aiohttp
+from aiohttp import web
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Sequence) -> LabelValues:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: ожидались метки {self.labelnames}, получено {labels}")
+        return tuple(str(label) for label in labels)
+
+    def samples(self) -> Iterable[str]:
+        return ()
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self.values.items():
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Gauge(Metric):
+    """Значение задаётся set() или считается при каждом запросе /metrics функцией collect."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Dict[LabelValues, float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[LabelValues, float] = {}
+        self.collect = collect
+
+    def set(self, value: float, *labels) -> None:
+        self.values[self._key(labels)] = value
+
+    def samples(self) -> Iterable[str]:
+        values = self.values
+        if self.collect is not None:
+            try:
+                values = {tuple(str(label) for label in key): value for key, value in self.collect().items()}
+            except Exception as e:
+                logging.error(f"Ошибка сбора метрики {self.name}: {e}")
+                values = {}
+        for key, value in values.items():
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # метки -> (счётчики по корзинам, сумма, количество)
+        self.values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, *labels) -> None:
+        key = self._key(labels)
+        entry = self.values.get(key)
+        if entry is None:
+            entry = [[0] * len(self.buckets), 0.0, 0]
+            self.values[key] = entry
+        counts = entry[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        for key, (counts, total, count) in self.values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {count}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {count}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              collect: Optional[Callable[[], Dict[LabelValues, float]]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, collect))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+HTTP_LATENCY = metrics.histogram(
+    "funding_http_request_duration_seconds", "Время запроса к бирже без ожидания в лимитере",
+    ("exchange", "endpoint"),
+)
+HTTP_RESPONSES = metrics.counter("funding_http_responses_total", "Ответы бирж по статусу", ("exchange", "status"))
+HTTP_EXCEPTIONS = metrics.counter(
+    "funding_http_exceptions_total", "Исключения при запросах к биржам", ("exchange", "exception")
+)
+NOT_SUPPORTED = metrics.counter(
+    "funding_not_supported_total", "Символы без котировки в ответе биржи (Not supported)", ("exchange",)
+)
+CYCLE_DURATION = metrics.histogram(
+    "funding_cycle_duration_seconds", "Длительность цикла main()", buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+)
+ALERTS = metrics.counter("funding_alerts_total", "Найденные спреды по уровню уведомления", ("tier",))
+TELEGRAM_SEND = metrics.histogram("funding_telegram_send_duration_seconds", "Время вызова sendMessage")
+SHARD_RESTARTS = metrics.counter("funding_shard_restarts_total", "Перезапуски упавших процессов-шардов", ("shard",))
+
+
+def endpoint_label(path: str) -> str:
+    """Путь без идентификатора инструмента в конце (/contract/deals/BTC_USDT -> /contract/deals)."""
+    prefix, _, last = path.rpartition("/")
+    if prefix and last and any(char.isupper() for char in last) and not any(char.islower() for char in last):
+        return prefix
+    return path
+
+
+def http_trace_config(exchange: Optional[str] = None,
+                      host_exchanges: Optional[Dict[str, str]] = None) -> aiohttp.TraceConfig:
+    """Трейс задержек и статусов; ставится после лимитера, чтобы не считать ожидание в нём."""
+    host_exchanges = host_exchanges or {}
+
+    def label(url) -> str:
+        return exchange if exchange is not None else host_exchanges.get(url.host, url.host)
+
+    async def on_request_start(session, ctx, params):
+        ctx.metrics_started = time.perf_counter()
+
+    async def on_request_end(session, ctx, params):
+        name = label(params.url)
+        HTTP_LATENCY.observe(time.perf_counter() - ctx.metrics_started, name, endpoint_label(params.url.path))
+        HTTP_RESPONSES.inc(name, params.response.status)
+
+    async def on_request_exception(session, ctx, params):
+        HTTP_EXCEPTIONS.inc(label(params.url), type(params.exception).__name__)
+
+    trace = aiohttp.TraceConfig()
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_exception)
+    return trace
+
+
+class MetricsServer:
+    """Небольшое aiohttp-приложение внутри процесса бота: GET /metrics в текстовом формате Prometheus."""
+
+    def __init__(self, registry: MetricsRegistry = metrics, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        return web.Response(text=self.registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            # Без метрик бот работает дальше
+            logging.error(f"Не удалось открыть порт метрик {self.port}: {e}")
+            await self.close()
+            return
+        logging.info(f"Метрики доступны на http://{self.host}:{self.port}/metrics")
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
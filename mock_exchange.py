@@ -0,0 +1,595 @@
+"""Локальный стенд бирж для бенчмарка: те же эндпоинты и формат ответов, что используют фетчеры.
+
+Запросы приходят как /{хост биржи}/{путь} (см. http_client.redirected_request), плюс
+Telegram Bot API (/bot{token}/sendMessage) и служебные /__stats, /__inject, /__config.
+WebSocket-стримы бирж (streams.py) отвечают по тем же путям: снимок на подписку, дельты
+после inject() и полный снимок раз в stream_refresh секунд; /__drop_streams рвёт соединения.
+
+    python mock_exchange.py --port 8899 --symbols 5000 --latency 0.05 --jitter 0.02 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from aiohttp import WSMsgType, web
+
+from exchanges import Capability, exchange_registry
+from http_client import EXCHANGE_HOSTS
+from symbol_registry import SYMBOL_FORMATS
+
+# Хост -> биржа
+HOST_EXCHANGES: Dict[str, str] = {
+    urlsplit(url).netloc: exchange for exchange, urls in EXCHANGE_HOSTS.items() for url in urls
+}
+# Хост WebSocket-стрима -> биржа
+STREAM_HOSTS: Dict[str, str] = {
+    urlsplit(exchange_registry.stream(exchange).URL).hostname: exchange
+    for exchange in exchange_registry.specs if exchange_registry.has(exchange, Capability.STREAM)
+}
+SETTLEMENT_MS = 8 * 3600 * 1000
+
+
+class MarketModel:
+    """Синтетический рынок: ставка (доля, как в API) и цена по (биржа, монета).
+
+    inject() выбирает монеты, которые ещё не отстреливали, и задирает ставку на одной
+    бирже — это спред, на который бот должен прислать уведомление.
+    """
+
+    def __init__(self, n_symbols: int = 1000, exchanges: Optional[List[str]] = None, seed: int = 1):
+        self.rng = random.Random(seed)
+        self.exchanges = exchanges or list(SYMBOL_FORMATS)
+        self.bases = [f"S{i:05d}" for i in range(n_symbols)]
+        self.rates: Dict[str, Dict[str, float]] = {}
+        self.prices: Dict[str, Dict[str, float]] = {}
+        for exchange in self.exchanges:
+            self.rates[exchange] = {base: self.rng.gauss(0.0001, 0.00005) for base in self.bases}
+        for base in self.bases:
+            price = self.rng.uniform(0.01, 1000)
+            for exchange in self.exchanges:
+                self.prices.setdefault(exchange, {})[base] = price * (1 + self.rng.gauss(0, 0.0001))
+        # Нативный ID инструмента -> монета
+        self.natives: Dict[str, Dict[str, str]] = {
+            exchange: {SYMBOL_FORMATS[exchange].format(base=base): base for base in self.bases}
+            for exchange in self.exchanges
+        }
+        self._fresh = list(reversed(self.bases))
+        self.injected: Dict[str, float] = {}
+        self.version = 0
+
+    def native(self, exchange: str, base: str) -> str:
+        return SYMBOL_FORMATS[exchange].format(base=base)
+
+    def base(self, exchange: str, native: Optional[str]) -> Optional[str]:
+        return self.natives[exchange].get(native or "")
+
+    def inject(self, count: int, rate: float = 0.01, exchanges: Optional[List[str]] = None) -> Dict[str, float]:
+        """Спред rate (доля) на count новых монетах; возвращает монета -> время (unix)."""
+        now = time.time()
+        spikes = {}
+        for _ in range(min(count, len(self._fresh))):
+            base = self._fresh.pop()
+            exchange = self.rng.choice(exchanges or self.exchanges)
+            self.rates[exchange][base] = rate
+            self.injected[base] = now
+            spikes[base] = now
+        self.version += 1
+        return spikes
+
+    def history(self, exchange: str, base: str, count: int = 4) -> List[Tuple[int, float]]:
+        """(время расчёта в мс, ставка) по последним расчётам, новые первыми."""
+        last = int(time.time() * 1000) // SETTLEMENT_MS * SETTLEMENT_MS
+        rate = self.rates[exchange].get(base, 0.0001)
+        return [(last - i * SETTLEMENT_MS, rate) for i in range(count)]
+
+
+def _json(data) -> web.Response:
+    return web.Response(body=json.dumps(data).encode(), content_type="application/json")
+
+
+class MockExchangeServer:
+    """aiohttp-приложение стенда с задержкой, джиттером, ошибками 5xx и ответами 429."""
+
+    def __init__(self, model: MarketModel, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, retry_after: int = 1,
+                 stream_interval: float = 0.1, stream_refresh: float = 10.0):
+        self.model = model
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        # Как часто стрим проверяет изменения рынка и шлёт полный снимок, с
+        self.stream_interval = stream_interval
+        self.stream_refresh = stream_refresh
+        self.rng = random.Random(2)
+        self.stats = {"requests": 0, "errors": 0, "throttled": 0, "not_found": 0, "stream_connections": 0}
+        # Открытые стримы и подписки (нативные символы) последнего соединения каждой биржи
+        self.streams: Set[web.WebSocketResponse] = set()
+        self.subscriptions: Dict[str, Set[str]] = {}
+        self.by_exchange: Dict[str, int] = {}
+        # (время прихода, chat_id, thread_id, текст) для sendMessage
+        self.messages: List[Tuple[float, str, Optional[str], str]] = []
+        self._bulk_cache: Dict[Tuple[str, str], Tuple[int, bytes]] = {}
+        self.routes: Dict[Tuple[str, str], Callable] = {
+            ("Bitget", "/api/v2/mix/market/tickers"): self.bitget_tickers,
+            ("Bitget", "/api/v2/mix/market/current-fund-rate"): self.bitget_rate,
+            ("Bitget", "/api/v2/mix/market/symbol-price"): self.bitget_price,
+            ("Bitget", "/api/v2/mix/market/history-fund-rate"): self.bitget_history,
+            ("Gate", "/api/v4/futures/usdt/contracts"): self.gate_contracts,
+            ("Gate", "/futures/usdt/contract"): self.gate_contract,
+            ("Gate", "/apiw/v2/futures/usdt/funding_rate"): self.gate_history,
+            ("BingX", "/openApi/swap/v2/quote/premiumIndex"): self.bingx_premium,
+            ("BingX", "/openApi/swap/v2/quote/fundingRate"): self.bingx_history,
+            ("Bybit", "/v5/market/tickers"): self.bybit_tickers,
+            ("Bybit", "/v5/market/funding/history"): self.bybit_history,
+            ("aevo", "/coingecko-statistics"): self.aevo_statistics,
+            ("aevo", "/funding"): self.aevo_rate,
+            ("aevo", "/statistics"): self.aevo_price,
+            ("aevo", "/funding-history"): self.aevo_history,
+            ("okx", "/api/v5/public/funding-rate"): self.okx_rate,
+            ("okx", "/api/v5/public/mark-price"): self.okx_price,
+            ("okx", "/api/v5/public/funding-rate-history"): self.okx_history,
+            ("Hyperliquid", "/info"): self.hyperliquid_info,
+            ("kucoin", "/api/v1/contracts/active"): self.kucoin_active,
+            ("kucoin", "/api/v1/contract/funding-rates"): self.kucoin_history,
+        }
+        # Стримы: разбор подписки (нативные символы или None для пинга) и сообщения с котировками
+        self.stream_formats: Dict[str, Tuple[Callable, Callable]] = {
+            "Bybit": (self.bybit_subscription, self.bybit_push),
+            "okx": (self.okx_subscription, self.okx_push),
+            "Bitget": (self.bitget_subscription, self.bitget_push),
+            "Gate": (self.gate_subscription, self.gate_push),
+            "MEXC": (self.mexc_subscription, self.mexc_push),
+            "Hyperliquid": (self.hyperliquid_subscription, self.hyperliquid_push),
+        }
+        # MEXC, ourbit и kcex отличаются только префиксом пути
+        for exchange, prefix in (("MEXC", "/api/v1/contract"), ("ourbit", "/api/v1/contract"),
+                                 ("kcex", "/fapi/v1/contract")):
+            self.routes[(exchange, f"{prefix}/ticker")] = self.mexc_ticker
+            self.routes[(exchange, f"{prefix}/funding_rate/history")] = self.mexc_history
+
+    # Служебное
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.faults])
+        app.router.add_get("/__stats", self.handle_stats)
+        app.router.add_post("/__inject", self.handle_inject)
+        app.router.add_post("/__config", self.handle_config)
+        app.router.add_post("/__drop_streams", self.handle_drop_streams)
+        app.router.add_post("/bot{token}/{method}", self.handle_telegram)
+        app.router.add_route("*", "/{host}/{tail:.*}", self.handle_exchange)
+        return app
+
+    @web.middleware
+    async def faults(self, request: web.Request, handler):
+        if request.path.startswith("/__") or request.path.startswith("/bot"):
+            return await handler(request)
+        self.stats["requests"] += 1
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.throttle_rate and self.rng.random() < self.throttle_rate:
+            self.stats["throttled"] += 1
+            return web.Response(status=429, headers={"Retry-After": str(self.retry_after)})
+        if self.error_rate and self.rng.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.Response(status=502)
+        return await handler(request)
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return _json({**self.stats, "by_exchange": self.by_exchange, "messages": self.messages,
+                      "injected": self.model.injected})
+
+    async def handle_inject(self, request: web.Request) -> web.Response:
+        count = int(request.query.get("count", "1"))
+        rate = float(request.query.get("rate", "0.01"))
+        exchanges = [name for name in request.query.get("exchanges", "").split(",") if name]
+        return _json(self.model.inject(count, rate, exchanges))
+
+    async def handle_config(self, request: web.Request) -> web.Response:
+        for name in ("latency", "jitter", "error_rate", "throttle_rate"):
+            if name in request.query:
+                setattr(self, name, float(request.query[name]))
+        return _json({"latency": self.latency, "jitter": self.jitter, "error_rate": self.error_rate,
+                      "throttle_rate": self.throttle_rate})
+
+    async def handle_drop_streams(self, request: web.Request) -> web.Response:
+        return _json({"dropped": await self.drop_streams()})
+
+    async def handle_telegram(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        method = request.match_info["method"]
+        if method.lower() == "sendmessage":
+            self.messages.append((time.time(), form.get("chat_id"), form.get("message_thread_id"),
+                                  form.get("text", "")))
+        return _json({"ok": True, "result": {
+            "message_id": len(self.messages), "date": int(time.time()),
+            "chat": {"id": int(form.get("chat_id", 0) or 0), "type": "supergroup"},
+            "text": form.get("text", ""),
+        }})
+
+    async def handle_exchange(self, request: web.Request) -> web.Response:
+        if request.headers.get("Upgrade", "").lower() == "websocket":
+            exchange = STREAM_HOSTS.get(request.match_info["host"])
+            if exchange is None:
+                self.stats["not_found"] += 1
+                return web.Response(status=404)
+            return await self.handle_stream(request, exchange)
+        exchange = HOST_EXCHANGES.get(request.match_info["host"])
+        path = "/" + request.match_info["tail"]
+        if exchange is None:
+            self.stats["not_found"] += 1
+            return web.Response(status=404)
+        self.by_exchange[exchange] = self.by_exchange.get(exchange, 0) + 1
+        if request.method == "HEAD":
+            return web.Response()
+        handler = self.routes.get((exchange, path))
+        if handler is None:
+            # Символ последним сегментом пути: {prefix}/{symbol}
+            prefix, _, native = path.rpartition("/")
+            handler = self.routes.get((exchange, prefix))
+            if handler is None:
+                self.stats["not_found"] += 1
+                return web.Response(status=404)
+            return await handler(request, exchange, native)
+        return await handler(request, exchange)
+
+    def _bulk(self, exchange: str, name: str, build: Callable[[], object]) -> web.Response:
+        """Ответы на весь рынок кэшируются до следующего inject()."""
+        cached = self._bulk_cache.get((exchange, name))
+        if cached is None or cached[0] != self.model.version:
+            cached = (self.model.version, json.dumps(build()).encode())
+            self._bulk_cache[(exchange, name)] = cached
+        return web.Response(body=cached[1], content_type="application/json")
+
+    def _market(self, exchange: str):
+        model = self.model
+        rates, prices = model.rates[exchange], model.prices[exchange]
+        return ((model.native(exchange, base), rates[base], prices[base]) for base in model.bases)
+
+    # Стримы
+    async def handle_stream(self, request: web.Request, exchange: str) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.streams.add(ws)
+        self.stats["stream_connections"] += 1
+        subscription, push = self.stream_formats[exchange]
+        subscribed: Set[str] = set()
+        self.subscriptions[exchange] = subscribed
+        pusher = asyncio.create_task(self._push_changes(ws, exchange, subscribed))
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    natives = subscription(json.loads(msg.data))
+                except ValueError:
+                    natives = None  # "ping" строкой у okx и Bitget
+                if natives is None:
+                    await ws.send_str("pong")
+                    continue
+                natives = [native for native in natives if native not in subscribed]
+                subscribed.update(natives)
+                # Снимок на подписку — со всеми полями
+                await self._send_stream(ws, push(exchange, natives, False))
+        finally:
+            pusher.cancel()
+            self.streams.discard(ws)
+        return ws
+
+    async def _push_changes(self, ws: web.WebSocketResponse, exchange: str, subscribed: Set[str]) -> None:
+        """После inject() — дельты по подписанным символам, раз в stream_refresh — полный снимок."""
+        version = self.model.version
+        refreshed = time.monotonic()
+        push = self.stream_formats[exchange][1]
+        while not ws.closed:
+            await asyncio.sleep(self.stream_interval)
+            full = time.monotonic() - refreshed >= self.stream_refresh
+            if self.model.version == version and not full:
+                continue
+            version = self.model.version
+            if full:
+                refreshed = time.monotonic()
+            await self._send_stream(ws, push(exchange, list(subscribed), not full))
+
+    @staticmethod
+    async def _send_stream(ws: web.WebSocketResponse, messages: Iterable[Dict]) -> None:
+        for message in messages:
+            if ws.closed:
+                return
+            await ws.send_str(json.dumps(message))
+
+    async def drop_streams(self) -> int:
+        """Рвёт все открытые стримы (проверка переподключения и повторной подписки)."""
+        sockets = list(self.streams)
+        for ws in sockets:
+            await ws.close()
+        return len(sockets)
+
+    def _stream_rows(self, exchange: str, natives: Iterable[str]):
+        model = self.model
+        for native in natives:
+            base = model.base(exchange, native)
+            if base is not None:
+                yield native, model.rates[exchange][base], model.prices[exchange][base]
+
+    # Дельта (delta=True) у Bybit и okx — только ставка, цену бот берёт из прошлого сообщения
+    def bybit_subscription(self, message: Dict) -> Optional[List[str]]:
+        if message.get("op") != "subscribe":
+            return None
+        return [topic[len("tickers."):] for topic in message["args"]]
+
+    def bybit_push(self, exchange: str, natives: Iterable[str], delta: bool) -> List[Dict]:
+        return [
+            {"topic": f"tickers.{native}", "type": "delta" if delta else "snapshot",
+             "data": {"symbol": native, "fundingRate": str(rate), **({} if delta else {"markPrice": str(price)})}}
+            for native, rate, price in self._stream_rows(exchange, natives)
+        ]
+
+    def okx_subscription(self, message: Dict) -> Optional[List[str]]:
+        if message.get("op") != "subscribe":
+            return None
+        return list(dict.fromkeys(arg["instId"] for arg in message["args"]))
+
+    def okx_push(self, exchange: str, natives: Iterable[str], delta: bool) -> List[Dict]:
+        rows = list(self._stream_rows(exchange, natives))
+        messages = [{"arg": {"channel": "funding-rate"},
+                     "data": [{"instId": native, "fundingRate": str(rate)} for native, rate, _ in rows]}]
+        if not delta:
+            messages.append({"arg": {"channel": "mark-price"},
+                             "data": [{"instId": native, "markPx": str(price)} for native, _, price in rows]})
+        return messages
+
+    def bitget_subscription(self, message: Dict) -> Optional[List[str]]:
+        if message.get("op") != "subscribe":
+            return None
+        return [arg["instId"] for arg in message["args"]]
+
+    def bitget_push(self, exchange: str, natives: Iterable[str], delta: bool) -> List[Dict]:
+        return [{"arg": {"channel": "ticker"}, "data": [
+            {"instId": native, "fundingRate": str(rate), "markPrice": str(price)}
+            for native, rate, price in self._stream_rows(exchange, natives)
+        ]}]
+
+    def gate_subscription(self, message: Dict) -> Optional[List[str]]:
+        if message.get("event") != "subscribe":
+            return None
+        return list(message["payload"])
+
+    def gate_push(self, exchange: str, natives: Iterable[str], delta: bool) -> List[Dict]:
+        return [{"channel": "futures.tickers", "event": "update", "result": [
+            {"contract": native, "funding_rate": str(rate), "mark_price": str(price)}
+            for native, rate, price in self._stream_rows(exchange, natives)
+        ]}]
+
+    def mexc_subscription(self, message: Dict) -> Optional[List[str]]:
+        if message.get("method") != "sub.tickers":
+            return None
+        # sub.tickers — весь рынок
+        return list(self.model.natives["MEXC"])
+
+    def mexc_push(self, exchange: str, natives: Iterable[str], delta: bool) -> List[Dict]:
+        return [{"channel": "push.tickers", "data": [
+            {"symbol": native, "fundingRate": rate, "fairPrice": price}
+            for native, rate, price in self._stream_rows(exchange, natives)
+        ]}]
+
+    def hyperliquid_subscription(self, message: Dict) -> Optional[List[str]]:
+        if message.get("method") != "subscribe":
+            return None
+        return [message["subscription"]["coin"]]
+
+    def hyperliquid_push(self, exchange: str, natives: Iterable[str], delta: bool) -> List[Dict]:
+        return [
+            {"channel": "activeAssetCtx", "data": {"coin": native, "ctx": {"funding": str(rate), "markPx": str(price)}}}
+            for native, rate, price in self._stream_rows(exchange, natives)
+        ]
+
+    # Bitget
+    async def bitget_tickers(self, request, exchange):
+        return self._bulk(exchange, "tickers", lambda: {"data": [
+            {"symbol": native, "fundingRate": str(rate), "markPrice": str(price)}
+            for native, rate, price in self._market(exchange)
+        ]})
+
+    async def bitget_rate(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("symbol"))
+        if base is None:
+            return _json({"data": []})
+        return _json({"data": [{"fundingRate": str(self.model.rates[exchange][base])}]})
+
+    async def bitget_price(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("symbol"))
+        if base is None:
+            return _json({"data": [{}]})
+        price = str(self.model.prices[exchange][base])
+        return _json({"data": [{"price": price, "markPrice": price, "indexPrice": price}]})
+
+    async def bitget_history(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("symbol"))
+        points = self.model.history(exchange, base) if base else []
+        return _json({"data": [{"fundingRate": str(rate), "fundingTime": str(ts)} for ts, rate in points]})
+
+    # Gate
+    async def gate_contracts(self, request, exchange):
+        return self._bulk(exchange, "contracts", lambda: [
+            {"name": native, "funding_rate": str(rate), "funding_rate_indicative": str(rate),
+             "mark_price": str(price), "index_price": str(price), "in_delisting": False}
+            for native, rate, price in self._market(exchange)
+        ])
+
+    async def gate_contract(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("contract"))
+        if base is None:
+            return _json({})
+        price = str(self.model.prices[exchange][base])
+        return _json({"funding_rate_indicative": str(self.model.rates[exchange][base]),
+                      "mark_price": price, "index_price": price})
+
+    async def gate_history(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("contract"))
+        points = self.model.history(exchange, base) if base else []
+        return _json({"data": [{"r": str(rate), "t": ts // 1000} for ts, rate in points]})
+
+    # MEXC, ourbit, kcex
+    async def mexc_ticker(self, request, exchange):
+        native = request.query.get("symbol")
+        if native is not None:
+            base = self.model.base(exchange, native)
+            if base is None:
+                return _json({"success": False, "code": 1001})
+            return _json({"success": True, "code": 0, "data": {
+                "symbol": native, "fundingRate": self.model.rates[exchange][base],
+                "fairPrice": self.model.prices[exchange][base],
+            }})
+        return self._bulk(exchange, "ticker", lambda: {"data": [
+            {"symbol": native, "fundingRate": rate, "fairPrice": price}
+            for native, rate, price in self._market(exchange)
+        ]})
+
+    async def mexc_history(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("symbol"))
+        points = self.model.history(exchange, base) if base else []
+        return _json({"data": {"resultList": [{"fundingRate": rate, "settleTime": ts} for ts, rate in points]}})
+
+    # BingX
+    async def bingx_premium(self, request, exchange):
+        native = request.query.get("symbol")
+        if native is None:
+            return self._bulk(exchange, "premiumIndex", lambda: {"data": [
+                {"symbol": native, "lastFundingRate": str(rate), "markPrice": str(price)}
+                for native, rate, price in self._market(exchange)
+            ]})
+        base = self.model.base(exchange, native)
+        if base is None:
+            return _json({"data": {}})
+        price = str(self.model.prices[exchange][base])
+        return _json({"data": {"lastFundingRate": str(self.model.rates[exchange][base]),
+                               "markPrice": price, "indexPrice": price}})
+
+    async def bingx_history(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("symbol"))
+        points = self.model.history(exchange, base) if base else []
+        return _json({"data": [{"fundingRate": str(rate), "fundingTime": ts} for ts, rate in points]})
+
+    # Bybit
+    async def bybit_tickers(self, request, exchange):
+        native = request.query.get("symbol")
+        if native is None:
+            return self._bulk(exchange, "tickers", lambda: {"result": {"list": [
+                {"symbol": native, "fundingRate": str(rate), "markPrice": str(price), "indexPrice": str(price)}
+                for native, rate, price in self._market(exchange)
+            ]}})
+        base = self.model.base(exchange, native)
+        items = [] if base is None else [{
+            "symbol": native, "fundingRate": str(self.model.rates[exchange][base]),
+            "markPrice": str(self.model.prices[exchange][base]), "indexPrice": str(self.model.prices[exchange][base]),
+        }]
+        return _json({"result": {"list": items}})
+
+    async def bybit_history(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("symbol"))
+        points = self.model.history(exchange, base) if base else []
+        return _json({"result": {"list": [
+            {"fundingRate": str(rate), "fundingRateTimestamp": str(ts)} for ts, rate in points
+        ]}})
+
+    # aevo
+    async def aevo_statistics(self, request, exchange):
+        return self._bulk(exchange, "coingecko-statistics", lambda: [
+            {"ticker_id": native, "funding_rate": str(rate), "index_price": str(price)}
+            for native, rate, price in self._market(exchange)
+        ])
+
+    async def aevo_rate(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("instrument_name"))
+        return _json({"funding_rate": str(self.model.rates[exchange][base])} if base else {})
+
+    async def aevo_price(self, request, exchange):
+        base = request.query.get("asset")
+        price = self.model.prices[exchange].get(base)
+        return _json({"mark_price": str(price), "index_price": str(price)} if price is not None else {})
+
+    async def aevo_history(self, request, exchange):
+        native = request.query.get("instrument_name")
+        base = self.model.base(exchange, native)
+        points = self.model.history(exchange, base) if base else []
+        return _json({"funding_history": [[native, str(ts * 10 ** 6), str(rate)] for ts, rate in points]})
+
+    # OKX
+    async def okx_rate(self, request, exchange):
+        native = request.query.get("instId")
+        if native == "ANY":
+            return self._bulk(exchange, "funding-rate", lambda: {"data": [
+                {"instId": native, "fundingRate": str(rate)} for native, rate, _ in self._market(exchange)
+            ]})
+        base = self.model.base(exchange, native)
+        return _json({"data": [{"instId": native, "fundingRate": str(self.model.rates[exchange][base])}]
+                      if base else []})
+
+    async def okx_price(self, request, exchange):
+        native = request.query.get("instId")
+        if native is None:
+            return self._bulk(exchange, "mark-price", lambda: {"data": [
+                {"instId": native, "markPx": str(price)} for native, _, price in self._market(exchange)
+            ]})
+        base = self.model.base(exchange, native)
+        return _json({"data": [{"instId": native, "markPx": str(self.model.prices[exchange][base])}]
+                      if base else []})
+
+    async def okx_history(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("instId"))
+        points = self.model.history(exchange, base) if base else []
+        return _json({"data": [{"fundingRate": str(rate), "fundingTime": str(ts)} for ts, rate in points]})
+
+    # Hyperliquid
+    async def hyperliquid_info(self, request, exchange):
+        body = await request.json()
+        if body.get("type") == "fundingHistory":
+            base = self.model.base(exchange, body.get("coin"))
+            points = self.model.history(exchange, base) if base else []
+            # Старые первыми, как у биржи
+            return _json([{"coin": body.get("coin"), "fundingRate": str(rate), "time": ts}
+                          for ts, rate in reversed(points)])
+        return self._bulk(exchange, "metaAndAssetCtxs", lambda: [
+            {"universe": [{"name": base} for base in self.model.bases]},
+            [{"funding": str(self.model.rates[exchange][base]), "markPx": str(self.model.prices[exchange][base])}
+             for base in self.model.bases],
+        ])
+
+    # KuCoin
+    async def kucoin_active(self, request, exchange):
+        return self._bulk(exchange, "active", lambda: {"data": [
+            {"symbol": native, "fundingFeeRate": rate, "indexPrice": price}
+            for native, rate, price in self._market(exchange)
+        ]})
+
+    async def kucoin_history(self, request, exchange):
+        base = self.model.base(exchange, request.query.get("symbol"))
+        points = self.model.history(exchange, base) if base else []
+        return _json({"data": [{"fundingRate": rate, "timepoint": ts} for ts, rate in points]})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальный стенд бирж")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 502")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    server = MockExchangeServer(MarketModel(args.symbols, seed=args.seed), args.latency, args.jitter,
+                                args.error_rate, args.throttle_rate)
+    web.run_app(server.app(), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
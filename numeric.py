@@ -0,0 +1,31 @@
+import math
+from typing import Optional
+
+# Ставки — float64 в процентах, округлённые до RATE_DIGITS знаков после запятой:
+# 0.0001 * 100 даёт 0.01, а не 0.010000000000000002. Decimal — только в истории и настройках
+RATE_DIGITS = 10
+
+
+def to_float(value) -> Optional[float]:
+    """Число из ответа API (строка или число); None для пустых и нечисловых значений."""
+    if value is None:
+        return None
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return None
+    return result if math.isfinite(result) else None
+
+
+def percent(value) -> Optional[float]:
+    """Ставка из API (доля) в процентах."""
+    rate = to_float(value)
+    return None if rate is None else round(rate * 100, RATE_DIGITS)
+
+
+def to_seconds(value) -> Optional[float]:
+    """Время из API в секундах или миллисекундах -> unix-секунды."""
+    ts = to_float(value)
+    if ts is None or ts <= 0:
+        return None
+    return ts / 1000 if ts > 1e11 else ts
@@ -1,68 +1,58 @@
 import aiohttp
 import asyncio
-from aiohttp_socks import ProxyConnector
+from proxy_pool import ProxyPool
+from symbol_registry import symbol_registry
+from adapter import FundingRateFetcher
+from numeric import percent, to_float, to_seconds
+from quote import Quote, QuoteBatch
 from typing import List, Dict, Optional
 from decimal import Decimal
 
-class OkxFundingRateFetcher:
+class OkxFundingRateFetcher(FundingRateFetcher):
+    EXCHANGE = "okx"
     BASE_URL = "https://www.okx.com/api/v5/public/funding-rate?instId="
     PRICE_URL = "https://www.okx.com/api/v5/public/mark-price?instType=SWAP&instId="
-    def __init__(self, symbol: str, proxy: Optional[str] = None):
-        symbol = symbol.replace('_', '-')
-        self.symbol = symbol
-        self.proxy = proxy
+    BULK_PRICE_URL = "https://www.okx.com/api/v5/public/mark-price?instType=SWAP"
+    # Цена в обоих путях — mark price (markPx из mark-price)
 
     async def fetch_history_funding(self, token, session: aiohttp.ClientSession):
-        token = token.replace('USDT', '-USDT')
-        token = token.replace('_USDT', '-USDT')
-        history_url = f"https://www.okx.com/api/v5/public/funding-rate-history?instId={token}-SWAP&limit=4"
-        async with session.get(history_url) as response:
-            response.raise_for_status()
-            data = await response.json()
-            result = {}
-            if len(data['data'])>3:
-                for i in range(0, 4):
-                    fund_rate = data['data'][i]['fundingRate']
-                    result[Decimal(fund_rate).normalize() * 100] = data['data'][i]['fundingTime']
-                return result
-
-    async def fetch_funding_rate(self, session: aiohttp.ClientSession) -> Dict:
-        url = f"{self.BASE_URL}{self.symbol}-SWAP"
-        price_url = f"{self.PRICE_URL}{self.symbol}-SWAP"
-        try:
-            async with session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-            async with session.get(price_url) as response:
-                response.raise_for_status()
-                data_price = await response.json()
-
-            if len(data_price['data'])>0:
-
-                funding_rate = Decimal(f"{data['data'][0]['fundingRate']}")
-                return {
-                    "ex": "okx",
-                    "symbol": self.symbol,
-                    "fundingRate": str(funding_rate.normalize()*100),
-                    # "fundingRate": '3.0',
-                    "price": data_price['data'][0]['markPx']
-                }
-            else:
-                return {
-                    "ex": "okx",
-                    "symbol": self.symbol,
-                    "fundingRate": "Not supported",
-                    "price": "Not supported"
-                    # "fundingRate": 0.3
-                }
-        except aiohttp.ClientError as e:
-            return {
-                "ex": "okx",
-                "symbol": self.symbol,
-                "fundingRate": "Not supported",
-                "price": "Not supported"
-                # "fundingRate": 0.3
-            }
+        token = symbol_registry.native(self.EXCHANGE, token)
+        history_url = f"https://www.okx.com/api/v5/public/funding-rate-history?instId={token}&limit=4"
+        data = await self.get_json(session, history_url)
+        result = {}
+        if len(data['data'])>3:
+            for i in range(0, 4):
+                fund_rate = data['data'][i]['fundingRate']
+                result[Decimal(fund_rate).normalize() * 100] = data['data'][i]['fundingTime']
+            return result
+
+    @classmethod
+    async def fetch_all_funding_rates(cls, session: aiohttp.ClientSession) -> QuoteBatch:
+        """Фандинг (instId=ANY) и mark price по всем свопам двумя запросами."""
+        result = QuoteBatch(cls.EXCHANGE)
+        data = await cls.get_json(session, f"{cls.BASE_URL}ANY")
+        data_price = await cls.get_json(session, cls.BULK_PRICE_URL)
+        prices = {item['instId']: item['markPx'] for item in data_price['data']}
+        for item in data['data']:
+            inst_id = item['instId']
+            symbol = symbol_registry.resolve(cls.EXCHANGE, inst_id)
+            if symbol is None or inst_id not in prices:
+                continue
+            funding_rate = item['fundingRate']
+            # fundingTime — ближайший расчёт, nextFundingTime — следующий за ним
+            result.append(symbol, percent(funding_rate), to_float(prices[inst_id]), to_seconds(item.get('fundingTime')))
+        return result
+
+    async def request(self, session: aiohttp.ClientSession):
+        data = await self.get_json(session, f"{self.BASE_URL}{self.native}")
+        data_price = await self.get_json(session, f"{self.PRICE_URL}{self.native}")
+        return data, data_price
+
+    def parse(self, response) -> Optional[Quote]:
+        data, data_price = response
+        if len(data_price['data']) > 0:
+            return self.quote(percent(data['data'][0]['fundingRate']), to_float(data_price['data'][0]['markPx']))
+        return None
 
 
 def load_data(filename: str) -> List[str]:
@@ -81,24 +71,13 @@ async def main():
         print("No proxies found in proxies.txt")
         return
 
-    batch_size = 20
-    tasks = []
-    sessions = []
-
-    for i, symbol in enumerate(symbols):
-        proxy_index = (i // batch_size) % len(proxies)
-        proxy = proxies[proxy_index]
-
-        connector = ProxyConnector.from_url(proxy) if proxy else aiohttp.TCPConnector()
-        session = aiohttp.ClientSession(connector=connector)
-        sessions.append(session)
-        fetcher = OkxFundingRateFetcher(symbol, proxy)
-        tasks.append(fetcher.fetch_funding_rate(session))
-
-    results = await asyncio.gather(*tasks)
-
-    for session in sessions:
-        await session.close()
+    # Одна сессия на прокси на весь прогон вместо коннектора на каждый символ
+    pool = ProxyPool()
+    await pool.update(proxies)
+    async with aiohttp.ClientSession() as direct:
+        tasks = [OkxFundingRateFetcher(symbol).fetch_funding_rate(pool.session(direct)) for symbol in symbols]
+        results = await asyncio.gather(*tasks)
+    await pool.close()
 
     for result in results:
         print(result)
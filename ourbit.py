@@ -1,90 +1,13 @@
 import aiohttp
 import asyncio
-from aiohttp_socks import ProxyConnector
-from typing import List, Dict, Optional
-from decimal import Decimal
+from proxy_pool import ProxyPool
+from adapter import ContractTickerFetcher
+from typing import List
 
-class OurbitFundingRateFetcher:
-    BASE_URL = "https://futures.ourbit.com/api/v1/contract/funding_rate"
-    PRICE_URL = "https://futures.ourbit.com/api/v1/contract/deals"
-
-    def __init__(self, symbol: str, proxy: Optional[str] = None):
-        self.symbol = symbol
-        self.proxy = proxy
-
-    async def fetch_history_funding(self, token, session: aiohttp.ClientSession):
-        token = token.replace('USDT', '_USDT')
-        history_url = f'https://futures.ourbit.com/api/v1/contract/funding_rate/history?page_num=1&page_size=15&symbol={token}'
-        async with session.get(history_url) as response:
-            response.raise_for_status()
-            data = await response.json()
-            result = {}
-            for i in range(0, 4):
-                result[Decimal(data['data']['resultList'][i]['fundingRate']).normalize() * 100] = data['data']['resultList'][i]['settleTime']
-
-            return result
-
-
-    async def fetch_funding_rate(self, session: aiohttp.ClientSession) -> Dict:
-        url = f"{self.BASE_URL}/{self.symbol}"
-        price_url = f"{self.PRICE_URL}/{self.symbol}"
-        try:
-            async with session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-            async with session.get(price_url) as response:
-                response.raise_for_status()
-                data_price = await response.json()
-            if not('message' in data_price) and ('data' in data_price):
-                if len(data_price['data']) > 0:
-                    pass
-                else:
-                    self.symbol = self.symbol.replace('_USDT', 'NEW_USDT')
-                    price_url = f"{self.PRICE_URL}/{self.symbol}"
-                    async with session.get(price_url) as response:
-                        response.raise_for_status()
-                        data_price = await response.json()
-            else:
-                return {
-                    "ex": "ourbit",
-                    "symbol": self.symbol,
-                    "fundingRate": "Not supported",
-                    "price": "Not supported"
-                    # "fundingRate": 0.3
-                }
-            try:
-                if 'data' in data and 'p' in data_price['data'][0]:
-                    funding_rate = Decimal(f"{data['data']['fundingRate']}")
-                    return {
-                        "ex": "ourbit",
-                        "symbol": data['data']['symbol'],
-                        "fundingRate": str(funding_rate.normalize() * 100),
-                        "price": data_price['data'][0]['p']
-                    }
-                else:
-                    return {
-                        "ex": "ourbit",
-                        "symbol": self.symbol,
-                        "fundingRate": "Not supported",
-                        "price": "Not supported"
-                        # "fundingRate": 0.3
-                    }
-            except Exception as e:
-                return {
-                    "ex": "ourbit",
-                    "symbol": self.symbol,
-                    "fundingRate": "Not supported",
-                    "price": "Not supported"
-                    # "fundingRate": 0.3
-                }
-        except aiohttp.ClientError as e:
-            return {
-                "ex": "ourbit",
-                "symbol": self.symbol,
-                "fundingRate": "Not supported",
-                "price": "Not supported"
-                # "fundingRate": 0.3
-            }
+class OurbitFundingRateFetcher(ContractTickerFetcher):
+    EXCHANGE = "ourbit"
+    TICKER_URL = "https://futures.ourbit.com/api/v1/contract/ticker"
+    HISTORY_URL = "https://futures.ourbit.com/api/v1/contract/funding_rate/history"
 
 
 def load_data(filename: str) -> List[str]:
@@ -103,25 +26,13 @@ async def main():
         print("No proxies found in proxies.txt")
         return
 
-    batch_size = 20
-    tasks = []
-    sessions = []
-
-    for i, symbol in enumerate(symbols):
-        proxy_index = (i // batch_size) % len(proxies)
-        proxy = proxies[proxy_index]
-
-        connector = ProxyConnector.from_url(proxy) if proxy else aiohttp.TCPConnector()
-        session = aiohttp.ClientSession(connector=connector)
-        sessions.append(session)
-
-        fetcher = OurbitFundingRateFetcher(symbol, proxy)
-        tasks.append(fetcher.fetch_funding_rate(session))
-
-    results = await asyncio.gather(*tasks)
-
-    for session in sessions:
-        await session.close()
+    # Одна сессия на прокси на весь прогон вместо коннектора на каждый символ
+    pool = ProxyPool()
+    await pool.update(proxies)
+    async with aiohttp.ClientSession() as direct:
+        tasks = [OurbitFundingRateFetcher(symbol).fetch_funding_rate(pool.session(direct)) for symbol in symbols]
+        results = await asyncio.gather(*tasks)
+    await pool.close()
 
     for result in results:
         print(result)
@@ -0,0 +1,96 @@
+import math
+import time
+from typing import Dict, Iterable, List, Optional
+
+# Период фандинга по биржам, часы; расчёты — на границах периода от полуночи UTC
+DEFAULT_SETTLEMENT_HOURS = 8
+SETTLEMENT_HOURS: Dict[str, float] = {
+    "Hyperliquid": 1,
+}
+
+
+class PollingScheduler:
+    """Адаптивный опрос (символ, биржа): чем вероятнее уведомление, тем чаще опрос.
+
+    Приоритет от 0 до 1 — максимум из близости текущего спреда символа к spread_low
+    (вместе с волатильностью ставки на бирже) и близости расчёта фандинга биржи
+    (последние settlement_window секунд перед ним; время расчёта берётся из котировки,
+    если биржа его отдаёт). Приоритет 1 — опрос каждый цикл,
+    0 — раз в max_interval секунд. Символ, который ещё не опрашивался, опрашивается сразу.
+    У всех бирж с посимвольным путём есть и bulk, поэтому планировщик работает, только
+    когда bulk-запрос не удался и биржа опрашивается по символам.
+    """
+
+    def __init__(self, min_interval: float = 0.0, max_interval: float = 90.0, settlement_window: float = 900.0,
+                 settlement_hours: Optional[Dict[str, float]] = None, volatility_alpha: float = 0.3):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.settlement_window = settlement_window
+        self.settlement_hours = SETTLEMENT_HOURS if settlement_hours is None else settlement_hours
+        self.volatility_alpha = volatility_alpha
+        # биржа -> символ -> значение
+        self._next_due: Dict[str, Dict[str, float]] = {}
+        self._last_rate: Dict[str, Dict[str, float]] = {}
+        self._volatility: Dict[str, Dict[str, float]] = {}
+        self._next_funding: Dict[str, Dict[str, float]] = {}
+        self.stats = {"due": 0, "skipped": 0}
+
+    def time_to_settlement(self, exchange: str, now: float, symbol: Optional[str] = None) -> float:
+        """До расчёта по времени из котировки символа, а без него — по периоду биржи."""
+        next_funding = self._next_funding.get(exchange, {}).get(symbol) if symbol is not None else None
+        if next_funding is not None and next_funding > now:
+            return next_funding - now
+        period = self.settlement_hours.get(exchange, DEFAULT_SETTLEMENT_HOURS) * 3600
+        return period - now % period
+
+    def observe(self, exchange: str, symbol: str, rate: Optional[float],
+                next_funding: Optional[float] = None) -> None:
+        """Учитывает новую ставку: волатильность — EWMA модуля изменения между опросами."""
+        if next_funding is not None:
+            self._next_funding.setdefault(exchange, {})[symbol] = next_funding
+        if rate is None or math.isnan(rate):
+            return
+        last_rates = self._last_rate.setdefault(exchange, {})
+        previous = last_rates.get(symbol)
+        last_rates[symbol] = rate
+        if previous is not None:
+            volatility = self._volatility.setdefault(exchange, {})
+            alpha = self.volatility_alpha
+            volatility[symbol] = (1 - alpha) * volatility.get(symbol, 0.0) + alpha * abs(rate - previous)
+
+    def score(self, exchange: str, symbol: str, spread: float, spread_low: float, now: float) -> float:
+        if spread_low <= 0:
+            return 1.0
+        # NaN — символ котируется меньше чем на двух биржах, спреда нет
+        closeness = 0.0 if math.isnan(spread) else spread / spread_low
+        volatility = self._volatility.get(exchange, {}).get(symbol, 0.0) / spread_low
+        settlement = 1.0 - self.time_to_settlement(exchange, now, symbol) / self.settlement_window
+        return min(1.0, max(closeness + volatility, settlement, 0.0))
+
+    def interval(self, score: float) -> float:
+        # Квадрат: средние приоритеты опрашиваются заметно чаще холодных
+        return self.min_interval + (self.max_interval - self.min_interval) * (1.0 - score) ** 2
+
+    def due(self, exchange: str, symbols: Iterable[str], now: Optional[float] = None) -> List[str]:
+        """Символы биржи, которые пора опросить."""
+        now = time.time() if now is None else now
+        next_due = self._next_due.get(exchange, {})
+        due = []
+        skipped = 0
+        for symbol in symbols:
+            if next_due.get(symbol, 0.0) <= now:
+                due.append(symbol)
+            else:
+                skipped += 1
+        self.stats["due"] += len(due)
+        self.stats["skipped"] += skipped
+        return due
+
+    def schedule(self, exchange: str, symbols: Iterable[str], spreads: Dict[str, float], spread_low: float,
+                 now: Optional[float] = None) -> None:
+        """Назначает следующий опрос символам, которые только что были опрошены."""
+        now = time.time() if now is None else now
+        next_due = self._next_due.setdefault(exchange, {})
+        for symbol in symbols:
+            score = self.score(exchange, symbol, spreads.get(symbol, math.nan), spread_low, now)
+            next_due[symbol] = now + self.interval(score)
@@ -0,0 +1,170 @@
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+
+PROFILE_MODES = ("pstats", "collapsed")
+
+
+class StackSampler:
+    """Фоновый поток, снимающий стек одного потока с интервалом; результат — свёрнутые стеки."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        # "внешний;...;внутренний" -> количество сэмплов
+        self.stacks: Dict[str, int] = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Dict[str, int]:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if not names:
+                continue
+            key = ";".join(reversed(names))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+
+def write_collapsed(path: str, stacks: Dict[str, int]) -> None:
+    """Формат flamegraph.pl / speedscope: "стек количество" построчно."""
+    with open(path, "w", encoding="utf-8") as file:
+        for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+            file.write(f"{stack} {count}\n")
+
+
+class CycleProfiler:
+    """Профилирование циклов monitor() по запросу и автоматически для медленных циклов.
+
+    request(n) включает профилирование следующих n циклов: cProfile (mode="pstats")
+    или сэмплирование стеков потока цикла (mode="collapsed"); результат за все n циклов
+    пишется одним файлом в directory. Если задан slow_cycle, каждый цикл дольше него
+    записывается свёрнутыми стеками с момента превышения до конца цикла, не чаще раза
+    в slow_cooldown секунд.
+    """
+
+    def __init__(self, directory: str = "profiles", mode: str = "pstats", slow_cycle: Optional[float] = None,
+                 slow_cooldown: float = 600.0, interval: float = 0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Неизвестный режим профилирования: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self.slow_cycle = slow_cycle
+        self.slow_cooldown = slow_cooldown
+        self.interval = interval
+        self.pending = 0
+        self._requested = 0
+        self._profile: Optional[cProfile.Profile] = None
+        self._stacks: Dict[str, int] = {}
+        self._last_slow_capture: Optional[float] = None
+        self.last_path: Optional[str] = None
+
+    def request(self, cycles: int) -> None:
+        """Профилировать следующие cycles циклов; повторный запрос продлевает текущий."""
+        cycles = max(1, int(cycles))
+        if self.pending:
+            self._requested += max(0, cycles - self.pending)
+            self.pending = max(self.pending, cycles)
+        else:
+            self.pending = self._requested = cycles
+        logging.info(f"Профилирование следующих {self.pending} циклов ({self.mode})")
+
+    def _path(self, prefix: str, suffix: str) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{suffix}")
+
+    def _save(self) -> None:
+        if self._profile is not None:
+            path = self._path(f"cycles{self._requested}", "pstats")
+            self._profile.dump_stats(path)
+        else:
+            path = self._path(f"cycles{self._requested}", "collapsed")
+            write_collapsed(path, self._stacks)
+        self._profile = None
+        self._stacks = {}
+        self.last_path = path
+        logging.info(f"Профиль {self._requested} циклов записан в {path}")
+
+    def _save_slow(self, stacks: Dict[str, int], duration: float) -> None:
+        path = self._path(f"slow_{duration:.1f}s", "collapsed")
+        write_collapsed(path, stacks)
+        self.last_path = path
+        logging.warning(f"Цикл длился {duration:.1f} с (порог {self.slow_cycle} с), стеки записаны в {path}")
+
+    @contextmanager
+    def cycle(self) -> Iterator[None]:
+        """Оборачивает один цикл; вызывается из потока event loop."""
+        thread_id = threading.get_ident()
+        started = time.monotonic()
+        profiling = self.pending > 0
+        sampler = None
+        if profiling:
+            if self.mode == "pstats":
+                self._profile = self._profile or cProfile.Profile()
+                self._profile.enable()
+            else:
+                sampler = StackSampler(thread_id, self.interval)
+                sampler.start()
+
+        # Медленный цикл ловится из отдельного потока: event loop в это время может быть занят.
+        # Пока идёт профилирование по запросу, циклы медленнее из-за него самого — не ловим
+        watchdog = slow_sampler = None
+        if (self.slow_cycle and not profiling
+                and (self._last_slow_capture is None or started - self._last_slow_capture >= self.slow_cooldown)):
+            slow_sampler = StackSampler(thread_id, self.interval)
+            watchdog = threading.Timer(self.slow_cycle, slow_sampler.start)
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            yield
+        finally:
+            duration = time.monotonic() - started
+            if watchdog is not None:
+                watchdog.cancel()
+                watchdog.join()
+                if slow_sampler.started:
+                    stacks = slow_sampler.stop()
+                    self._last_slow_capture = time.monotonic()
+                    try:
+                        self._save_slow(stacks, duration)
+                    except OSError as e:
+                        logging.error(f"Не удалось записать профиль медленного цикла: {e}")
+            if profiling:
+                if self._profile is not None:
+                    self._profile.disable()
+                if sampler is not None:
+                    for stack, count in sampler.stop().items():
+                        self._stacks[stack] = self._stacks.get(stack, 0) + count
+                self.pending -= 1
+                if self.pending <= 0:
+                    self.pending = 0
+                    try:
+                        self._save()
+                    except OSError as e:
+                        logging.error(f"Не удалось записать профиль: {e}")
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiohttp_socks import ProxyConnector
+
+from rate_limiter import RateLimiter
+from metrics import http_trace_config
+
+
+class ProxyEntry:
+    """Прокси с собственным пулом соединений и статистикой здоровья."""
+
+    def __init__(self, url: str, session: aiohttp.ClientSession):
+        self.url = url
+        self.session = session
+        self.latency = 0.5  # EWMA, секунды
+        self.error_rate = 0.0  # EWMA доли ошибок
+        self.requests = 0
+        self.errors = 0
+        self.failures_in_row = 0
+        self.strikes = 0
+        self.quarantined_until = 0.0
+
+    @property
+    def score(self) -> float:
+        return max(1.0 - self.error_rate, 0.01) / max(self.latency, 0.05)
+
+    def available(self, now: float) -> bool:
+        return now >= self.quarantined_until
+
+
+class ProxyPool:
+    """Пул SOCKS5/HTTP-прокси: одна сессия на прокси, выбор по здоровью, карантин мёртвых."""
+
+    def __init__(self, limiter: Optional[RateLimiter] = None, alpha: float = 0.2,
+                 max_failures: int = 3, quarantine: float = 30.0, max_quarantine: float = 600.0,
+                 limit_per_host: int = 20, timeout: float = 15.0):
+        self.limiter = limiter
+        self.alpha = alpha
+        self.max_failures = max_failures
+        self.quarantine = quarantine
+        self.max_quarantine = max_quarantine
+        self.limit_per_host = limit_per_host
+        self.timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self.entries: Dict[str, ProxyEntry] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _health_trace(self, entry: ProxyEntry) -> aiohttp.TraceConfig:
+        async def on_request_start(session, ctx, params):
+            ctx.started = time.monotonic()
+
+        async def on_request_end(session, ctx, params):
+            self._record(entry, time.monotonic() - ctx.started, params.response.status < 500)
+
+        async def on_request_exception(session, ctx, params):
+            self._record(entry, time.monotonic() - getattr(ctx, "started", time.monotonic()), False)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_end.append(on_request_end)
+        trace.on_request_exception.append(on_request_exception)
+        return trace
+
+    def _create_entry(self, url: str) -> ProxyEntry:
+        connector = ProxyConnector.from_url(
+            url, limit=0, limit_per_host=self.limit_per_host, ttl_dns_cache=600, keepalive_timeout=75.0
+        )
+        entry = ProxyEntry(url, None)
+        # Трейс здоровья последним: ожидание в лимитере не считается задержкой прокси
+        trace_configs = []
+        if self.limiter is not None:
+            trace_configs.append(self.limiter.trace_config(egress=url))
+        trace_configs.append(http_trace_config(host_exchanges=self.limiter.host_exchanges if self.limiter else None))
+        trace_configs.append(self._health_trace(entry))
+        entry.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers={"Accept-Encoding": "gzip, deflate"},
+            trace_configs=trace_configs,
+        )
+        return entry
+
+    def _record(self, entry: ProxyEntry, latency: float, ok: bool) -> None:
+        entry.requests += 1
+        entry.latency += self.alpha * (latency - entry.latency)
+        entry.error_rate += self.alpha * ((0.0 if ok else 1.0) - entry.error_rate)
+        if ok:
+            entry.failures_in_row = 0
+            entry.strikes = 0
+            return
+        entry.errors += 1
+        entry.failures_in_row += 1
+        # Запросы, начатые до карантина, срок не продлевают
+        if entry.failures_in_row >= self.max_failures and entry.available(time.monotonic()):
+            duration = min(self.max_quarantine, self.quarantine * 2 ** entry.strikes)
+            entry.strikes += 1
+            entry.failures_in_row = 0
+            entry.quarantined_until = time.monotonic() + duration
+            logging.warning(f"Прокси {entry.url} в карантине на {duration:.0f} с")
+
+    async def update(self, urls: List[str]) -> None:
+        """Синхронизирует пул со списком прокси: новые открывает, удалённые закрывает."""
+        wanted = [url for url in dict.fromkeys(urls) if url]
+        removed = [self.entries.pop(url) for url in list(self.entries) if url not in wanted]
+        for url in wanted:
+            if url not in self.entries:
+                try:
+                    self.entries[url] = self._create_entry(url)
+                except ValueError as e:
+                    logging.error(f"Некорректный прокси {url}: {e}")
+        await asyncio.gather(*(entry.session.close() for entry in removed))
+        if urls:
+            logging.info(f"В пуле {len(self.entries)} прокси")
+
+    def session(self, direct: Optional[aiohttp.ClientSession] = None) -> Optional[aiohttp.ClientSession]:
+        """Выбирает сессию с весом по здоровью; прямое подключение участвует наравне со средним прокси."""
+        now = time.monotonic()
+        candidates = [entry for entry in self.entries.values() if entry.available(now)]
+        sessions = [entry.session for entry in candidates]
+        weights = [entry.score for entry in candidates]
+        if direct is not None:
+            sessions.append(direct)
+            weights.append(sum(weights) / len(weights) if weights else 1.0)
+        if not sessions:
+            return None
+        return random.choices(sessions, weights)[0]
+
+    def stats(self) -> List[Dict]:
+        now = time.monotonic()
+        return [
+            {
+                "proxy": entry.url,
+                "latency": round(entry.latency, 3),
+                "error_rate": round(entry.error_rate, 3),
+                "requests": entry.requests,
+                "quarantined": not entry.available(now),
+            }
+            for entry in self.entries.values()
+        ]
+
+    async def close(self) -> None:
+        entries = list(self.entries.values())
+        self.entries.clear()
+        await asyncio.gather(*(entry.session.close() for entry in entries))
@@ -0,0 +1,94 @@
+from array import array
+from collections.abc import Mapping
+from enum import IntEnum
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+NAN = float("nan")
+
+
+class QuoteStatus(IntEnum):
+    OK = 0
+    # Биржа не отдаёт символ или в ответе нет ставки
+    NOT_SUPPORTED = 1
+    # Запрос к бирже не удался
+    ERROR = 2
+
+
+class Quote(NamedTuple):
+    """Котировка символа на бирже. NamedTuple: без __dict__, поля хранятся в самом кортеже.
+
+    rate — фандинг в процентах, price — цена, None — значения нет; ts — время источника
+    (unix, с; None — время получения), next_funding — время следующего расчёта.
+    """
+
+    exchange: str
+    symbol: str
+    rate: Optional[float]
+    price: Optional[float]
+    ts: Optional[float] = None
+    next_funding: Optional[float] = None
+    status: QuoteStatus = QuoteStatus.OK
+
+    @classmethod
+    def make(cls, exchange: str, symbol: str, rate: Optional[float], price: Optional[float],
+             ts: Optional[float] = None, next_funding: Optional[float] = None) -> "Quote":
+        """Котировка из разобранного ответа: без ставки — NOT_SUPPORTED."""
+        status = QuoteStatus.OK if rate is not None else QuoteStatus.NOT_SUPPORTED
+        return cls(exchange, symbol, rate, price, ts, next_funding, status)
+
+    @classmethod
+    def not_supported(cls, exchange: str, symbol: str) -> "Quote":
+        return cls(exchange, symbol, None, None, status=QuoteStatus.NOT_SUPPORTED)
+
+    @classmethod
+    def error(cls, exchange: str, symbol: str) -> "Quote":
+        return cls(exchange, symbol, None, None, status=QuoteStatus.ERROR)
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if value != value else value
+
+
+class QuoteBatch(Mapping):
+    """Котировки одного ответа на весь рынок: символ -> Quote.
+
+    Значения лежат колонками (список символов и array('d'), NaN — нет значения),
+    Quote собирается только при обращении к символу.
+    """
+
+    __slots__ = ("exchange", "ts", "symbols", "rates", "prices", "next_funding", "_index")
+
+    def __init__(self, exchange: str, ts: Optional[float] = None):
+        self.exchange = exchange
+        self.ts = ts
+        self.symbols: List[str] = []
+        self.rates = array('d')
+        self.prices = array('d')
+        self.next_funding = array('d')
+        self._index: Dict[str, int] = {}
+
+    def append(self, symbol: str, rate: Optional[float], price: Optional[float],
+               next_funding: Optional[float] = None) -> None:
+        self._index[symbol] = len(self.symbols)
+        self.symbols.append(symbol)
+        self.rates.append(NAN if rate is None else rate)
+        self.prices.append(NAN if price is None else price)
+        self.next_funding.append(NAN if next_funding is None else next_funding)
+
+    def __getitem__(self, symbol: str) -> Quote:
+        row = self._index[symbol]
+        return Quote.make(self.exchange, symbol, _optional(self.rates[row]), _optional(self.prices[row]),
+                          self.ts, _optional(self.next_funding[row]))
+
+    def __contains__(self, symbol) -> bool:
+        return symbol in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def quotes(self) -> Iterator[Quote]:
+        for symbol in self._index:
+            yield self[symbol]
@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+# Публичные лимиты бирж на один IP: префикс пути -> (запросов, окно в секундах)
+EXCHANGE_LIMITS: Dict[str, Dict[str, Tuple[int, float]]] = {
+    "Bitget": {"default": (20, 1.0)},
+    "Gate": {"default": (200, 10.0)},
+    "MEXC": {"default": (20, 2.0)},
+    "ourbit": {"default": (20, 2.0)},
+    "kcex": {"default": (20, 2.0)},
+    "BingX": {"default": (100, 10.0)},
+    "Bybit": {"default": (600, 5.0)},
+    "aevo": {"default": (20, 1.0)},
+    "okx": {
+        "default": (20, 2.0),
+        "/api/v5/public/funding-rate": (20, 2.0),
+        "/api/v5/public/funding-rate-history": (10, 2.0),
+        "/api/v5/public/mark-price": (10, 2.0),
+    },
+    "Hyperliquid": {"default": (50, 60.0)},
+    "kucoin": {"default": (100, 10.0)},
+}
+
+# Заголовки с остатком лимита: (остаток, сброс, формат сброса)
+RATE_LIMIT_HEADERS = {
+    "Bybit": ("X-Bapi-Limit-Status", "X-Bapi-Limit-Reset-Timestamp", "abs_ms"),
+    "Gate": ("X-Gate-RateLimit-Requests-Remain", "X-Gate-RateLimit-Reset-Timestamp", "abs_ms"),
+    "kucoin": ("gw-ratelimit-remaining", "gw-ratelimit-reset", "rel_ms"),
+}
+
+THROTTLE_STATUSES = (418, 429)
+
+
+class TokenBucket:
+    """Токен-бакет: rate токенов в секунду, не больше capacity про запас."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, tokens: float = 1.0) -> float:
+        """Сколько секунд ждать, пока наберётся tokens; 0 — можно брать сейчас."""
+        self._refill(time.monotonic())
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    def take(self, tokens: float = 1.0) -> None:
+        """Списывает токены без ожидания; вызывающий сначала проверяет delay()."""
+        self._refill(time.monotonic())
+        self.tokens -= tokens
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        async with self._lock:
+            while True:
+                self._refill(time.monotonic())
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class ConcurrencyWindow:
+    """Скользящее окно одновременных запросов: растёт на успехах, сжимается вдвое на троттлинге."""
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1):
+        self.limit = float(initial)
+        self.maximum = maximum
+        self.minimum = minimum
+        self.in_flight = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, throttled: bool = False, adjust: bool = True) -> None:
+        async with self._cond:
+            self.in_flight -= 1
+            if adjust and throttled:
+                self.limit = max(self.minimum, self.limit / 2)
+            elif adjust:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class ExchangeLimiter:
+    def __init__(self, name: str, endpoints: Dict[str, Tuple[int, float]],
+                 concurrency: int = 20, max_concurrency: int = 50):
+        self.name = name
+        self.buckets = {
+            prefix: TokenBucket(count / window, count) for prefix, (count, window) in endpoints.items()
+        }
+        # Самый длинный префикс проверяем первым
+        self._prefixes = sorted((p for p in self.buckets if p != "default"), key=len, reverse=True)
+        self.window = ConcurrencyWindow(concurrency, max_concurrency)
+        self.blocked_until = 0.0
+        self.backoff = 0.0
+
+    def bucket_for(self, path: str) -> TokenBucket:
+        for prefix in self._prefixes:
+            if path.startswith(prefix):
+                return self.buckets[prefix]
+        return self.buckets["default"]
+
+    async def acquire(self, path: str) -> None:
+        delay = self.blocked_until - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.blocked_until - time.monotonic()
+        await self.window.acquire()
+        try:
+            await self.bucket_for(path).acquire()
+        except BaseException:
+            await self.window.release(adjust=False)
+            raise
+
+    def pause(self, seconds: float, reason: str) -> None:
+        until = time.monotonic() + seconds
+        if until > self.blocked_until:
+            self.blocked_until = until
+            logging.warning(f"{self.name}: пауза запросов на {seconds:.1f} с ({reason})")
+
+    def _header_delay(self, headers) -> Optional[float]:
+        retry_after = headers.get("Retry-After")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        spec = RATE_LIMIT_HEADERS.get(self.name)
+        if spec is None:
+            return None
+        remaining_header, reset_header, reset_format = spec
+        try:
+            remaining = int(headers.get(remaining_header, 1))
+            reset = float(headers.get(reset_header, 0))
+        except ValueError:
+            return None
+        if remaining > 0 or not reset:
+            return None
+        if reset_format == "abs_ms":
+            return max(0.0, reset / 1000 - time.time())
+        return reset / 1000
+
+    async def cancel(self) -> None:
+        await self.window.release(adjust=False)
+
+    async def release(self, status: Optional[int], headers=None) -> None:
+        throttled = status in THROTTLE_STATUSES
+        delay = self._header_delay(headers) if headers is not None else None
+        if throttled:
+            self.backoff = min(60.0, self.backoff * 2 if self.backoff else 1.0)
+            self.pause(delay if delay is not None else self.backoff, f"HTTP {status}")
+        else:
+            self.backoff = 0.0
+            if delay:
+                self.pause(delay, "лимит исчерпан")
+        await self.window.release(throttled)
+
+
+class RateLimiter:
+    """Лимитер запросов к биржам с общим потолком на все биржи сразу.
+
+    Подключается к сессиям через aiohttp.TraceConfig, поэтому фетчеры его не видят.
+    Лимиты бирж считаются на IP, поэтому у каждого выхода (прямого или прокси) свои бакеты.
+    """
+
+    def __init__(self, limits: Dict[str, Dict[str, Tuple[int, float]]] = EXCHANGE_LIMITS,
+                 hosts: Optional[Dict[str, List[str]]] = None,
+                 global_rate: float = 500.0, global_concurrency: int = 200):
+        self.limits = limits
+        self.exchanges: Dict[Tuple[str, str], ExchangeLimiter] = {}
+        self.host_exchanges = {
+            url.split("://", 1)[-1]: exchange for exchange, urls in (hosts or {}).items() for url in urls
+        }
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.global_slots = asyncio.Semaphore(global_concurrency)
+
+    def exchange(self, name: str, egress: str = "direct") -> ExchangeLimiter:
+        limiter = self.exchanges.get((name, egress))
+        if limiter is None:
+            limiter = ExchangeLimiter(name, self.limits.get(name, {"default": (10, 1.0)}))
+            self.exchanges[(name, egress)] = limiter
+        return limiter
+
+    def trace_config(self, exchange: Optional[str] = None, egress: str = "direct") -> aiohttp.TraceConfig:
+        """Трейс для сессии одной биржи или, без exchange, для общей сессии (биржа по хосту)."""
+
+        def resolve(url) -> ExchangeLimiter:
+            if exchange is not None:
+                return self.exchange(exchange, egress)
+            return self.exchange(self.host_exchanges.get(url.host, url.host), egress)
+
+        async def on_request_start(session, ctx, params):
+            limiter = resolve(params.url)
+            await limiter.acquire(params.url.path)
+            try:
+                await self.global_bucket.acquire()
+                await self.global_slots.acquire()
+            except BaseException:
+                await limiter.cancel()
+                raise
+            ctx.limiter = limiter
+
+        async def on_request_done(session, ctx, params):
+            limiter = getattr(ctx, "limiter", None)
+            if limiter is None:
+                return
+            ctx.limiter = None
+            self.global_slots.release()
+            response = getattr(params, "response", None)
+            if response is not None:
+                await limiter.release(response.status, response.headers)
+            else:
+                await limiter.release(None)
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_redirect.append(on_request_done)
+        trace.on_request_end.append(on_request_done)
+        trace.on_request_exception.append(on_request_done)
+        return trace
@@ -0,0 +1,198 @@
+"""Реплей записанных снимков (snapshot_recorder) через ту же логику поиска спредов, что и main().
+
+Время симулируется по меткам записей: без сети, Telegram и ожидания между циклами.
+Пример перебора порогов на всех ядрах:
+
+    python replay.py --from 2026-10-01 --to 2026-10-08 --spread-low 0.2,0.3,0.5 --price-diff 0.5,1,2
+"""
+import argparse
+import csv
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from market_state import MarketState
+from snapshot_recorder import SnapshotRecorder
+from spread_engine import EVALUATION_QUORUM, QUOTE_MAX_AGE, alert_tier, evaluate_spreads
+from storage import BLACKLIST_TTL
+
+# (spread_low, spread_medium, spread_high, price_diff)
+Settings = Tuple[float, float, float, float]
+
+
+class ReplayResult:
+    __slots__ = ("settings", "alerts", "tiers", "cycles")
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        # (время, символ, ex1, ex2, спред, разница цен %, уровень)
+        self.alerts: List[Tuple[float, str, str, str, float, float, Optional[str]]] = []
+        self.tiers: Dict[Optional[str], int] = {"low": 0, "medium": 0, "high": 0, None: 0}
+        self.cycles = 0
+
+
+class Recording:
+    """Записи за диапазон, разбитые на ответы бирж (одинаковые время и биржа)."""
+
+    def __init__(self, root: str = "recordings", start: Optional[float] = None, end: Optional[float] = None):
+        recorder = SnapshotRecorder(root)
+        recorder.open()
+        columns = recorder.query(start, end)
+        order = np.argsort(columns["ts"], kind="stable")
+        self.ts = columns["ts"][order]
+        self.symbol_codes = columns["symbol"][order]
+        self.exchange_codes = columns["exchange"][order]
+        self.rates = columns["rate"][order]
+        self.prices = columns["price"][order]
+        self.symbols = recorder.symbols.names
+        self.exchanges = recorder.exchanges.names
+        changed = (np.diff(self.ts) != 0) | (np.diff(self.exchange_codes) != 0)
+        self.bounds = np.concatenate(([0], np.flatnonzero(changed) + 1, [len(self.ts)]))
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def batches(self) -> Iterator[Tuple[float, str, np.ndarray, np.ndarray, np.ndarray]]:
+        """(время, биржа, коды символов, ставки, цены) в порядке записи."""
+        for begin, stop in zip(self.bounds[:-1].tolist(), self.bounds[1:].tolist()):
+            if begin == stop:
+                continue
+            yield (float(self.ts[begin]), self.exchanges[int(self.exchange_codes[begin])],
+                   self.symbol_codes[begin:stop], self.rates[begin:stop], self.prices[begin:stop])
+
+
+def replay(recording: Recording, settings: Settings, quote_max_age: float = QUOTE_MAX_AGE,
+           quorum: int = EVALUATION_QUORUM, blacklist_ttl: int = BLACKLIST_TTL) -> ReplayResult:
+    """Прогон записи с порогами settings; возвращает уведомления, которые отправил бы бот."""
+    spread_low, spread_medium, spread_high, price_diff = settings
+    result = ReplayResult(settings)
+    market_state = MarketState()
+    blacklist: Dict[str, float] = {}
+    names = recording.symbols
+    quorum = min(quorum, len(set(recording.exchange_codes.tolist()))) or 1
+    cycle_exchanges: set = set()
+    active_symbols: set = set()
+
+    for now, exchange, codes, rates, prices in recording.batches():
+        # Биржа ответила второй раз — значит, начался следующий цикл main()
+        if exchange in cycle_exchanges:
+            cycle_exchanges.clear()
+            active_symbols.clear()
+            result.cycles += 1
+            for symbol in [symbol for symbol, expires_at in blacklist.items() if expires_at <= now]:
+                del blacklist[symbol]
+        cycle_exchanges.add(exchange)
+
+        for code, rate, price in zip(codes.tolist(), rates.tolist(), prices.tolist()):
+            symbol = names[code]
+            # Символы из чёрного списка main() у бирж не запрашивает
+            if symbol in blacklist:
+                continue
+            active_symbols.add(symbol)
+            market_state.update(symbol, exchange, rate, None if price != price else price, now)
+
+        if len(cycle_exchanges) < quorum:
+            continue
+        candidates = [
+            symbol for symbol in market_state.drain_dirty()
+            if symbol not in blacklist and symbol in active_symbols
+        ]
+        matrix_rates, matrix_prices = market_state.matrix(candidates, max_age=quote_max_age, now=now)
+        max_spreads = evaluate_spreads(
+            candidates, market_state.exchanges, matrix_rates, matrix_prices, spread_low, price_diff
+        )
+        for symbol, data in max_spreads.items():
+            blacklist[symbol] = now + blacklist_ttl
+            market_state.forget(symbol)
+            spread = abs(data["rate1"] - data["rate2"])
+            tier = alert_tier(spread, spread_low, spread_medium, spread_high)
+            result.tiers[tier] += 1
+            result.alerts.append((now, symbol, data["ex1"], data["ex2"], spread, data["price_diff_percent"], tier))
+    if cycle_exchanges:
+        result.cycles += 1
+    return result
+
+
+# Запись загружается один раз на процесс: чанки отображаются в память, страницы общие
+_recording: Optional[Recording] = None
+
+
+def _init_worker(root: str, start: Optional[float], end: Optional[float]) -> None:
+    global _recording
+    _recording = Recording(root, start, end)
+
+
+def _replay_worker(settings: Settings) -> ReplayResult:
+    return replay(_recording, settings)
+
+
+def sweep(root: str, grid: List[Settings], start: Optional[float] = None, end: Optional[float] = None,
+          workers: Optional[int] = None) -> List[ReplayResult]:
+    """Параллельный реплей по набору порогов, по процессу на ядро."""
+    workers = min(workers or os.cpu_count() or 1, len(grid))
+    if workers <= 1:
+        recording = Recording(root, start, end)
+        return [replay(recording, settings) for settings in grid]
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(root, start, end)) as pool:
+        return list(pool.map(_replay_worker, grid))
+
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
+def _floats(value: str) -> List[float]:
+    return [float(item) for item in value.split(",") if item]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Реплей записанных котировок и перебор порогов")
+    parser.add_argument("--root", default="recordings")
+    parser.add_argument("--from", dest="start", help="начало: ISO-дата или unix-время")
+    parser.add_argument("--to", dest="end", help="конец: ISO-дата или unix-время")
+    parser.add_argument("--spread-low", default="0.3", help="значения через запятую")
+    parser.add_argument("--spread-medium", type=float, default=0.7)
+    parser.add_argument("--spread-high", type=float, default=1.0)
+    parser.add_argument("--price-diff", default="1.0", help="значения через запятую")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--alerts", help="CSV со всеми уведомлениями всех прогонов")
+    args = parser.parse_args()
+
+    grid = [
+        (spread_low, args.spread_medium, args.spread_high, price_diff)
+        for spread_low, price_diff in itertools.product(_floats(args.spread_low), _floats(args.price_diff))
+    ]
+    started = time.perf_counter()
+    results = sweep(args.root, grid, _parse_time(args.start), _parse_time(args.end), args.workers)
+    elapsed = time.perf_counter() - started
+
+    print(f"{'spread_low':>10} {'price_diff':>10} {'cycles':>7} {'alerts':>7} {'low':>5} {'medium':>6} {'high':>5}")
+    for result in results:
+        spread_low, _, _, price_diff = result.settings
+        tiers = result.tiers
+        print(f"{spread_low:>10} {price_diff:>10} {result.cycles:>7} {len(result.alerts):>7} "
+              f"{tiers['low']:>5} {tiers['medium']:>6} {tiers['high']:>5}")
+    print(f"{len(results)} прогонов за {elapsed:.1f} с")
+
+    if args.alerts:
+        with open(args.alerts, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(["spread_low", "price_diff", "ts", "symbol", "ex1", "ex2", "spread",
+                             "price_diff_percent", "tier"])
+            for result in results:
+                for alert in result.alerts:
+                    writer.writerow([result.settings[0], result.settings[3], *alert])
+
+
+if __name__ == "__main__":
+    main()
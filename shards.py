@@ -0,0 +1,356 @@
+"""Многопроцессный режим: биржи опрашиваются в процессах-шардах, процесс бота — координатор.
+
+Шард — отдельный процесс `python shards.py` со своим циклом asyncio, сессиями, стримами
+и лимитерами. Он опрашивает свои биржи (и, если задано, свою часть символов) теми же
+fetch_venue() из main.py и шлёт ответы координатору через Unix-сокет. Координатор в
+процессе бота пишет их в market_state, оценивает спреды и ставит уведомления, а шардам
+отдаёт spread_low, текущие спреды, чёрный список и выключенные биржи. Упавший шард
+перезапускается с нарастающей паузой.
+
+Шарды задаются в SHARDS в main.py или в переменной окружения SHARDS (JSON):
+
+    SHARDS='[{"exchanges": ["Bitget", "Gate", "MEXC", "ourbit"]},
+             {"exchanges": ["kcex", "BingX", "Bybit", "aevo"]},
+             {"exchanges": ["okx", "Hyperliquid", "kucoin"], "symbols": [0, 1]}]' python main.py
+
+"symbols": [part, parts] — шарду достаются символы с crc32(символ) % parts == part,
+"metrics_port" — свой /metrics шарда. Шард запускает координатор, вручную — так:
+
+    python shards.py --socket /tmp/funding-shards-XXXX/coordinator.sock --shard '{"name": "0", "exchanges": ["Bitget"]}'
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import pickle
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import zlib
+from typing import Dict, FrozenSet, List, NamedTuple, Optional, Set, Tuple
+
+from exchanges import exchange_registry
+from metrics import MetricsServer, SHARD_RESTARTS
+from quote import Quote, QuoteBatch
+from symbol_registry import symbol_registry
+
+# Длина сообщения перед телом (pickle): сокет лежит в каталоге, доступном только владельцу
+FRAME = struct.Struct("!I")
+# Пауза между циклами шарда, как в monitor()
+CYCLE_PAUSE = 5
+
+
+class ShardSpec(NamedTuple):
+    name: str
+    exchanges: Tuple[str, ...]
+    # Символ принадлежит шарду, если crc32(символ) % parts == part
+    part: int = 0
+    parts: int = 1
+    metrics_port: Optional[int] = None
+
+    @classmethod
+    def from_config(cls, config: Dict, index: int) -> "ShardSpec":
+        exchanges = tuple(config["exchanges"])
+        for name in exchanges:
+            exchange_registry.spec(name)
+        part, parts = config.get("symbols", (0, 1))
+        if parts < 1 or not 0 <= part < parts:
+            raise ValueError(f"Шард {index}: symbols должно быть [part, parts], 0 <= part < parts")
+        return cls(str(config.get("name", index)), exchanges, part, parts, config.get("metrics_port"))
+
+    def to_json(self) -> str:
+        return json.dumps({"name": self.name, "exchanges": list(self.exchanges), "symbols": [self.part, self.parts],
+                           "metrics_port": self.metrics_port})
+
+    def owns(self, key: str) -> bool:
+        return self.parts == 1 or zlib.crc32(key.encode()) % self.parts == self.part
+
+
+def load_shards(config: List[Dict]) -> List[ShardSpec]:
+    return [ShardSpec.from_config(item, index) for index, item in enumerate(config)]
+
+
+async def send_message(writer: asyncio.StreamWriter, message: tuple) -> None:
+    payload = pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)
+    writer.writelines((FRAME.pack(len(payload)), payload))
+    await writer.drain()
+
+
+async def read_message(reader: asyncio.StreamReader) -> tuple:
+    header = await reader.readexactly(FRAME.size)
+    return pickle.loads(await reader.readexactly(FRAME.unpack(header)[0]))
+
+
+class ShardCoordinator:
+    """Запускает шарды, перезапускает упавшие и копит их ответы до collect().
+
+    Сообщения шарда: ("hello", имя, pid), затем ("venue", биржа, записи, ключи) на каждый
+    ответ биржи. Координатор шлёт ("state", spread_low, спреды, чёрный список,
+    выключенные биржи) после каждой оценки и ("stop",) при остановке.
+    """
+
+    def __init__(self, shards: List[ShardSpec], restart_delay: float = 1.0, max_restart_delay: float = 60.0,
+                 stop_timeout: float = 10.0):
+        self.shards = shards
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stop_timeout = stop_timeout
+        self.exchanges: Set[str] = {name for spec in shards for name in spec.exchanges}
+        # Биржи, от которых пришёл хотя бы один ответ (для кворума оценки)
+        self.reported: Set[str] = set()
+        self.socket_path: Optional[str] = None
+        self.stats = {"venues": 0, "restarts": 0}
+        self._pending: List[Tuple[str, object, List[str]]] = []
+        self._ready = asyncio.Event()
+        self._writers: Dict[str, asyncio.StreamWriter] = {}
+        self._processes: Dict[str, asyncio.subprocess.Process] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._directory: Optional[str] = None
+        self._closing = False
+
+    async def start(self) -> None:
+        missing = [name for name in exchange_registry.enabled() if name not in self.exchanges]
+        if missing:
+            logging.warning(f"Биржи без шарда не опрашиваются: {', '.join(missing)}")
+        self._directory = tempfile.mkdtemp(prefix="funding-shards-")
+        self.socket_path = os.path.join(self._directory, "coordinator.sock")
+        self._server = await asyncio.start_unix_server(self._serve, path=self.socket_path)
+        self._tasks = [asyncio.create_task(self._supervise(spec)) for spec in self.shards]
+
+    async def _supervise(self, spec: ShardSpec) -> None:
+        """Держит процесс шарда запущенным; пауза перед перезапуском растёт, пока шард падает сразу."""
+        delay = self.restart_delay
+        while not self._closing:
+            started = time.monotonic()
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__), "--socket", self.socket_path, "--shard", spec.to_json()
+            )
+            self._processes[spec.name] = process
+            code = await process.wait()
+            if self._closing:
+                return
+            # Проработавший дольше max_restart_delay шард считается здоровым: пауза сбрасывается
+            if time.monotonic() - started > self.max_restart_delay:
+                delay = self.restart_delay
+            self.stats["restarts"] += 1
+            SHARD_RESTARTS.inc(spec.name)
+            logging.error(f"Шард {spec.name} завершился с кодом {code}, перезапуск через {delay:.0f} с")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_restart_delay)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        name = None
+        try:
+            _, name, pid = await read_message(reader)
+            self._writers[name] = writer
+            logging.info(f"Шард {name} подключился (pid {pid})")
+            if self._closing:
+                # Перезапущенный шард подключился уже после рассылки ("stop",)
+                await send_message(writer, ("stop",))
+            while True:
+                _, exchange, entries, keys = await read_message(reader)
+                self.reported.add(exchange)
+                self.stats["venues"] += 1
+                self._pending.append((exchange, entries, keys))
+                self._ready.set()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if name is not None and self._writers.get(name) is writer:
+                del self._writers[name]
+            writer.close()
+
+    async def collect(self, timeout: float) -> List[Tuple[str, object, List[str]]]:
+        """Ответы шардов по порядку прихода: ждёт первый не дольше timeout секунд."""
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        pending, self._pending = self._pending, []
+        self._ready.clear()
+        return pending
+
+    async def broadcast(self, spread_low: float, spreads: Dict[str, float], blacklist: FrozenSet[str],
+                        disabled: FrozenSet[str]) -> None:
+        # NaN (меньше двух бирж) шард подставит сам
+        spreads = {symbol: spread for symbol, spread in spreads.items() if not math.isnan(spread)}
+        await self._send_all(("state", spread_low, spreads, blacklist, disabled))
+
+    async def _send_all(self, message: tuple) -> None:
+        results = await asyncio.gather(
+            *(send_message(writer, message) for writer in list(self._writers.values())), return_exceptions=True
+        )
+        for error in results:
+            if isinstance(error, Exception):
+                logging.error(f"Ошибка отправки шарду: {error}")
+
+    async def close(self) -> None:
+        self._closing = True
+        await self._send_all(("stop",))
+        for name, process in self._processes.items():
+            if process.returncode is not None:
+                continue
+            try:
+                await asyncio.wait_for(process.wait(), self.stop_timeout)
+            except asyncio.TimeoutError:
+                logging.error(f"Шард {name} не остановился за {self.stop_timeout:.0f} с, завершаем")
+                process.kill()
+                await process.wait()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for writer in list(self._writers.values()):
+            writer.close()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+
+
+class ShardWorker:
+    """Процесс шарда: цикл опроса своих бирж из main.py, ответы — координатору."""
+
+    def __init__(self, spec: ShardSpec, socket_path: str):
+        self.spec = spec
+        self.socket_path = socket_path
+        self.foreign = set(exchange_registry.specs) - set(spec.exchanges)
+        # От координатора: порог и спреды для poll_scheduler, чёрный список
+        self.spread_low = 0.0
+        self.spreads: Dict[str, float] = {}
+        self.blacklist: FrozenSet[str] = frozenset()
+        self.stopping = asyncio.Event()
+        self.metrics_server = MetricsServer(port=spec.metrics_port) if spec.metrics_port else None
+        self.bot = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+    async def poll_spreads(self, keys: List[str]) -> Tuple[float, Dict[str, float]]:
+        return self.spread_low, {key: self.spreads.get(key, math.nan) for key in keys}
+
+    def owned(self, coins) -> List[str]:
+        return [coin for coin in coins if self.spec.owns(symbol_registry.canonical(coin))]
+
+    async def run(self) -> None:
+        # main.py импортируется только в процессе шарда: координатор сам его импортирует
+        import main as bot
+        self.bot = bot
+        bot.poll_spreads = self.poll_spreads
+        exchange_registry.disabled |= self.foreign
+        reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+        await send_message(self._writer, ("hello", self.spec.name, os.getpid()))
+        listener = asyncio.create_task(self.listen(reader))
+        try:
+            await self.start()
+            while not self.stopping.is_set():
+                try:
+                    await self.cycle()
+                except Exception as e:
+                    logging.error(f"Ошибка в цикле шарда: {e}")
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), CYCLE_PAUSE)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+            await self.close()
+
+    async def listen(self, reader: asyncio.StreamReader) -> None:
+        try:
+            while True:
+                message = await read_message(reader)
+                if message[0] == "stop":
+                    break
+                _, self.spread_low, self.spreads, self.blacklist, disabled = message
+                # /exchange в боте доходит до шарда здесь
+                exchange_registry.disabled = self.foreign | disabled
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logging.error("Соединение с координатором потеряно")
+        finally:
+            self.stopping.set()
+
+    async def start(self) -> None:
+        bot = self.bot
+        await bot.http_client.start()
+        await asyncio.gather(bot.http_client.warm_up(exchange_registry.enabled()), bot.input_files.start())
+        coins = list(bot.input_files[bot.COINS_FILE].lines)
+        symbol_registry.update(coins)
+        if bot.USE_STREAMS:
+            await bot.stream_hub.set_streams(exchange_registry.streams())
+            await bot.stream_hub.start(self.owned(coins), bot.http_client.session)
+        if self.metrics_server is not None:
+            await self.metrics_server.start()
+
+    async def cycle(self) -> None:
+        bot = self.bot
+        coins = list(bot.input_files[bot.COINS_FILE].lines)
+        symbol_registry.update(coins)
+        owned = self.owned(coins)
+        symbols = bot.unblocked(owned, self.blacklist)
+        await bot.proxy_pool.update(bot.load_proxies())
+        if bot.USE_STREAMS:
+            await bot.stream_hub.set_streams(exchange_registry.streams())
+            await bot.stream_hub.resubscribe(owned)
+
+        keys = [symbol_registry.canonical(symbol) for symbol in symbols]
+        venues = [bot.fetch_venue(exchange_cls, symbols) for exchange_cls in exchange_registry.fetchers()]
+        for venue in asyncio.as_completed(venues):
+            exchange, entries = await venue
+            if entries is not None:
+                await send_message(self._writer, ("venue", exchange, *self.pack(exchange, entries, keys)))
+                # Спреды для планировщика шарда приходят от координатора
+                await bot.schedule_polls(exchange, entries)
+
+    def pack(self, exchange: str, entries, keys: List[str]):
+        """Ответ биржи для координатора: без NOT_POLLED и исключений, которые не переносятся через pickle."""
+        if isinstance(entries, QuoteBatch) and self.spec.parts == 1:
+            return entries, keys
+        packed = {}
+        polled = []
+        errors = []
+        for key in keys:
+            entry = entries.get(key)
+            if entry is self.bot.NOT_POLLED:
+                continue
+            polled.append(key)
+            if entry is None:
+                continue
+            if not isinstance(entry, Quote):
+                errors.append(entry)
+                entry = Quote.error(exchange, key)
+            else:
+                # Волатильность и время расчёта для poll_scheduler шарда; в боте это делает apply_venue
+                self.bot.poll_scheduler.observe(exchange, key, entry.rate, entry.next_funding)
+            packed[key] = entry
+        if errors:
+            logging.error(f"Ошибка получения данных с {exchange} по {len(errors)} символам: {errors[0]}")
+        return packed, polled
+
+    async def close(self) -> None:
+        bot = self.bot
+        await bot.stream_hub.close()
+        await asyncio.gather(bot.http_client.close(), bot.proxy_pool.close(), bot.input_files.close())
+        if self.metrics_server is not None:
+            await self.metrics_server.close()
+        if self._writer is not None:
+            self._writer.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Процесс-шард: опрос части бирж для координатора в main.py")
+    parser.add_argument("--socket", required=True, help="Unix-сокет координатора")
+    parser.add_argument("--shard", required=True, help="описание шарда (JSON, как элемент SHARDS)")
+    args = parser.parse_args()
+    spec = ShardSpec.from_config(json.loads(args.shard), 0)
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s - shard {spec.name} - %(levelname)s - %(message)s')
+    asyncio.run(ShardWorker(spec, args.socket).run())
+
+
+if __name__ == "__main__":
+    main()
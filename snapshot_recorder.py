@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import os
+import shutil
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Колонки чанка: имя -> тип фиксированной ширины; каждая колонка — отдельный файл
+COLUMNS: Tuple[Tuple[str, str], ...] = (
+    ("ts", "<f8"),
+    ("symbol", "<u4"),
+    ("exchange", "<u2"),
+    ("rate", "<f8"),
+    ("price", "<f8"),
+)
+CHUNK_PREFIX = "chunk_"
+
+
+class Dictionary:
+    """Словарное кодирование строк: код — номер строки в файле, файл только дописывается."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.names: List[str] = []
+        self.codes: Dict[str, int] = {}
+        self._saved = 0
+
+    def load(self) -> None:
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    self.code(line.rstrip("\n"))
+        self._saved = len(self.names)
+
+    def code(self, name: str) -> int:
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            self.names.append(name)
+            self.codes[name] = code
+        return code
+
+    def unsaved(self) -> List[str]:
+        return self.names[self._saved:]
+
+    def mark_saved(self, count: int) -> None:
+        self._saved += count
+
+    def decode(self, codes: np.ndarray) -> List[str]:
+        return [self.names[code] for code in codes.tolist()]
+
+
+class SnapshotRecorder:
+    """Запись котировок каждого цикла (время, символ, биржа, ставка, цена) в колоночный формат.
+
+    record() только кодирует значения и кладёт их в буфер; запись на диск идёт
+    в потоке из фоновой задачи. Данные режутся на чанки по chunk_seconds, каждый чанк —
+    каталог с файлом на колонку, который можно открыть через np.memmap без чтения целиком.
+    Чанки старше retention удаляются.
+    """
+
+    def __init__(self, root: str = "recordings", chunk_seconds: int = 3600,
+                 retention: float = 7 * 24 * 3600, flush_interval: float = 5.0):
+        self.root = root
+        self.chunk_seconds = chunk_seconds
+        self.retention = retention
+        self.flush_interval = flush_interval
+        self.symbols = Dictionary(os.path.join(root, "symbols.dict"))
+        self.exchanges = Dictionary(os.path.join(root, "exchanges.dict"))
+        self._pending: List[Dict[str, np.ndarray]] = []
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"records": 0, "written": 0, "chunks_removed": 0}
+
+    # Запись
+    def record(self, exchange: str, quotes: Iterable[Tuple[str, Optional[float], Optional[float]]],
+               ts: Optional[float] = None) -> int:
+        """Буферизует котировки биржи (символ, ставка, цена); ставка None не пишется."""
+        ts = time.time() if ts is None else ts
+        symbol_codes, rates, prices = [], [], []
+        code = self.symbols.code
+        for symbol, rate, price in quotes:
+            if rate is None:
+                continue
+            symbol_codes.append(code(symbol))
+            rates.append(rate)
+            prices.append(np.nan if price is None else price)
+        count = len(symbol_codes)
+        if not count:
+            return 0
+        self._pending.append({
+            "ts": np.full(count, ts, dtype="<f8"),
+            "symbol": np.array(symbol_codes, dtype="<u4"),
+            "exchange": np.full(count, self.exchanges.code(exchange), dtype="<u2"),
+            "rate": np.array(rates, dtype="<f8"),
+            "price": np.array(prices, dtype="<f8"),
+        })
+        self.stats["records"] += count
+        return count
+
+    def _chunk_dir(self, chunk_start: int) -> str:
+        return os.path.join(self.root, f"{CHUNK_PREFIX}{chunk_start}")
+
+    def _write(self, batches: List[Dict[str, np.ndarray]], new_symbols: List[str],
+               new_exchanges: List[str]) -> int:
+        os.makedirs(self.root, exist_ok=True)
+        # Сначала словари: код в колонке всегда уже есть в файле словаря
+        for dictionary, names in ((self.symbols, new_symbols), (self.exchanges, new_exchanges)):
+            if names:
+                with open(dictionary.path, "a", encoding="utf-8") as file:
+                    file.write("".join(f"{name}\n" for name in names))
+        if not batches:
+            return 0
+        columns = {name: np.concatenate([batch[name] for batch in batches]) for name, _ in COLUMNS}
+        chunk_ids = (columns["ts"] // self.chunk_seconds).astype(np.int64)
+        for chunk_id in np.unique(chunk_ids):
+            mask = chunk_ids == chunk_id
+            path = self._chunk_dir(int(chunk_id) * self.chunk_seconds)
+            os.makedirs(path, exist_ok=True)
+            for name, _ in COLUMNS:
+                with open(os.path.join(path, name), "ab") as file:
+                    file.write(columns[name][mask].tobytes())
+        return len(chunk_ids)
+
+    def _apply_retention(self) -> int:
+        cutoff = time.time() - self.retention
+        removed = 0
+        for chunk_start in self.chunks():
+            if chunk_start + self.chunk_seconds <= cutoff:
+                shutil.rmtree(self._chunk_dir(chunk_start), ignore_errors=True)
+                removed += 1
+        return removed
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            batches, self._pending = self._pending, []
+            new_symbols, new_exchanges = self.symbols.unsaved(), self.exchanges.unsaved()
+            if not batches and not new_symbols and not new_exchanges:
+                return
+            try:
+                written = await asyncio.to_thread(self._write, batches, new_symbols, new_exchanges)
+            except Exception:
+                # Не потерять буфер: допишем при следующем сбросе
+                self._pending = batches + self._pending
+                raise
+            self.symbols.mark_saved(len(new_symbols))
+            self.exchanges.mark_saved(len(new_exchanges))
+            self.stats["written"] += written
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                self.stats["chunks_removed"] += await asyncio.to_thread(self._apply_retention)
+            except Exception as e:
+                logging.error(f"Ошибка записи снимков котировок: {e}")
+
+    def open(self) -> None:
+        """Загружает словари; достаточно для чтения записей вне бота."""
+        os.makedirs(self.root, exist_ok=True)
+        self.symbols.load()
+        self.exchanges.load()
+
+    async def start(self) -> None:
+        await asyncio.to_thread(self.open)
+        self._task = asyncio.create_task(self._run())
+        logging.info(f"Запись снимков в {self.root}: {len(self.chunks())} чанков")
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            await self.flush()
+
+    # Чтение
+    def chunks(self, start: Optional[float] = None, end: Optional[float] = None) -> List[int]:
+        """Начала чанков (unix, секунды), пересекающихся с [start, end)."""
+        if not os.path.isdir(self.root):
+            return []
+        result = []
+        for name in os.listdir(self.root):
+            if not name.startswith(CHUNK_PREFIX):
+                continue
+            try:
+                chunk_start = int(name[len(CHUNK_PREFIX):])
+            except ValueError:
+                continue
+            if start is not None and chunk_start + self.chunk_seconds <= start:
+                continue
+            if end is not None and chunk_start >= end:
+                continue
+            result.append(chunk_start)
+        return sorted(result)
+
+    def load_chunk(self, chunk_start: int) -> Dict[str, np.ndarray]:
+        """Колонки чанка как np.memmap (только чтение), без копирования в память."""
+        path = self._chunk_dir(chunk_start)
+        sizes = {}
+        for name, dtype in COLUMNS:
+            file_path = os.path.join(path, name)
+            size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            sizes[name] = size // np.dtype(dtype).itemsize
+        # Колонки дописываются по очереди: при обрыве берём общую длину
+        rows = min(sizes.values())
+        columns = {}
+        for name, dtype in COLUMNS:
+            if rows == 0:
+                columns[name] = np.empty(0, dtype=dtype)
+            else:
+                columns[name] = np.memmap(os.path.join(path, name), dtype=dtype, mode="r", shape=(rows,))
+        return columns
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              symbol: Optional[str] = None, exchange: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """Записи за [start, end) с фильтром по символу и бирже; symbol/exchange в колонках — коды."""
+        symbol_code = self.symbols.codes.get(symbol) if symbol is not None else None
+        exchange_code = self.exchanges.codes.get(exchange) if exchange is not None else None
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name, _ in COLUMNS}
+        if (symbol is None or symbol_code is not None) and (exchange is None or exchange_code is not None):
+            for chunk_start in self.chunks(start, end):
+                columns = self.load_chunk(chunk_start)
+                mask = np.ones(len(columns["ts"]), dtype=bool)
+                if start is not None:
+                    mask &= columns["ts"] >= start
+                if end is not None:
+                    mask &= columns["ts"] < end
+                if symbol_code is not None:
+                    mask &= columns["symbol"] == symbol_code
+                if exchange_code is not None:
+                    mask &= columns["exchange"] == exchange_code
+                for name, _ in COLUMNS:
+                    parts[name].append(np.asarray(columns[name][mask]))
+        return {
+            name: np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=dtype)
+            for name, dtype in COLUMNS
+        }
+
+    def export_csv(self, path: str, start: Optional[float] = None, end: Optional[float] = None,
+                   symbol: Optional[str] = None, exchange: Optional[str] = None) -> int:
+        """Выгрузка диапазона в CSV с раскодированными символами и биржами."""
+        columns = self.query(start, end, symbol, exchange)
+        symbols = self.symbols.decode(columns["symbol"])
+        exchanges = self.exchanges.decode(columns["exchange"])
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("ts,symbol,exchange,rate,price\n")
+            for ts, sym, ex, rate, price in zip(columns["ts"].tolist(), symbols, exchanges,
+                                                columns["rate"].tolist(), columns["price"].tolist()):
+                file.write(f"{ts:.3f},{sym},{ex},{rate!r},{price!r}\n")
+        return len(symbols)
@@ -0,0 +1,121 @@
+import warnings
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Котировки старше этого (секунды) в оценке спреда не участвуют
+QUOTE_MAX_AGE = 120
+# Сколько бирж должно ответить, прежде чем символы начнут оцениваться
+EVALUATION_QUORUM = 6
+# Спред и разница цен округляются до этого числа знаков: ставки и цены приходят десятичными
+# строками, и равные в Decimal спреды не должны различаться последним битом float
+DECIMALS = 10
+
+
+def _threshold_ops(spread_low: float, price_diff: float):
+    """Сравнения с порогами, как в исходном цикле на Decimal.
+
+    Там порог — Decimal(float), точное двоичное значение: спред, равный spread_low = 0.3,
+    проходил (0.3 > 0.29999...), а равный 0.1 — нет. Округлённый спред совпадает с порогом
+    как float именно в этих случаях, и знак неравенства выбирается так же.
+    """
+    spread_low, price_diff = float(spread_low), float(price_diff)
+    above_low = np.greater_equal if Decimal(str(spread_low)) > Decimal(spread_low) else np.greater
+    within_diff = np.less_equal if Decimal(str(price_diff)) <= Decimal(price_diff) else np.less
+    return above_low, within_diff
+
+
+def best_spreads(rates: np.ndarray, prices: np.ndarray, spread_low: float,
+                 price_diff: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Лучшая пара бирж для каждого символа по матрицам символ x биржа (NaN — нет котировки).
+
+    Возвращает (спред, индекс ex1, индекс ex2, разница цен в %); индекс -1 — пары нет.
+    Пары перебираются в том же порядке (i < j), что и в исходном цикле, и при равных
+    спредах побеждает первая, поэтому результат совпадает с построчным расчётом.
+    Пары считаются только для символов, где max - min ставок выше spread_low.
+    """
+    above_low, within_diff = _threshold_ops(spread_low, price_diff)
+    n_symbols, n_exchanges = rates.shape
+    best = np.full(n_symbols, -np.inf)
+    best_i = np.full(n_symbols, -1, dtype=np.int32)
+    best_j = np.full(n_symbols, -1, dtype=np.int32)
+    best_pdp = np.full(n_symbols, np.nan)
+    if n_exchanges < 2:
+        return best, best_i, best_j, best_pdp
+
+    # Символы, у которых разброс ставок не дотягивает до порога, пары не дадут
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        spread_range = np.round(np.nanmax(rates, axis=1) - np.nanmin(rates, axis=1), DECIMALS)
+        candidates = np.flatnonzero(above_low(spread_range, spread_low))
+    if not len(candidates):
+        return best, best_i, best_j, best_pdp
+    rates = rates[candidates]
+    prices = prices[candidates]
+    rows = np.arange(len(candidates))
+    found = np.full(len(candidates), -np.inf)
+    found_i = np.full(len(candidates), -1, dtype=np.int32)
+    found_j = np.full(len(candidates), -1, dtype=np.int32)
+    found_pdp = np.full(len(candidates), np.nan)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for i in range(n_exchanges - 1):
+            rate_i = rates[:, i:i + 1]
+            price_i = prices[:, i:i + 1]
+            rate_j = rates[:, i + 1:]
+            price_j = prices[:, i + 1:]
+
+            spreads = np.round(np.abs(rate_i - rate_j), DECIMALS)
+            # min() как в Python: при NaN берётся первый аргумент
+            price_min = np.where(price_j < price_i, price_j, price_i)
+            pdp = np.round(np.where(price_min > 0, np.abs((price_i - price_j) / price_min * 100), 100.0), DECIMALS)
+            passed = above_low(spreads, spread_low) & within_diff(pdp, price_diff)
+            masked = np.where(passed, spreads, -np.inf)
+
+            k = np.argmax(masked, axis=1)
+            candidate = masked[rows, k]
+            better = candidate > found
+            found = np.where(better, candidate, found)
+            found_i = np.where(better, i, found_i)
+            found_j = np.where(better, i + 1 + k, found_j)
+            found_pdp = np.where(better, pdp[rows, k], found_pdp)
+
+    best[candidates] = found
+    best_i[candidates] = found_i
+    best_j[candidates] = found_j
+    best_pdp[candidates] = found_pdp
+    return best, best_i, best_j, best_pdp
+
+
+def evaluate_spreads(symbols: List[str], exchanges: List[str], rates: np.ndarray, prices: np.ndarray,
+                     spread_low: float, price_diff: float) -> Dict[str, Dict]:
+    """Словарь max_spreads в формате main(): символ -> лучшая пара бирж."""
+    if not symbols or len(exchanges) < 2:
+        return {}
+    best, best_i, best_j, best_pdp = best_spreads(rates, prices, spread_low, price_diff)
+    max_spreads = {}
+    for row in np.flatnonzero(best_i >= 0):
+        i, j = best_i[row], best_j[row]
+        max_spreads[symbols[row]] = {
+            "spread": float(best[row]),
+            "ex1": exchanges[i],
+            "ex2": exchanges[j],
+            "rate1": float(rates[row, i]),
+            "rate2": float(rates[row, j]),
+            "price1": float(prices[row, i]),
+            "price2": float(prices[row, j]),
+            "price_diff_percent": float(best_pdp[row])
+        }
+    return max_spreads
+
+
+def alert_tier(spread: float, spread_low: float, spread_medium: float, spread_high: float) -> Optional[str]:
+    """Уровень уведомления по спреду: "low", "medium", "high" или None, если чата для него нет."""
+    if spread_low <= spread < spread_medium:
+        return "low"
+    if spread_medium <= spread < spread_high:
+        return "medium"
+    if spread >= spread_high:
+        return "high"
+    return None
@@ -0,0 +1,152 @@
+import asyncio
+import heapq
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiosqlite
+
+BLACKLIST_TTL = 40 * 60
+
+# Запросы — константы: sqlite3 кэширует подготовленные выражения по тексту SQL на соединение
+SQL_ADD_USER = "INSERT OR IGNORE INTO users (user_id) VALUES (?)"
+SQL_GET_USERS = "SELECT user_id FROM users"
+SQL_BLACKLIST_ADD = "INSERT OR REPLACE INTO blacklist (symbol, timestamp) VALUES (?, ?)"
+SQL_BLACKLIST_EXPIRE = "DELETE FROM blacklist WHERE timestamp <= ?"
+SQL_BLACKLIST_LOAD = "SELECT symbol, timestamp FROM blacklist WHERE timestamp > ?"
+SQL_GET_SETTINGS = (
+    "SELECT spread_low, spread_medium, spread_high, price_diff, "
+    "chat_spread_low, chat_spread_medium, chat_spread_high FROM settings WHERE id=1"
+)
+
+
+class Storage:
+    """Долгоживущие соединения с users.db и settings.db в режиме WAL.
+
+    Активный чёрный список держится в памяти (словарь + куча по времени истечения),
+    новые записи цикла пишутся в базу одной транзакцией в flush(). Записи в users.db
+    идут под одной блокировкой: commit() из add_user() посреди flush() закрыл бы его
+    транзакцию наполовину.
+    """
+
+    def __init__(self, users_path: str = "users.db", settings_path: str = "settings.db",
+                 blacklist_ttl: int = BLACKLIST_TTL):
+        self.users_path = users_path
+        self.settings_path = settings_path
+        self.blacklist_ttl = blacklist_ttl
+        self.users_db: Optional[aiosqlite.Connection] = None
+        self.settings_db: Optional[aiosqlite.Connection] = None
+        # символ -> время истечения (unix, секунды)
+        self.blacklist: Dict[str, int] = {}
+        self._expiry_heap: List[Tuple[int, str]] = []
+        self._pending: Dict[str, int] = {}
+        self._users_lock = asyncio.Lock()
+        self.settings: Optional[tuple] = None
+
+    @staticmethod
+    async def _connect(path: str) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(path)
+        await db.execute("PRAGMA journal_mode=WAL")
+        await db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    async def open(self) -> None:
+        if self.users_db is not None:
+            return
+        self.users_db = await self._connect(self.users_path)
+        self.settings_db = await self._connect(self.settings_path)
+        await self.users_db.execute("CREATE TABLE IF NOT EXISTS users (user_id INTEGER PRIMARY KEY)")
+        await self.users_db.execute(
+            "CREATE TABLE IF NOT EXISTS blacklist (symbol TEXT PRIMARY KEY, timestamp INTEGER)"
+        )
+        await self.users_db.commit()
+        await self.settings_db.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                id INTEGER PRIMARY KEY,
+                spread_low DECIMAL DEFAULT 0.3,
+                spread_medium DECIMAL DEFAULT 0.7,
+                spread_high DECIMAL DEFAULT 1.0,
+                price_diff DECIMAL DEFAULT 1.0,
+                chat_spread_low INTEGER DEFAULT 10,
+                chat_spread_medium INTEGER DEFAULT 5,
+                chat_spread_high INTEGER DEFAULT 0
+            )
+        """)
+        await self.settings_db.execute("INSERT OR IGNORE INTO settings (id) VALUES (1)")
+        await self.settings_db.commit()
+
+        now = int(time.time())
+        async with self.users_db.execute(SQL_BLACKLIST_LOAD, (now,)) as cursor:
+            async for symbol, expires_at in cursor:
+                self._remember(symbol, expires_at)
+        await self.reload_settings()
+        logging.info(f"Хранилище открыто, в чёрном списке {len(self.blacklist)} символов")
+
+    async def close(self) -> None:
+        await self.flush()
+        for db in (self.users_db, self.settings_db):
+            if db is not None:
+                await db.close()
+        self.users_db = self.settings_db = None
+
+    # Пользователи
+    async def add_user(self, user_id: int) -> None:
+        async with self._users_lock:
+            await self.users_db.execute(SQL_ADD_USER, (user_id,))
+            await self.users_db.commit()
+
+    async def get_users(self) -> List[int]:
+        async with self.users_db.execute(SQL_GET_USERS) as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+
+    # Чёрный список
+    def _remember(self, symbol: str, expires_at: int) -> None:
+        self.blacklist[symbol] = expires_at
+        heapq.heappush(self._expiry_heap, (expires_at, symbol))
+
+    def blacklist_add(self, symbol: str) -> None:
+        """Сразу в памяти; в базу — при следующем flush()."""
+        expires_at = int(time.time()) + self.blacklist_ttl
+        self._remember(symbol, expires_at)
+        self._pending[symbol] = expires_at
+
+    def expire_blacklist(self) -> List[str]:
+        """Снимает истёкшие записи с вершины кучи; возвращает снятые символы."""
+        now = int(time.time())
+        removed = []
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            expires_at, symbol = heapq.heappop(self._expiry_heap)
+            # Запись могла быть продлена: в куче тогда лежит и более поздний срок
+            if self.blacklist.get(symbol) == expires_at:
+                del self.blacklist[symbol]
+                removed.append(symbol)
+        return removed
+
+    async def flush(self) -> None:
+        """Записи чёрного списка за цикл и удаление истёкших — одной транзакцией."""
+        if self.users_db is None:
+            return
+        async with self._users_lock:
+            pending, self._pending = self._pending, {}
+            await self.users_db.execute("BEGIN")
+            try:
+                if pending:
+                    await self.users_db.executemany(SQL_BLACKLIST_ADD, list(pending.items()))
+                await self.users_db.execute(SQL_BLACKLIST_EXPIRE, (int(time.time()),))
+                await self.users_db.commit()
+            except Exception:
+                await self.users_db.rollback()
+                # Не потерять записи: попробуем в следующем цикле
+                self._pending = {**pending, **self._pending}
+                raise
+
+    # Настройки
+    async def reload_settings(self) -> tuple:
+        async with self.settings_db.execute(SQL_GET_SETTINGS) as cursor:
+            self.settings = await cursor.fetchone()
+        return self.settings
+
+    async def update_setting(self, setting: str, value: float) -> None:
+        await self.settings_db.execute(f"UPDATE settings SET {setting} = ? WHERE id=1", (value,))
+        await self.settings_db.commit()
+        await self.reload_settings()
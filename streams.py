@@ -0,0 +1,351 @@
+import asyncio
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from exchanges import exchange_registry
+from numeric import percent, to_float
+from quote import Quote
+from symbol_registry import symbol_registry
+
+# (нативный символ, фандинг в % или None, цена или None)
+Update = Tuple[str, Optional[float], Optional[float]]
+
+
+class ExchangeStream(ABC):
+    """Одно мультиплексированное WebSocket-соединение с биржей на все символы.
+
+    Подклассы задают адрес, формат подписки, пинг и разбор сообщений.
+    """
+
+    EXCHANGE = ""
+    URL = ""
+    BATCH = 10  # топиков в одном сообщении подписки
+    PING_INTERVAL = 20.0
+
+    def __init__(self, symbols: List[str], on_update: Callable[[str, str, Optional[float], Optional[float]], None]):
+        self.symbols = list(symbols)
+        self.on_update = on_update
+        self.connected = False
+        self.last_message = 0.0
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._closed = False
+
+    # Символ из coins.txt (BTC_USDT) <-> нативный идентификатор биржи
+    def native(self, symbol: str) -> str:
+        return symbol_registry.native(self.EXCHANGE, symbol)
+
+    def canonical(self, native: str) -> Optional[str]:
+        return symbol_registry.resolve(self.EXCHANGE, native)
+
+    def topics(self) -> List:
+        return [self.native(symbol) for symbol in self.symbols]
+
+    @abstractmethod
+    def subscribe_message(self, batch: List):
+        """Сообщение подписки на пачку топиков."""
+
+    def ping_message(self):
+        return None
+
+    @abstractmethod
+    def parse(self, message) -> Iterable[Update]:
+        """Обновления из сообщения биржи; служебные сообщения дают пустой список."""
+
+    async def _send(self, ws: aiohttp.ClientWebSocketResponse, message) -> None:
+        if isinstance(message, str):
+            await ws.send_str(message)
+        else:
+            await ws.send_json(message)
+
+    async def subscribe(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        topics = self.topics()
+        for i in range(0, len(topics), self.BATCH):
+            await self._send(ws, self.subscribe_message(topics[i:i + self.BATCH]))
+
+    async def _ping_loop(self, ws: aiohttp.ClientWebSocketResponse) -> None:
+        while self.ping_message() is not None and not ws.closed:
+            await asyncio.sleep(self.PING_INTERVAL)
+            await self._send(ws, self.ping_message())
+
+    def _handle(self, raw: str) -> None:
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            return  # pong и прочие служебные ответы
+        self.last_message = time.time()
+        try:
+            for native, funding_rate, price in self.parse(message):
+                symbol = self.canonical(native)
+                if symbol is not None:
+                    self.on_update(self.EXCHANGE, symbol, funding_rate, price)
+        except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+            logging.error(f"{self.EXCHANGE}: не удалось разобрать сообщение стрима: {e}")
+
+    async def run(self, session: aiohttp.ClientSession) -> None:
+        backoff = 1.0
+        while not self._closed:
+            try:
+                async with session.ws_connect(self.URL, max_msg_size=0) as ws:
+                    self._ws = ws
+                    self.connected = True
+                    backoff = 1.0
+                    await self.subscribe(ws)
+                    logging.info(f"{self.EXCHANGE}: стрим подключён, подписок {len(self.symbols)}")
+                    pinger = asyncio.create_task(self._ping_loop(ws))
+                    try:
+                        async for msg in ws:
+                            if msg.type == aiohttp.WSMsgType.TEXT:
+                                self._handle(msg.data)
+                            elif msg.type == aiohttp.WSMsgType.BINARY:
+                                self._handle(msg.data.decode())
+                            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                                break
+                    finally:
+                        pinger.cancel()
+            except Exception as e:
+                logging.warning(f"{self.EXCHANGE}: ошибка стрима: {e}")
+            finally:
+                self.connected = False
+                self._ws = None
+            if not self._closed:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60.0)
+
+    async def resubscribe(self, symbols: List[str]) -> None:
+        """Меняет набор символов: соединение переоткрывается и подписывается заново."""
+        if set(symbols) == set(self.symbols):
+            return
+        self.symbols = list(symbols)
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._ws is not None:
+            await self._ws.close()
+
+
+class BybitStream(ExchangeStream):
+    EXCHANGE = "Bybit"
+    URL = "wss://stream.bybit.com/v5/public/linear"
+
+    def topics(self) -> List:
+        return [f"tickers.{self.native(symbol)}" for symbol in self.symbols]
+
+    def subscribe_message(self, batch: List):
+        return {"op": "subscribe", "args": batch}
+
+    def ping_message(self):
+        return {"op": "ping"}
+
+    def parse(self, message) -> Iterable[Update]:
+        if not message.get("topic", "").startswith("tickers."):
+            return
+        data = message["data"]
+        # После снапшота приходят дельты только с изменившимися полями
+        yield data["symbol"], percent(data.get("fundingRate")), to_float(data.get("markPrice"))
+
+
+class OkxStream(ExchangeStream):
+    EXCHANGE = "okx"
+    URL = "wss://ws.okx.com:8443/ws/v5/public"
+    BATCH = 50
+    PING_INTERVAL = 25.0
+
+    def topics(self) -> List:
+        topics = []
+        for symbol in self.symbols:
+            inst_id = self.native(symbol)
+            topics.append({"channel": "funding-rate", "instId": inst_id})
+            topics.append({"channel": "mark-price", "instId": inst_id})
+        return topics
+
+    def subscribe_message(self, batch: List):
+        return {"op": "subscribe", "args": batch}
+
+    def ping_message(self):
+        return "ping"
+
+    def parse(self, message) -> Iterable[Update]:
+        channel = message.get("arg", {}).get("channel")
+        for item in message.get("data", []):
+            if channel == "funding-rate":
+                yield item["instId"], percent(item["fundingRate"]), None
+            elif channel == "mark-price":
+                yield item["instId"], None, to_float(item["markPx"])
+
+
+class BitgetStream(ExchangeStream):
+    EXCHANGE = "Bitget"
+    URL = "wss://ws.bitget.com/v2/ws/public"
+    BATCH = 50
+    PING_INTERVAL = 30.0
+
+    def topics(self) -> List:
+        return [
+            {"instType": "USDT-FUTURES", "channel": "ticker", "instId": self.native(symbol)}
+            for symbol in self.symbols
+        ]
+
+    def subscribe_message(self, batch: List):
+        return {"op": "subscribe", "args": batch}
+
+    def ping_message(self):
+        return "ping"
+
+    def parse(self, message) -> Iterable[Update]:
+        if message.get("arg", {}).get("channel") != "ticker":
+            return
+        for item in message.get("data", []):
+            yield item["instId"], percent(item.get("fundingRate")), to_float(item.get("markPrice"))
+
+
+class GateStream(ExchangeStream):
+    EXCHANGE = "Gate"
+    URL = "wss://fx-ws.gateio.ws/v4/ws/usdt"
+    BATCH = 100
+    PING_INTERVAL = 15.0
+
+    def subscribe_message(self, batch: List):
+        return {"time": int(time.time()), "channel": "futures.tickers", "event": "subscribe", "payload": batch}
+
+    def ping_message(self):
+        return {"time": int(time.time()), "channel": "futures.ping"}
+
+    def parse(self, message) -> Iterable[Update]:
+        if message.get("channel") != "futures.tickers" or message.get("event") != "update":
+            return
+        for item in message["result"]:
+            funding_rate = item.get("funding_rate_indicative") or item.get("funding_rate")
+            yield item["contract"], percent(funding_rate), to_float(item.get("mark_price"))
+
+
+class MexcStream(ExchangeStream):
+    EXCHANGE = "MEXC"
+    URL = "wss://contract.mexc.com/edge"
+    PING_INTERVAL = 15.0
+
+    def topics(self) -> List:
+        # sub.tickers присылает все контракты разом
+        return ["tickers"]
+
+    def subscribe_message(self, batch: List):
+        return {"method": "sub.tickers", "param": {}}
+
+    def ping_message(self):
+        return {"method": "ping"}
+
+    def parse(self, message) -> Iterable[Update]:
+        if message.get("channel") != "push.tickers":
+            return
+        items = [item for item in message["data"] if item["symbol"].endswith("_USDT")]
+        # push.tickers — все контракты разом, поэтому XNEW_USDT разводится по символам
+        # тем же правилом, что и в bulk-ответе адаптера
+        listed = {item["symbol"] for item in items}
+        fetcher_cls = exchange_registry.fetcher(self.EXCHANGE)
+        for item in items:
+            funding_rate, price = percent(item.get("fundingRate")), to_float(item.get("fairPrice"))
+            for alias in fetcher_cls.aliases(item["symbol"], listed):
+                yield symbol_registry.native(self.EXCHANGE, alias), funding_rate, price
+
+
+class HyperliquidStream(ExchangeStream):
+    EXCHANGE = "Hyperliquid"
+    URL = "wss://api.hyperliquid.xyz/ws"
+    BATCH = 1
+    PING_INTERVAL = 30.0
+
+    def subscribe_message(self, batch: List):
+        return {"method": "subscribe", "subscription": {"type": "activeAssetCtx", "coin": batch[0]}}
+
+    def ping_message(self):
+        return {"method": "ping"}
+
+    def parse(self, message) -> Iterable[Update]:
+        if message.get("channel") != "activeAssetCtx":
+            return
+        data = message["data"]
+        yield data["coin"], percent(data["ctx"]["funding"]), to_float(data["ctx"]["markPx"])
+
+
+STREAMS = [BybitStream, OkxStream, BitgetStream, GateStream, MexcStream, HyperliquidStream]
+
+
+class StreamHub:
+    """Последние значения из стримов в формате REST-фетчеров: биржа -> символ -> Quote."""
+
+    def __init__(self, stream_classes=STREAMS, max_age: float = 60.0):
+        self.stream_classes = stream_classes
+        self.max_age = max_age
+        self.streams: Dict[str, ExchangeStream] = {}
+        self.entries: Dict[str, Dict[str, Quote]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._symbols: List[str] = []
+        self._session_for: Optional[Callable[[str], aiohttp.ClientSession]] = None
+
+    def update(self, exchange: str, symbol: str, funding_rate: Optional[float], price: Optional[float]) -> None:
+        entries = self.entries.setdefault(exchange, {})
+        previous = entries.get(symbol)
+        # Дельты приходят только с изменившимися полями — остальное берётся из прошлой котировки
+        if previous is not None:
+            funding_rate = previous.rate if funding_rate is None else funding_rate
+            price = previous.price if price is None else price
+        entries[symbol] = Quote.make(exchange, symbol, funding_rate, price, time.time())
+
+    def _start_stream(self, stream_cls) -> None:
+        stream = stream_cls(self._symbols, self.update)
+        self.streams[stream.EXCHANGE] = stream
+        self._tasks[stream.EXCHANGE] = asyncio.create_task(stream.run(self._session_for(stream.EXCHANGE)))
+
+    async def _stop_stream(self, exchange: str) -> None:
+        stream = self.streams.pop(exchange)
+        await stream.close()
+        task = self._tasks.pop(exchange)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        self.entries.pop(exchange, None)
+
+    async def start(self, symbols: List[str], session_for: Callable[[str], aiohttp.ClientSession]) -> None:
+        self._symbols = list(symbols)
+        self._session_for = session_for
+        for stream_cls in self.stream_classes:
+            self._start_stream(stream_cls)
+
+    async def set_streams(self, stream_classes) -> None:
+        """Меняет набор стримов на лету (биржу включили или выключили)."""
+        self.stream_classes = list(stream_classes)
+        if self._session_for is None:
+            return
+        wanted = {stream_cls.EXCHANGE: stream_cls for stream_cls in self.stream_classes}
+        for exchange in [exchange for exchange in self.streams if exchange not in wanted]:
+            await self._stop_stream(exchange)
+        for exchange, stream_cls in wanted.items():
+            if exchange not in self.streams:
+                self._start_stream(stream_cls)
+
+    async def resubscribe(self, symbols: List[str]) -> None:
+        self._symbols = list(symbols)
+        await asyncio.gather(*(stream.resubscribe(symbols) for stream in self.streams.values()))
+
+    def snapshot(self, exchange: str) -> Optional[Dict[str, Quote]]:
+        """Свежие полные записи биржи или None, если стрима нет или он молчит."""
+        stream = self.streams.get(exchange)
+        now = time.time()
+        if stream is None or not stream.connected or now - stream.last_message > self.max_age:
+            return None
+        return {
+            symbol: quote for symbol, quote in self.entries.get(exchange, {}).items()
+            if quote.rate is not None and quote.price is not None and now - quote.ts <= self.max_age
+        }
+
+    async def close(self) -> None:
+        await asyncio.gather(*(stream.close() for stream in self.streams.values()))
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        self._tasks.clear()
@@ -0,0 +1,128 @@
+import sys
+from typing import Dict, Iterable, Optional
+
+from exchanges import exchange_registry
+
+QUOTE = "USDT"
+
+# Формат идентификатора инструмента на бирже; {base} — базовая монета (BTC). Задаётся в exchanges.py
+SYMBOL_FORMATS: Dict[str, str] = exchange_registry.symbol_formats()
+
+# Инструменты, чьё имя на бирже не выводится из формата
+NATIVE_OVERRIDES: Dict[str, Dict[str, str]] = {
+    "kucoin": {"BTCUSDT": "XBTUSDTM"},
+}
+
+# Биржи, которые после ребрендинга монеты заводят новый контракт XNEW_USDT
+SUCCESSOR_FORMATS: Dict[str, str] = exchange_registry.successor_formats()
+
+
+class SymbolRegistry:
+    """Канонический символ (BTCUSDT) и его идентификаторы на каждой бирже.
+
+    Идентификаторы считаются один раз при добавлении символа, строки интернируются,
+    а обратный поиск нативного ID в канонический — это поиск в словаре.
+    """
+
+    def __init__(self, formats: Dict[str, str] = SYMBOL_FORMATS,
+                 overrides: Dict[str, Dict[str, str]] = NATIVE_OVERRIDES,
+                 successor_formats: Dict[str, str] = SUCCESSOR_FORMATS):
+        self.formats = formats
+        self.overrides = overrides
+        self.successor_formats = successor_formats
+        self.bases: Dict[str, str] = {}
+        # биржа -> канонический символ -> нативный ID и обратно
+        self.natives: Dict[str, Dict[str, str]] = {exchange: {} for exchange in formats}
+        self.canonicals: Dict[str, Dict[str, str]] = {exchange: {} for exchange in formats}
+        self.successors: Dict[str, Dict[str, str]] = {exchange: {} for exchange in successor_formats}
+        self.predecessors: Dict[str, Dict[str, str]] = {exchange: {} for exchange in successor_formats}
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.bases
+
+    def __len__(self) -> int:
+        return len(self.bases)
+
+    @staticmethod
+    def normalize(symbol: str) -> str:
+        """BTC_USDT, btc-usdt, BTCUSDT -> BTCUSDT."""
+        return symbol.replace('_', '').replace('-', '').upper()
+
+    def add(self, symbol: str) -> str:
+        """Регистрирует символ в любом написании и возвращает канонический ключ."""
+        canonical = sys.intern(self.normalize(symbol))
+        if canonical in self.bases:
+            return canonical
+        base = sys.intern(canonical[:-len(QUOTE)] if canonical.endswith(QUOTE) else canonical)
+        self.bases[canonical] = base
+        for exchange, fmt in self.formats.items():
+            native = sys.intern(self.overrides.get(exchange, {}).get(canonical) or fmt.format(base=base))
+            self.natives[exchange][canonical] = native
+            self.canonicals[exchange][native] = canonical
+        for exchange, fmt in self.successor_formats.items():
+            successor = sys.intern(fmt.format(base=base))
+            self.successors[exchange][canonical] = successor
+            self.predecessors[exchange][successor] = canonical
+        return canonical
+
+    def update(self, symbols: Iterable[str]) -> None:
+        for symbol in symbols:
+            self.add(symbol)
+
+    # Канонический ключ символа из coins.txt; неизвестный символ регистрируется
+    canonical = add
+
+    def base(self, symbol: str) -> str:
+        """Базовая монета: BTCUSDT -> BTC."""
+        base = self.bases.get(symbol)
+        return base if base is not None else self.bases[self.add(symbol)]
+
+    def native(self, exchange: str, symbol: str) -> str:
+        """Идентификатор инструмента на бирже для символа в любом написании."""
+        natives = self.natives[exchange]
+        native = natives.get(symbol)
+        if native is None:
+            native = natives[self.add(symbol)]
+        return native
+
+    def resolve(self, exchange: str, native: str) -> Optional[str]:
+        """Нативный ID биржи -> канонический символ; None, если ID не в формате биржи."""
+        canonicals = self.canonicals[exchange]
+        canonical = canonicals.get(native)
+        if canonical is not None:
+            return canonical
+        prefix, suffix = self.formats[exchange].split("{base}")
+        if not native.startswith(prefix) or not native.endswith(suffix):
+            return None
+        base = native[len(prefix):len(native) - len(suffix)]
+        if not base:
+            return None
+        canonical = self.add(base + QUOTE)
+        # Для ID в нестандартном написании (например, регистре) запоминаем и его
+        canonicals.setdefault(sys.intern(native), canonical)
+        return canonical
+
+    def successor(self, exchange: str, symbol: str) -> Optional[str]:
+        """ID нового контракта после ребрендинга (XNEW_USDT) или None, если биржа так не делает."""
+        successors = self.successors.get(exchange)
+        if successors is None:
+            return None
+        successor = successors.get(symbol)
+        if successor is None:
+            successor = successors[self.add(symbol)]
+        return successor
+
+    def predecessor(self, exchange: str, native: str) -> Optional[str]:
+        """Канонический символ, которому наследует контракт XNEW_USDT, иначе None."""
+        predecessors = self.predecessors.get(exchange)
+        if predecessors is None:
+            return None
+        canonical = predecessors.get(native)
+        if canonical is None:
+            prefix, suffix = self.successor_formats[exchange].split("{base}")
+            if native.startswith(prefix) and native.endswith(suffix) and len(native) > len(prefix) + len(suffix):
+                canonical = self.add(native[len(prefix):len(native) - len(suffix)] + QUOTE)
+        return canonical
+
+
+symbol_registry = SymbolRegistry()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Модули бота лежат плоско в корне репозитория
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# main.py создаёт Bot при импорте, а aiogram проверяет формат токена
+os.environ.setdefault("BOT_TOKEN", "123456:test")
@@ -0,0 +1,17 @@
+"""Адаптеры бирж: каждый реализует свои абстрактные методы и умеет то, что заявлено в exchanges.py."""
+import pytest
+
+from adapter import BulkFundingRateFetcher, FundingRateFetcher
+from exchanges import Capability, exchange_registry
+from symbol_registry import symbol_registry
+
+
+@pytest.mark.parametrize("exchange", list(exchange_registry.specs))
+def test_fetcher_matches_capabilities(exchange):
+    symbol_registry.update(["BTC_USDT"])
+    fetcher_cls = exchange_registry.fetcher(exchange)
+    # Абстрактный метод без реализации не даст создать экземпляр
+    fetcher = fetcher_cls("BTCUSDT")
+    assert isinstance(fetcher, BulkFundingRateFetcher)
+    per_symbol = bool(exchange_registry.spec(exchange).capabilities & Capability.PER_SYMBOL)
+    assert isinstance(fetcher, FundingRateFetcher) == per_symbol
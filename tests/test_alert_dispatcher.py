@@ -0,0 +1,82 @@
+"""Очередь уведомлений: лимит и flood wait общие для всех тредов группы, воркеры не простаивают."""
+import asyncio
+import time
+
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from alert_dispatcher import PRIORITY_HIGH, PRIORITY_LOW, AlertDispatcher
+
+GROUP = "-100"
+
+
+class FakeBot:
+    def __init__(self, flood: dict = None):
+        self.sent = []
+        # (chat_id, thread_id) -> retry_after для первой отправки
+        self.flood = dict(flood or {})
+
+    async def send_message(self, chat_id, text, message_thread_id=None, **kwargs):
+        retry_after = self.flood.pop((chat_id, message_thread_id), None)
+        if retry_after is not None:
+            method = SendMessage(chat_id=chat_id, text=text, message_thread_id=message_thread_id)
+            raise TelegramRetryAfter(method, "Too Many Requests", retry_after)
+        self.sent.append((chat_id, message_thread_id, text, time.monotonic()))
+
+
+async def run(dispatcher: AlertDispatcher, seconds: float) -> None:
+    await dispatcher.start()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        for task in dispatcher._tasks:
+            task.cancel()
+        await asyncio.gather(*dispatcher._tasks, return_exceptions=True)
+
+
+def test_threads_of_one_group_share_its_bucket():
+    bot = FakeBot()
+    # Тред сам по себе пропустил бы все три сообщения; группа — только burst
+    dispatcher = AlertDispatcher(bot, per_minute=600, chat_per_minute=1, burst=3)
+    for thread_id in (265, 266, 267):
+        for i in range(3):
+            dispatcher.enqueue(GROUP, f"{thread_id}-{i}", thread_id=thread_id)
+    dispatcher.enqueue("42", "private")
+
+    asyncio.run(run(dispatcher, 0.2))
+
+    assert len([message for message in bot.sent if message[0] == GROUP]) == 3
+    # Личный чат — свой бакет
+    assert ("42", None, "private") in [message[:3] for message in bot.sent]
+
+
+def test_flood_wait_on_one_thread_blocks_the_whole_group():
+    bot = FakeBot(flood={(GROUP, 267): 1})
+    dispatcher = AlertDispatcher(bot, per_minute=600, chat_per_minute=600, burst=10)
+    dispatcher.enqueue(GROUP, "high", thread_id=267, priority=PRIORITY_HIGH)
+    dispatcher.enqueue(GROUP, "low", thread_id=265, priority=PRIORITY_LOW)
+    started = time.monotonic()
+
+    asyncio.run(run(dispatcher, 1.5))
+
+    assert dispatcher.stats["retry_after"] == 1
+    assert sorted(text for _, _, text, _ in bot.sent) == ["high", "low"]
+    # Соседний тред ждал конца flood wait группы
+    assert all(sent_at - started >= 0.9 for _, _, _, sent_at in bot.sent)
+
+
+def test_blocked_chat_does_not_stall_workers():
+    bot = FakeBot()
+    dispatcher = AlertDispatcher(bot, workers=2)
+    dispatcher.chat_blocked_until[GROUP] = time.monotonic() + 60
+    # Заблокированных сообщений больше, чем воркеров, и они важнее
+    for i in range(4):
+        dispatcher.enqueue(GROUP, f"blocked-{i}", thread_id=267, priority=PRIORITY_HIGH)
+    dispatcher.enqueue("42", "free", priority=PRIORITY_LOW)
+
+    asyncio.run(run(dispatcher, 0.2))
+
+    assert [text for _, _, text, _ in bot.sent] == ["free"]
+    assert dispatcher.stats["deferred"] == 4
+    # Отложенные сообщения остаются за своими ключами, дубликатов не будет
+    assert len(dispatcher._queued_keys) == 4
@@ -0,0 +1,96 @@
+"""Чёрный список в цикле оценки: символ после истечения записи переоценивается без нового движения цены."""
+import asyncio
+
+import main
+from market_state import MarketState
+from quote import Quote
+from storage import Storage
+
+SYMBOL = "BTCUSDT"
+# Спред 0.49 против spread_low 0.3 по умолчанию, цены совпадают
+RATES = {"Bybit": 0.01, "okx": 0.25, "Bitget": 0.5}
+
+
+async def apply_quotes(keys):
+    for exchange, rate in RATES.items():
+        await main.apply_venue(exchange, {SYMBOL: Quote(exchange, SYMBOL, rate, 100.0)}, keys)
+
+
+def test_expired_symbol_alerts_again_on_unchanged_quotes(tmp_path, monkeypatch):
+    storage = Storage(str(tmp_path / "users.db"), str(tmp_path / "settings.db"), blacklist_ttl=0)
+    alerts = []
+    monkeypatch.setattr(main, "storage", storage)
+    monkeypatch.setattr(main, "market_state", MarketState(RATES))
+    monkeypatch.setattr(main.enrichment_pool, "submit", alerts.append)
+
+    async def scenario():
+        await storage.open()
+        try:
+            keys = [SYMBOL]
+            await apply_quotes(keys)
+            await main.evaluate_and_alert(set(keys), storage.blacklist)
+            assert [symbol for symbol, _, _ in alerts] == [SYMBOL]
+            assert SYMBOL in storage.blacklist
+
+            # После уведомления котировки сброшены: те же значения снова делают символ изменившимся,
+            # но пока он в чёрном списке, уведомления нет
+            await apply_quotes(keys)
+            await main.evaluate_and_alert(set(keys), storage.blacklist)
+            assert len(alerts) == 1
+
+            # Запись истекла, котировки не менялись — символ всё равно переоценивается
+            main.expire_blacklist()
+            assert SYMBOL not in storage.blacklist
+            await main.evaluate_and_alert(set(keys), storage.blacklist)
+            assert [symbol for symbol, _, _ in alerts] == [SYMBOL, SYMBOL]
+            assert abs(alerts[1][1]["spread"] - 0.49) < 1e-9
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
+
+
+def test_blacklist_filters_coins_by_canonical_key():
+    # coins.txt пишет символы по-разному, чёрный список — канонические ключи
+    coins = ["BTC_USDT", "ETH-USDT", "SOLUSDT"]
+    assert main.unblocked(coins, {"BTCUSDT": 0, "SOLUSDT": 0}) == ["ETH-USDT"]
+    assert main.unblocked(coins, frozenset({"ETHUSDT"})) == ["BTC_USDT", "SOLUSDT"]
+
+
+def test_add_user_does_not_commit_a_half_written_flush(tmp_path):
+    storage = Storage(str(tmp_path / "users.db"), str(tmp_path / "settings.db"))
+
+    async def scenario():
+        await storage.open()
+        try:
+            db = storage.users_db
+            executemany = db.executemany
+            writing = asyncio.Event()
+
+            async def failing_executemany(sql, rows):
+                await executemany(sql, rows)
+                # /start приходит, пока транзакция flush() открыта
+                writing.set()
+                await asyncio.sleep(0.05)
+                raise RuntimeError("диск полон")
+
+            db.executemany = failing_executemany
+            storage.blacklist_add(SYMBOL)
+
+            async def start_command():
+                await writing.wait()
+                await storage.add_user(42)
+
+            results = await asyncio.gather(storage.flush(), start_command(), return_exceptions=True)
+            assert isinstance(results[0], RuntimeError)
+            del db.executemany
+
+            async with db.execute("SELECT symbol FROM blacklist") as cursor:
+                assert await cursor.fetchall() == []
+            assert await storage.get_users() == [42]
+            # Запись не потеряна: уйдёт в базу при следующем flush()
+            assert SYMBOL in storage._pending
+        finally:
+            await storage.close()
+
+    asyncio.run(scenario())
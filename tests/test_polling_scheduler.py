@@ -0,0 +1,116 @@
+"""Адаптивный посимвольный опрос: приоритет, интервал и назначение следующего опроса в цикле бота."""
+import asyncio
+
+import aiohttp
+
+import main
+from market_state import MarketState
+from polling_scheduler import PollingScheduler
+from quote import Quote
+from symbol_registry import symbol_registry
+
+SPREAD_LOW = 0.3
+
+
+class FallbackFetcher:
+    """Bulk-запрос падает, посимвольный отвечает из RESULTS: путь, где работает планировщик."""
+
+    EXCHANGE = "Bitget"
+    RESULTS = {}
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol_registry.canonical(symbol)
+
+    @classmethod
+    async def fetch_all_funding_rates(cls, session):
+        raise aiohttp.ClientError("bulk недоступен")
+
+    async def fetch_funding_rate(self, session) -> Quote:
+        return self.RESULTS[self.symbol]
+
+
+def test_errored_keys_stay_due_and_scores_use_fresh_quotes(monkeypatch):
+    coins = ["BTC_USDT", "ETH_USDT", "SOL_USDT"]
+    symbol_registry.update(coins)
+    keys = [symbol_registry.canonical(coin) for coin in coins]
+    state = MarketState(["Bitget", "okx"])
+    for key in keys:
+        state.update(key, "okx", 0.01, 100.0)
+    # Без окна расчёта приоритет зависит только от спреда
+    scheduler = PollingScheduler(max_interval=90, settlement_window=1e-9)
+
+    async def get_settings():
+        return (SPREAD_LOW, 0.7, 1.0, 1.0, 10, 5, 0)
+
+    monkeypatch.setattr(main, "market_state", state)
+    monkeypatch.setattr(main, "poll_scheduler", scheduler)
+    monkeypatch.setattr(main, "get_settings", get_settings)
+    monkeypatch.setattr(FallbackFetcher, "RESULTS", {
+        # Свежая ставка даёт спред выше spread_low — опрос и в следующем цикле
+        "BTCUSDT": Quote.make("Bitget", "BTCUSDT", 0.5, 100.0),
+        "ETHUSDT": Quote.error("Bitget", "ETHUSDT"),
+        # Спреда нет — следующий опрос через max_interval
+        "SOLUSDT": Quote.make("Bitget", "SOLUSDT", 0.01, 100.0),
+    })
+
+    async def cycle():
+        try:
+            entries = await main.fetch_rest(FallbackFetcher, coins)
+            await main.apply_venue("Bitget", entries, keys)
+            await main.schedule_polls("Bitget", entries)
+        finally:
+            await main.http_client.close()
+
+    asyncio.run(cycle())
+
+    assert scheduler.due("Bitget", keys) == ["BTCUSDT", "ETHUSDT"]
+
+
+# Середина часового периода: до расчёта на бирже "X" 1800 с, дальше окна расчёта
+MID_PERIOD = 1_000 * 3600 + 1800
+
+
+def scheduler(**kwargs) -> PollingScheduler:
+    return PollingScheduler(min_interval=0.0, max_interval=90.0, settlement_window=900.0,
+                            settlement_hours={"X": 1}, **kwargs)
+
+
+def test_score_rises_towards_settlement():
+    polling = scheduler()
+    assert polling.score("X", "BTCUSDT", float("nan"), SPREAD_LOW, MID_PERIOD) == 0.0
+    # За 90 с до расчёта по периоду биржи
+    assert abs(polling.score("X", "BTCUSDT", float("nan"), SPREAD_LOW, MID_PERIOD + 1710) - 0.9) < 1e-9
+    # Время расчёта из котировки важнее периода биржи
+    polling.observe("X", "BTCUSDT", 0.01, next_funding=MID_PERIOD + 450)
+    assert abs(polling.score("X", "BTCUSDT", float("nan"), SPREAD_LOW, MID_PERIOD) - 0.5) < 1e-9
+    assert polling.score("X", "ETHUSDT", float("nan"), SPREAD_LOW, MID_PERIOD) == 0.0
+
+
+def test_score_follows_spread_closeness_and_volatility():
+    polling = scheduler()
+    assert abs(polling.score("X", "BTCUSDT", 0.15, SPREAD_LOW, MID_PERIOD) - 0.5) < 1e-9
+    assert polling.score("X", "BTCUSDT", 0.45, SPREAD_LOW, MID_PERIOD) == 1.0
+    # Волатильность — EWMA модуля изменения ставки: 0.3 * 0.03 = 0.009, то есть 0.03 от spread_low
+    polling.observe("X", "BTCUSDT", 0.0)
+    polling.observe("X", "BTCUSDT", 0.03)
+    assert abs(polling.score("X", "BTCUSDT", 0.15, SPREAD_LOW, MID_PERIOD) - 0.53) < 1e-9
+    # Без порога опрашивается всё
+    assert polling.score("X", "BTCUSDT", float("nan"), 0.0, MID_PERIOD) == 1.0
+
+
+def test_interval_maps_score_quadratically():
+    polling = PollingScheduler(min_interval=10.0, max_interval=90.0)
+    assert polling.interval(1.0) == 10.0
+    assert polling.interval(0.0) == 90.0
+    assert polling.interval(0.5) == 30.0
+
+
+def test_never_polled_keys_are_due_at_once():
+    polling = scheduler()
+    keys = ["BTCUSDT", "ETHUSDT"]
+    assert polling.due("X", keys, now=MID_PERIOD) == keys
+    # BTC далеко от порога — следующий опрос через max_interval, ETH у порога — сразу
+    polling.schedule("X", keys, {"BTCUSDT": 0.0, "ETHUSDT": 0.3}, SPREAD_LOW, now=MID_PERIOD)
+    assert polling.due("X", keys + ["SOLUSDT"], now=MID_PERIOD + 1) == ["ETHUSDT", "SOLUSDT"]
+    assert polling.due("X", keys, now=MID_PERIOD + 90) == keys
+    assert polling.stats == {"due": 6, "skipped": 1}
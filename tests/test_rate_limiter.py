@@ -0,0 +1,173 @@
+"""Лимитер запросов: токен-бакет, окно одновременных запросов, паузы по 429 и заголовкам бирж."""
+import asyncio
+import types
+
+import pytest
+from yarl import URL
+
+import rate_limiter
+from rate_limiter import ConcurrencyWindow, ExchangeLimiter, RateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Время модуля rate_limiter: sleep() не ждёт, а сдвигает часы."""
+
+    def __init__(self):
+        self.now = 1_000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", clock)
+    monkeypatch.setattr(rate_limiter, "asyncio", types.SimpleNamespace(
+        sleep=clock.sleep, Lock=asyncio.Lock, Condition=asyncio.Condition, Semaphore=asyncio.Semaphore,
+    ))
+    return clock
+
+
+def test_token_bucket_waits_for_refill(clock):
+    bucket = TokenBucket(rate=2.0, capacity=2)
+
+    async def take(count):
+        for _ in range(count):
+            await bucket.acquire()
+
+    asyncio.run(take(2))
+    assert clock.sleeps == []
+    asyncio.run(take(1))
+    assert clock.sleeps == [pytest.approx(0.5)]
+    # Запас не копится выше capacity
+    clock.now += 60
+    asyncio.run(take(3))
+    assert len(clock.sleeps) == 2
+
+
+def test_concurrency_window_halves_on_throttle_and_grows_on_success():
+    window = ConcurrencyWindow(initial=8, maximum=10, minimum=2)
+
+    async def cycle(**kwargs):
+        await window.acquire()
+        await window.release(**kwargs)
+
+    asyncio.run(cycle(throttled=True))
+    assert window.limit == 4
+    asyncio.run(cycle(throttled=True))
+    asyncio.run(cycle(throttled=True))
+    assert window.limit == 2
+    asyncio.run(cycle())
+    assert window.limit == 2.5
+    # Отменённый запрос окно не меняет
+    asyncio.run(cycle(throttled=True, adjust=False))
+    assert window.limit == 2.5
+    assert window.in_flight == 0
+
+
+def test_throttle_backoff_doubles_up_to_a_minute(clock):
+    limiter = ExchangeLimiter("Bitget", {"default": (20, 1.0)})
+
+    async def throttled():
+        await limiter.window.acquire()
+        await limiter.release(429, {})
+        return limiter.blocked_until - clock.now
+
+    pauses = [asyncio.run(throttled()) for _ in range(8)]
+    assert pauses == [1, 2, 4, 8, 16, 32, 60, 60]
+    # Успешный ответ после паузы сбрасывает backoff
+    clock.now = limiter.blocked_until
+    asyncio.run(limiter.window.acquire())
+    asyncio.run(limiter.release(200, {}))
+    assert limiter.backoff == 0
+    assert asyncio.run(throttled()) == 1
+    # Более короткая пауза не отменяет уже назначенную
+    limiter.pause(0.5, "тест")
+    assert limiter.blocked_until - clock.now == 1
+
+
+def test_retry_after_overrides_backoff_and_acquire_waits(clock):
+    limiter = ExchangeLimiter("Bitget", {"default": (20, 1.0)})
+
+    async def scenario():
+        await limiter.window.acquire()
+        await limiter.release(429, {"Retry-After": "7"})
+        assert limiter.blocked_until - clock.now == 7
+        assert limiter.window.limit == 10
+        await limiter.acquire("/api/v2/mix/market/tickers")
+
+    asyncio.run(scenario())
+    assert clock.sleeps == [7]
+    assert limiter.window.in_flight == 1
+
+
+@pytest.mark.parametrize("exchange, headers, pause", [
+    # Сброс — момент времени в мс
+    ("Bybit", {"X-Bapi-Limit-Status": "0", "X-Bapi-Limit-Reset-Timestamp": "1003500"}, 3.5),
+    ("Gate", {"X-Gate-RateLimit-Requests-Remain": "0", "X-Gate-RateLimit-Reset-Timestamp": "999000"}, None),
+    # Сброс — мс от текущего момента
+    ("kucoin", {"gw-ratelimit-remaining": "0", "gw-ratelimit-reset": "2500"}, 2.5),
+    # Лимит не исчерпан
+    ("kucoin", {"gw-ratelimit-remaining": "3", "gw-ratelimit-reset": "2500"}, None),
+    ("kucoin", {"gw-ratelimit-remaining": "x"}, None),
+])
+def test_exchange_headers_pause_before_limit(clock, exchange, headers, pause):
+    limiter = ExchangeLimiter(exchange, {"default": (100, 1.0)})
+
+    async def scenario():
+        await limiter.window.acquire()
+        await limiter.release(200, headers)
+
+    asyncio.run(scenario())
+    if pause is None:
+        # Сброс уже прошёл (max(0, ...)) или паузы нет вовсе
+        assert limiter.blocked_until <= clock.now
+    else:
+        assert limiter.blocked_until - clock.now == pytest.approx(pause)
+    assert limiter.backoff == 0
+
+
+def test_cancelled_acquire_returns_its_window_slot():
+    limiter = ExchangeLimiter("Bitget", {"default": (1, 100.0)})
+
+    async def scenario():
+        await limiter.acquire("/")
+        # Токена нет: второй запрос ждёт бакет, заняв место в окне
+        waiting = asyncio.create_task(limiter.acquire("/"))
+        await asyncio.sleep(0.01)
+        assert limiter.window.in_flight == 2
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.window.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_request_start_releases_exchange_limiter():
+    limiter = RateLimiter(hosts={"Bitget": ["https://api.bitget.com"]}, global_rate=1.0)
+    on_request_start = limiter.trace_config().on_request_start[0]
+
+    async def scenario():
+        params = types.SimpleNamespace(url=URL("https://api.bitget.com/api/v2/mix/market/tickers"))
+        await on_request_start(None, types.SimpleNamespace(), params)
+        # Общий бакет пуст: запрос ждёт его, уже заняв окно биржи
+        waiting = asyncio.create_task(on_request_start(None, types.SimpleNamespace(), params))
+        await asyncio.sleep(0.01)
+        exchange = limiter.exchange("Bitget")
+        assert exchange.window.in_flight == 2
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert exchange.window.in_flight == 1
+
+    asyncio.run(scenario())
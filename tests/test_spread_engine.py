@@ -0,0 +1,113 @@
+"""Векторный поиск спредов против исходного попарного цикла на Decimal из main.py."""
+import math
+import random
+from decimal import Decimal, InvalidOperation, localcontext
+
+import numpy as np
+import pytest
+
+from spread_engine import evaluate_spreads
+
+EXCHANGES = ["Bitget", "Gate", "MEXC", "ourbit", "BingX", "Bybit", "aevo", "okx", "Hyperliquid", "kucoin"]
+
+
+def baseline_max_spreads(symbols, exchanges, rates, prices, spread_low, price_diff):
+    """Исходный цикл max_spreads: ставки и цены — Decimal, None — ставки нет.
+
+    Исходный цикл падал на цене None; в market_state нет цены — NaN, поэтому здесь она
+    Decimal('NaN') с сравнениями, как у float (ложны, min() берёт первый аргумент).
+    """
+    max_spreads = {}
+    with localcontext() as context:
+        context.traps[InvalidOperation] = False
+        for row, symbol in enumerate(symbols):
+            for i in range(len(exchanges)):
+                for j in range(i + 1, len(exchanges)):
+                    ex1, ex2 = exchanges[i], exchanges[j]
+                    rate1, rate2 = rates[row][i], rates[row][j]
+                    price1, price2 = prices[row][i], prices[row][j]
+
+                    if rate1 is None or rate2 is None:
+                        continue
+
+                    spread = abs(rate1 - rate2)
+                    price_diff_percent = abs((price1 - price2) / min(price1, price2) * 100) if min(price1,
+                                                                                                   price2) > 0 else 100
+
+                    if spread > Decimal(spread_low) and price_diff_percent <= float(price_diff):
+                        if symbol not in max_spreads or spread > max_spreads[symbol]["spread"]:
+                            max_spreads[symbol] = {"spread": spread, "ex1": ex1, "ex2": ex2,
+                                                   "price_diff_percent": price_diff_percent}
+    return max_spreads
+
+
+def to_arrays(rates, prices):
+    return (np.array([[math.nan if rate is None else float(rate) for rate in row] for row in rates]),
+            np.array([[float(price) for price in row] for row in prices]))
+
+
+def assert_same(symbols, exchanges, rates, prices, spread_low, price_diff):
+    expected = baseline_max_spreads(symbols, exchanges, rates, prices, spread_low, price_diff)
+    rate_matrix, price_matrix = to_arrays(rates, prices)
+    actual = evaluate_spreads(symbols, exchanges, rate_matrix, price_matrix, spread_low, price_diff)
+    assert {symbol: (data["ex1"], data["ex2"]) for symbol, data in actual.items()} == \
+        {symbol: (data["ex1"], data["ex2"]) for symbol, data in expected.items()}
+    for symbol, data in expected.items():
+        assert actual[symbol]["spread"] == pytest.approx(float(data["spread"]), abs=1e-12)
+        assert actual[symbol]["price_diff_percent"] == pytest.approx(float(data["price_diff_percent"]), abs=1e-9)
+    return actual
+
+
+@pytest.mark.parametrize("spread_low, price_diff", [(0.3, 1.0), (0.1, 0.5), (0.5, 150.0), (0.3, 0.3)])
+def test_matches_baseline_on_random_matrices(spread_low, price_diff):
+    rng = random.Random(f"{spread_low}:{price_diff}")
+    symbols = [f"S{i:04d}USDT" for i in range(1500)]
+    rates, prices = [], []
+    for _ in symbols:
+        # Ставки с шагом 0.01% дают много равных спредов; None — биржа символ не котирует
+        rates.append([None if rng.random() < 0.2 else Decimal(rng.randint(-80, 80)) / 100 for _ in EXCHANGES])
+        prices.append([
+            Decimal("NaN") if rng.random() < 0.05 else Decimal(0) if rng.random() < 0.02
+            else Decimal(rng.choice(["100", "100.3", "100.5", "101", "99.7", "98"]))
+            for _ in EXCHANGES
+        ])
+    actual = assert_same(symbols, EXCHANGES, rates, prices, spread_low, price_diff)
+    assert actual
+
+
+def test_tie_goes_to_the_first_pair_in_exchange_order():
+    # Пара e1-e2 (0.92) отсеяна по цене; 0.85 у e0-e1 и e2-e3 равны в Decimal, но не во float
+    rates = [[Decimal("-0.25"), Decimal("0.6"), Decimal("-0.32"), Decimal("0.53")]]
+    prices = [[Decimal("100.6"), Decimal("101.2"), Decimal("100"), Decimal("100.6")]]
+    assert abs(-0.25 - 0.6) != abs(-0.32 - 0.53)
+    actual = assert_same(["BTCUSDT"], EXCHANGES[:4], rates, prices, 0.3, 1.0)
+    assert (actual["BTCUSDT"]["ex1"], actual["BTCUSDT"]["ex2"]) == ("Bitget", "Gate")
+
+
+def test_spread_equal_to_threshold_follows_decimal_comparison():
+    rates = [[Decimal("-0.36"), Decimal("-0.06")], [Decimal("0.1"), Decimal("0.2")], [Decimal("0"), Decimal("0.5")]]
+    prices = [[Decimal(100)] * 2] * 3
+    symbols = ["A", "B", "C"]
+    # Decimal(0.3) чуть меньше 0.3 — спред 0.3 проходит; Decimal(0.1) и 0.5 — нет
+    assert set(assert_same(symbols, EXCHANGES[:2], rates, prices, 0.3, 1.0)) == {"A", "C"}
+    assert set(assert_same(symbols, EXCHANGES[:2], rates, prices, 0.1, 1.0)) == {"A", "C"}
+    assert set(assert_same(symbols, EXCHANGES[:2], rates, prices, 0.5, 1.0)) == set()
+
+
+def test_missing_quotes_and_prices():
+    nan = Decimal("NaN")
+    rates = [
+        [None, Decimal("0.5"), None],  # одна биржа — пары нет
+        [Decimal("0"), Decimal("0.5"), Decimal("0.4")],
+        [Decimal("0"), Decimal("0.5"), Decimal("0.45")],
+    ]
+    prices = [
+        [Decimal(100)] * 3,
+        # Без цены у первой биржи пара проходит только при price_diff >= 100, у второй — никогда
+        [nan, Decimal(100), Decimal(100)],
+        [Decimal(100), nan, Decimal(100)],
+    ]
+    symbols = ["A", "B", "C"]
+    assert assert_same(symbols, EXCHANGES[:3], rates, prices, 0.3, 1.0).keys() == {"C"}
+    wide = assert_same(symbols, EXCHANGES[:3], rates, prices, 0.3, 150.0)
+    assert (wide["B"]["ex1"], wide["B"]["ex2"]) == ("Bitget", "Gate")
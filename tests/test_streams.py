@@ -0,0 +1,206 @@
+"""Стримы против WebSocket-стенда mock_exchange.py: подписка, переподключение, дельты и дозапрос пробелов."""
+import asyncio
+import contextlib
+import json
+import socket
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+import main
+from exchanges import exchange_registry
+from http_client import HttpClientManager
+from market_state import MarketState
+from mock_exchange import MarketModel, MockExchangeServer
+from streams import STREAMS, StreamHub
+from symbol_registry import symbol_registry
+
+
+@contextlib.asynccontextmanager
+async def stand(symbols: int = 20):
+    """Стенд бирж на свободном порту и HTTP-клиент бота, направленный на него."""
+    model = MarketModel(symbols)
+    server = MockExchangeServer(model)
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    coins = [f"{base}_USDT" for base in model.bases]
+    symbol_registry.update(coins)
+    http_client = HttpClientManager(upstream=f"http://127.0.0.1:{port}")
+    await http_client.start()
+    try:
+        yield server, coins, http_client
+    finally:
+        await http_client.close()
+        await runner.cleanup()
+
+
+async def wait_until(predicate, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("условие не выполнилось за отведённое время")
+        await asyncio.sleep(0.02)
+
+
+def model_quote(server: MockExchangeServer, exchange: str, coin: str):
+    base = symbol_registry.base(symbol_registry.canonical(coin))
+    return server.model.rates[exchange][base] * 100, server.model.prices[exchange][base]
+
+
+@pytest.mark.parametrize("stream_cls", STREAMS, ids=lambda cls: cls.EXCHANGE)
+def test_stream_snapshot_matches_market(stream_cls):
+    async def run():
+        async with stand() as (server, coins, http_client):
+            exchange = stream_cls.EXCHANGE
+            hub = StreamHub([stream_cls])
+            await hub.start(coins[:5], http_client.session)
+            try:
+                await wait_until(lambda: len(hub.snapshot(exchange) or {}) >= 5)
+                snapshot = hub.snapshot(exchange)
+                for coin in coins[:5]:
+                    quote = snapshot[symbol_registry.canonical(coin)]
+                    rate, price = model_quote(server, exchange, coin)
+                    assert quote.rate == pytest.approx(rate)
+                    assert quote.price == pytest.approx(price)
+            finally:
+                await hub.close()
+
+    asyncio.run(run())
+
+
+def test_stream_reconnects_and_resubscribes():
+    async def run():
+        async with stand() as (server, coins, http_client):
+            stream_cls = exchange_registry.stream("Bybit")
+            hub = StreamHub([stream_cls])
+            await hub.start(coins[:3], http_client.session)
+            stream = hub.streams["Bybit"]
+            natives = lambda count: {symbol_registry.native("Bybit", coin) for coin in coins[:count]}
+            try:
+                await wait_until(lambda: server.subscriptions.get("Bybit") == natives(3))
+                # Обрыв: стрим переподключается и подписывается заново на те же символы
+                assert await server.drop_streams() == 1
+                await wait_until(lambda: server.stats["stream_connections"] == 2 and stream.connected)
+                await wait_until(lambda: server.subscriptions["Bybit"] == natives(3))
+                # Новый набор символов: соединение переоткрывается с новой подпиской
+                await hub.resubscribe(coins[:6])
+                await wait_until(lambda: server.subscriptions["Bybit"] == natives(6))
+                await wait_until(lambda: len(hub.snapshot("Bybit") or {}) == 6)
+                assert server.stats["stream_connections"] == 3
+            finally:
+                await hub.close()
+
+    asyncio.run(run())
+
+
+def test_stream_delta_merges_into_market_state(monkeypatch):
+    monkeypatch.setattr(main, "market_state", MarketState())
+
+    async def run():
+        async with stand() as (server, coins, http_client):
+            hub = StreamHub([exchange_registry.stream("Bybit")])
+            await hub.start(coins, http_client.session)
+            try:
+                await wait_until(lambda: len(hub.snapshot("Bybit") or {}) == len(coins))
+                # Дельта Bybit несёт только ставку: цена должна остаться из снимка
+                base = next(iter(server.model.inject(1, rate=0.01, exchanges=["Bybit"])))
+                symbol = symbol_registry.canonical(f"{base}_USDT")
+                price = hub.snapshot("Bybit")[symbol].price
+                await wait_until(lambda: hub.snapshot("Bybit")[symbol].rate == pytest.approx(1.0))
+                assert hub.snapshot("Bybit")[symbol].price == price
+
+                keys = [symbol_registry.canonical(coin) for coin in coins]
+                await main.apply_venue("Bybit", hub.snapshot("Bybit"), keys)
+                rates, prices = main.market_state.matrix([symbol])
+                column = main.market_state.exchanges.index("Bybit")
+                assert rates[0, column] == pytest.approx(1.0)
+                assert prices[0, column] == pytest.approx(price)
+                assert symbol in main.market_state.dirty
+            finally:
+                await hub.close()
+
+    asyncio.run(run())
+
+
+def test_rest_fills_symbols_missing_from_stream(monkeypatch):
+    monkeypatch.setattr(main, "rest_gap_cache", {})
+    monkeypatch.setattr(main, "USE_STREAMS", True)
+
+    async def run():
+        async with stand() as (server, coins, http_client):
+            monkeypatch.setattr(main, "http_client", http_client)
+            hub = StreamHub([exchange_registry.stream("Bybit")])
+            monkeypatch.setattr(main, "stream_hub", hub)
+            await hub.start(coins[:5], http_client.session)
+            try:
+                await wait_until(lambda: len(hub.snapshot("Bybit") or {}) == 5)
+                entries = await main.fetch_snapshot(exchange_registry.fetcher("Bybit"), coins[:10])
+                keys = [symbol_registry.canonical(coin) for coin in coins[:10]]
+                assert set(keys) <= set(entries)
+                # Котировки стрима несут время получения, bulk-снимок REST — нет
+                assert all(entries[key].ts is not None for key in keys[:5])
+                assert all(entries[key].ts is None for key in keys[5:])
+                for coin, key in zip(coins[:10], keys):
+                    rate, price = model_quote(server, "Bybit", coin)
+                    assert entries[key].rate == pytest.approx(rate)
+                assert "Bybit" in main.rest_gap_cache
+            finally:
+                await hub.close()
+
+    asyncio.run(run())
+
+
+def test_gap_fill_failure_keeps_stream_snapshot(monkeypatch):
+    monkeypatch.setattr(main, "rest_gap_cache", {})
+    monkeypatch.setattr(main, "USE_STREAMS", True)
+
+    async def failing_rest(exchange_cls, symbols):
+        raise aiohttp.ClientConnectionError("биржа недоступна")
+
+    async def run():
+        async with stand() as (server, coins, http_client):
+            monkeypatch.setattr(main, "http_client", http_client)
+            monkeypatch.setattr(main, "fetch_rest", failing_rest)
+            hub = StreamHub([exchange_registry.stream("Bybit")])
+            monkeypatch.setattr(main, "stream_hub", hub)
+            await hub.start(coins[:5], http_client.session)
+            try:
+                await wait_until(lambda: len(hub.snapshot("Bybit") or {}) == 5)
+                entries = await main.fetch_snapshot(exchange_registry.fetcher("Bybit"), coins[:10])
+                assert set(entries) == {symbol_registry.canonical(coin) for coin in coins[:5]}
+                # Дозапрос не удался — он повторится в следующем цикле
+                assert "Bybit" not in main.rest_gap_cache
+            finally:
+                await hub.close()
+
+    asyncio.run(run())
+
+
+def test_mexc_stream_and_bulk_resolve_same_symbols(monkeypatch):
+    symbol_registry.update(["BTC_USDT", "LUNA_USDT", "FOO_USDT", "BAR_USDT"])
+    # LUNA в RENAMED, у FOO старого контракта нет, BAR торгуется под обоими
+    tickers = [{"symbol": name, "fundingRate": 0.0001 * (i + 1), "fairPrice": 1.0 + i} for i, name in enumerate(
+        ["BTC_USDT", "LUNA_USDT", "LUNANEW_USDT", "FOONEW_USDT", "BAR_USDT", "BARNEW_USDT"]
+    )]
+    fetcher_cls = exchange_registry.fetcher("MEXC")
+
+    async def get_json(session, url, **kwargs):
+        return {"data": tickers}
+
+    monkeypatch.setattr(fetcher_cls, "get_json", get_json)
+    bulk = asyncio.run(fetcher_cls.fetch_all_funding_rates(None))
+
+    streamed = {}
+    stream = exchange_registry.stream("MEXC")([], lambda exchange, symbol, rate, price: streamed.update({symbol: (rate, price)}))
+    stream._handle(json.dumps({"channel": "push.tickers", "data": tickers}))
+
+    assert {symbol: (quote.rate, quote.price) for symbol, quote in bulk.items()} == streamed
+    assert streamed["LUNAUSDT"] == streamed["LUNANEWUSDT"]
+    assert streamed["FOOUSDT"] == streamed["FOONEWUSDT"]
+    assert streamed["BARUSDT"] != streamed["BARNEWUSDT"]
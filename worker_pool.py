@@ -0,0 +1,73 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List
+
+
+class WorkerPool:
+    """Фоновые воркеры, разбирающие очередь задач; workers — предел одновременных задач.
+
+    submit() не ждёт: цикл сканирования кладёт задачу и идёт дальше,
+    а обработка (история, форматирование, отправка) идёт параллельно в воркерах.
+    """
+
+    def __init__(self, handler: Callable[[Any], Awaitable[None]], workers: int = 4, maxsize: int = 500,
+                 name: str = "pool"):
+        self.handler = handler
+        self.workers = workers
+        self.name = name
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._tasks: List[asyncio.Task] = []
+        self.active = 0
+        self.stats = {"submitted": 0, "done": 0, "failed": 0, "dropped": 0}
+        self.last_duration = 0.0
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def submit(self, item: Any) -> bool:
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logging.warning(f"Очередь {self.name} переполнена, задача отброшена")
+            return False
+        self.stats["submitted"] += 1
+        return True
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._queue.get()
+            self.active += 1
+            started = time.monotonic()
+            try:
+                await self.handler(item)
+                self.stats["done"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats["failed"] += 1
+                logging.error(f"Ошибка в {self.name}: {e}")
+            finally:
+                self.last_duration = time.monotonic() - started
+                self.active -= 1
+                self._queue.task_done()
+
+    async def start(self) -> None:
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def join(self, timeout: float = 30.0) -> None:
+        """Ждёт обработки всего, что уже в очереди (например, перед остановкой)."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"{self.name}: не дождались {self.depth()} задач")
+
+    async def close(self, timeout: float = 30.0) -> None:
+        if self._tasks:
+            await self.join(timeout)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()